@@ -0,0 +1,150 @@
+import sys
+
+import db
+from responses import fetch_dicts
+
+# Summary tables kept current by the triggers from migration 5, so analytics reads
+# touch O(days) rows however many orders there are. Orders count towards the (UTC)
+# day they were placed, and rejected orders only towards `rejected`. Deleting orders
+# does not touch the summaries: they record history.
+SUMMARY_TABLES = ['restaurant_daily_stats', 'menu_item_daily_stats', 'order_status_counts']
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+TOP_ITEMS_LIMIT = 10
+MAX_TOP_ITEMS = 100
+
+
+def order_stats(row, sign):
+    # restaurant_daily_stats columns contributed by one orders row (`new`, `old` or an
+    # alias), negated to retract it
+    delivered = f"{row}.status = 'delivered' AND {row}.delivered_at IS NOT NULL"
+    return [
+        f'{row}.restaurant_id',
+        f'date({row}.created_at)',
+        f"{sign} * ({row}.status != 'rejected')",
+        f"{sign} * (CASE WHEN {row}.status = 'rejected' THEN 0 ELSE {row}.total_amount END)",
+        f"{sign} * ({row}.status = 'rejected')",
+        f'{sign} * ({delivered})',
+        f'{sign} * (CASE WHEN {delivered} THEN (julianday({row}.delivered_at) - julianday({row}.created_at)) * 86400 ELSE 0 END)',
+    ]
+
+
+def rebuild(conn):
+    # Recompute every summary from orders and order_items, e.g. to backfill history
+    # or after a bulk load with the triggers dropped
+    for table in SUMMARY_TABLES:
+        conn.execute(f'DELETE FROM {table}')
+    columns = ['restaurant_id', 'day', 'orders', 'revenue', 'rejected', 'delivered', 'delivery_seconds']
+    contribution = ', '.join(f'{expression} AS {column}' for expression, column in zip(order_stats('o', 1), columns))
+    conn.execute(f'''INSERT INTO restaurant_daily_stats ({', '.join(columns)})
+                     SELECT restaurant_id, day, sum(orders), sum(revenue), sum(rejected), sum(delivered),
+                            sum(delivery_seconds)
+                     FROM (SELECT {contribution} FROM orders o)
+                     GROUP BY restaurant_id, day''')
+    conn.execute('''INSERT INTO menu_item_daily_stats (restaurant_id, day, menu_item_id, quantity, revenue)
+                    SELECT o.restaurant_id, date(o.created_at), oi.menu_item_id, sum(oi.quantity),
+                           sum(oi.quantity * oi.price)
+                    FROM order_items oi JOIN orders o ON o.id = oi.order_id
+                    WHERE o.status != 'rejected'
+                    GROUP BY o.restaurant_id, date(o.created_at), oi.menu_item_id''')
+    conn.execute('''INSERT INTO order_status_counts (restaurant_id, status, orders)
+                    SELECT restaurant_id, status, COUNT(*) FROM orders GROUP BY restaurant_id, status''')
+
+
+def scope_clause(column, restaurant_id, owner_id):
+    # (condition, params) limiting rows to one restaurant and/or an owner's restaurants
+    conditions, params = [], []
+    if restaurant_id is not None:
+        conditions.append(f'{column} = ?')
+        params.append(restaurant_id)
+    if owner_id is not None:
+        conditions.append(f'{column} IN (SELECT id FROM restaurants WHERE owner_id = ?)')
+        params.append(owner_id)
+    return ''.join(f' AND {condition}' for condition in conditions), params
+
+
+def daily_stats(c, since, until, restaurant_id=None, owner_id=None):
+    scope, params = scope_clause('restaurant_id', restaurant_id, owner_id)
+    c.execute(f'''SELECT day, sum(orders) AS orders, round(sum(revenue), 2) AS revenue,
+                         sum(rejected) AS rejected, sum(delivered) AS delivered,
+                         round(sum(delivery_seconds) / nullif(sum(delivered), 0) / 60, 1) AS avg_delivery_minutes
+                  FROM restaurant_daily_stats
+                  WHERE day BETWEEN ? AND ?{scope}
+                  GROUP BY day ORDER BY day''', [since, until] + params)
+    return fetch_dicts(c)
+
+
+def top_items(c, since, until, limit, restaurant_id=None, owner_id=None):
+    scope, params = scope_clause('s.restaurant_id', restaurant_id, owner_id)
+    c.execute(f'''SELECT s.menu_item_id, mi.name, s.restaurant_id, sum(s.quantity) AS quantity,
+                         round(sum(s.revenue), 2) AS revenue
+                  FROM menu_item_daily_stats s
+                  JOIN menu_items mi ON mi.id = s.menu_item_id
+                  WHERE s.day BETWEEN ? AND ?{scope}
+                  GROUP BY s.menu_item_id
+                  HAVING sum(s.quantity) > 0
+                  ORDER BY quantity DESC, s.menu_item_id LIMIT ?''', [since, until] + params + [limit])
+    return fetch_dicts(c)
+
+
+def status_counts(c, restaurant_id=None, owner_id=None):
+    scope, params = scope_clause('restaurant_id', restaurant_id, owner_id)
+    c.execute(f'''SELECT status, sum(orders) FROM order_status_counts
+                  WHERE 1 = 1{scope} GROUP BY status HAVING sum(orders) > 0''', params)
+    return dict(c.fetchall())
+
+
+
+# Combining the results of several shards (see shards.py); a single result is returned as is
+def merge_daily(results):
+    # Per-day sums; average delivery times are weighted by each shard's deliveries
+    if len(results) == 1:
+        return results[0]
+    days = {}
+    for rows in results:
+        for row in rows:
+            day = days.setdefault(row['day'], {'day': row['day'], 'orders': 0, 'revenue': 0, 'rejected': 0,
+                                               'delivered': 0, 'delivery_minutes': 0})
+            for column in ('orders', 'revenue', 'rejected', 'delivered'):
+                day[column] += row[column]
+            day['delivery_minutes'] += (row['avg_delivery_minutes'] or 0) * row['delivered']
+    merged = []
+    for day in sorted(days):
+        row = days[day]
+        minutes = row.pop('delivery_minutes')
+        row['revenue'] = round(row['revenue'], 2)
+        row['avg_delivery_minutes'] = round(minutes / row['delivered'], 1) if row['delivered'] else None
+        merged.append(row)
+    return merged
+
+
+def merge_top_items(results, limit):
+    # A moved restaurant's items can sell on two shards, so quantities are summed per item
+    if len(results) == 1:
+        return results[0]
+    items = {}
+    for rows in results:
+        for row in rows:
+            item = items.setdefault(row['menu_item_id'], dict(row, quantity=0, revenue=0))
+            item['quantity'] += row['quantity']
+            item['revenue'] = round(item['revenue'] + row['revenue'], 2)
+    return sorted(items.values(), key=lambda item: (-item['quantity'], item['menu_item_id']))[:limit]
+
+
+def merge_status_counts(results):
+    counts = {}
+    for result in results:
+        for status, orders in result.items():
+            counts[status] = counts.get(status, 0) + orders
+    return counts
+
+
+if __name__ == '__main__':
+    database = sys.argv[1] if len(sys.argv) > 1 else 'food_delivery.db'
+    conn = db.connect(database)
+    with conn:
+        rebuild(conn)
+    for table in SUMMARY_TABLES:
+        print(f'{table}: {conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]} rows')
+    conn.close()
@@ -1,11 +1,35 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import sqlite3
-import hashlib
 import jwt
 import datetime
+import base64
+import math
+import heapq
+import itertools
+import json
 from functools import wraps
 import os
+import db
+import migrations
+import events
+import metrics
+import responses
+import search
+import dispatch
+import analytics
+import order_states
+import group_commit
+import archive
+import menu_import
+import order_export
+import ratelimit
+import shards
+from coalescing import SingleFlight
+from auth import hash_password, verify_password, verify_unknown_user, TokenCache
+from catalog_cache import CatalogCache
+from db import get_db, get_read_db
+from responses import fetch_dicts
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
@@ -14,22 +38,90 @@ app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 CORS(app, 
      origins="*",
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization"],
+     allow_headers=["Content-Type", "Authorization", db.WRITE_MARKER_HEADER],
+     expose_headers=["X-Next-Cursor", "X-Next-Since", db.WRITE_MARKER_HEADER],
      supports_credentials=False)
 
 # Add CORS headers to all responses
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', f'Content-Type,Authorization,{db.WRITE_MARKER_HEADER}')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
 DATABASE = 'food_delivery.db'
+app.config['DATABASE'] = os.environ.get('DATABASE', DATABASE)
+
+# Per-route latency, SQL count/time per request and slow-query logging; METRICS=0 disables
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS', '1') != '0'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+if app.config['METRICS_ENABLED']:
+    app.config['DB_CONNECTION_FACTORY'] = metrics.InstrumentedConnection
+    metrics.init_app(app)
+
+# Read routes use read-only (mode=ro) connections: to DATABASE itself, or to READ_REPLICA, a copy
+# refreshed by `python3 replica.py`, with a client's reads kept on the primary for
+# READ_AFTER_WRITE_SECONDS after it writes (see db.WRITE_MARKER_HEADER)
+app.config['READ_REPLICA'] = os.environ.get('READ_REPLICA')
+app.config['READ_AFTER_WRITE_SECONDS'] = float(os.environ.get('READ_AFTER_WRITE_SECONDS', db.READ_AFTER_WRITE_SECONDS))
+db.init_app(app)
+
+# Region sharding: SHARDS=n (or a comma-separated list of extra files) spreads restaurants and
+# their orders over several databases, DATABASE being shard 0 and the directory; see shards.py
+app.config['SHARDS'] = os.environ.get('SHARDS')
+shards.init_app(app)
+
+# orjson-backed jsonify when available; gzip/brotli for bodies over COMPRESS_MIN_SIZE bytes
+app.json = responses.FastJSONProvider(app)
+if os.environ.get('COMPRESSION', '1') != '0':
+    responses.init_compression(app, int(os.environ.get('COMPRESS_MIN_SIZE', responses.COMPRESS_MIN_SIZE)))
+
+# Optional group commit for order placement: ORDER_WRITER=1 sends placements through one
+# writer thread that commits up to ORDER_BATCH_SIZE orders together, holding a batch open
+# for at most ORDER_BATCH_DELAY_MS (more throughput under load, more latency per order);
+# a placement not committed within ORDER_WRITER_TIMEOUT seconds gets 503
+app.config['ORDER_WRITER'] = os.environ.get('ORDER_WRITER', '0') == '1'
+app.config['ORDER_BATCH_SIZE'] = int(os.environ.get('ORDER_BATCH_SIZE', group_commit.MAX_BATCH))
+app.config['ORDER_BATCH_DELAY_MS'] = float(os.environ.get('ORDER_BATCH_DELAY_MS', group_commit.MAX_DELAY * 1000))
+app.config['ORDER_WRITER_TIMEOUT'] = float(os.environ.get('ORDER_WRITER_TIMEOUT', group_commit.TIMEOUT))
+if app.config['ORDER_WRITER']:
+    group_commit.init_app(app)
+
+# Finished orders moved out by `python3 archive.py run`; GET /api/orders?include_archived=1 reads them too
+app.config['ARCHIVE_DATABASE'] = os.environ.get('ARCHIVE_DATABASE')
+
+# Order event stream; EVENT_BACKEND=sqlite shares events between worker processes
+app.config['EVENT_BACKEND'] = os.environ.get('EVENT_BACKEND', 'memory')
+event_hub = events.EventHub(events.create_backend(app.config['EVENT_BACKEND'], app.config['DATABASE']))
+
+# Token buckets for the polled dashboard routes, per user and shared per role (requests/s,
+# bursts of twice that); 0 turns a limit off
+app.config['USER_RATE_LIMIT'] = float(os.environ.get('USER_RATE_LIMIT', 20))
+app.config['ROLE_RATE_LIMIT'] = float(os.environ.get('ROLE_RATE_LIMIT', 1000))
+app.extensions['rate_limiter'] = ratelimit.RateLimiter(app.config['USER_RATE_LIMIT'], app.config['ROLE_RATE_LIMIT'])
+
+# Couriers polling /api/delivery/available at once share one query, and its result for
+# AVAILABLE_ORDERS_TTL_MS; status changes drop the cached results
+available_orders = SingleFlight(float(os.environ.get('AVAILABLE_ORDERS_TTL_MS', 1000)) / 1000)
+
+# Pre-serialized restaurant list and menus, invalidated by the catalog mutation routes
+catalog = CatalogCache(dumps=responses.dumps)
 
 # Database initialization
 def init_db():
-    conn = sqlite3.connect(DATABASE)
+    with app.app_context():
+        conn = get_db()
+        _create_tables(conn)
+        migrations.migrate(conn)
+    for shard, path in enumerate(app.config['SHARD_DATABASES'][1:], 1):
+        conn = db.connect(path)
+        _create_tables(conn)
+        migrations.migrate(conn)
+        shards.number_from(conn, shard)
+        conn.close()
+
+def _create_tables(conn):
     c = conn.cursor()
     
     # Users table
@@ -90,12 +182,11 @@ def init_db():
                   FOREIGN KEY (menu_item_id) REFERENCES menu_items(id))''')
     
     conn.commit()
-    conn.close()
 
-# Helper functions
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Verified JWT claims, so repeat requests skip signature checks
+token_cache = TokenCache(int(os.environ.get('TOKEN_CACHE_SIZE', 10000)))
 
+# Helper functions
 def generate_token(user_id, role):
     payload = {
         'user_id': user_id,
@@ -104,6 +195,13 @@ def generate_token(user_id, role):
     }
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
+def decode_token(token):
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        token_cache.put(token, claims)
+    return claims
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -111,14 +209,38 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         try:
-            token = token.replace('Bearer ', '')
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            request.current_user = data
+            request.current_user = decode_token(token.replace('Bearer ', ''))
         except:
             return jsonify({'error': 'Token is invalid'}), 401
         return f(*args, **kwargs)
     return decorated
 
+def rate_limited(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        retry_after = app.extensions['rate_limiter'].check(request.current_user['user_id'],
+                                                           request.current_user['role'])
+        if retry_after:
+            response = jsonify({'error': 'Too many requests'})
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response, 429
+        return f(*args, **kwargs)
+    return decorated
+
+def fetch_order_items(c, order_ids, schema='main'):
+    # Load the items for many orders in one query instead of one query per order;
+    # the ids are passed as a single JSON array so the statement never changes shape
+    items_by_order = {}
+    c.execute(f'''SELECT oi.order_id, mi.name, oi.quantity, oi.price 
+                 FROM {schema}.order_items oi 
+                 JOIN menu_items mi ON oi.menu_item_id = mi.id 
+                 WHERE oi.order_id IN (SELECT value FROM json_each(?))
+                 ORDER BY oi.order_id, oi.id''', (json.dumps(order_ids),))
+    for order_id, name, quantity, price in c.fetchall():
+        items_by_order.setdefault(order_id, []).append(
+            {'name': name, 'quantity': quantity, 'price': price})
+    return items_by_order
+
 def role_required(*roles):
     def decorator(f):
         @wraps(f)
@@ -129,6 +251,122 @@ def role_required(*roles):
         return decorated
     return decorator
 
+# Columns returned by order listings, in response field order
+ORDER_COLUMNS = '''o.id, o.user_id, o.restaurant_id, o.delivery_guy_id, o.status, o.total_amount,
+                    o.delivery_address, o.delivery_latitude, o.delivery_longitude, o.created_at,
+                    r.name AS restaurant_name, u.name AS customer_name'''
+
+# Pagination helpers
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Operations accepted per POST /api/admin/orders/batch
+MAX_BATCH_OPERATIONS = 10000
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, types):
+    # Cursor values, one of each of `types` (a type or tuple of types)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    for value, kind in zip(values, types):
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError('Invalid cursor')
+    return values
+
+def page_args(*cursor_types):
+    # Returns (limit, cursor values) from ?limit=&cursor=; raises ValueError on bad input
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Invalid limit')
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    cursor = request.args.get('cursor')
+    return min(limit, MAX_PAGE_SIZE), decode_cursor(cursor, cursor_types) if cursor else None
+
+def paginated(items, limit, make_cursor):
+    # Rows are fetched with LIMIT limit + 1 so an extra row means there is another page
+    response = jsonify(items[:limit])
+    if len(items) > limit:
+        response.headers['X-Next-Cursor'] = make_cursor(items[limit - 1])
+    return response, 200
+
+def where_clause(conditions):
+    return 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+def archive_database(shard=0):
+    if shard == 0 and app.config['ARCHIVE_DATABASE']:
+        return app.config['ARCHIVE_DATABASE']
+    return archive.archive_path(shards.database(shard))
+
+def order_shard(order_id):
+    # Shard holding an order, or None when the id belongs to none
+    shard = shards.shard_of(order_id)
+    return shard if 0 <= shard < shards.count() else None
+
+def add_customer_names(orders):
+    # Fill customer_name for orders read from shards other than the directory
+    missing = {o['user_id'] for o in orders if o['customer_name'] is None and o['user_id'] is not None}
+    if shards.count() == 1 or not missing:
+        return
+    names = shards.customer_names(get_read_db(), missing)
+    for order in orders:
+        if order['customer_name'] is None:
+            order['customer_name'] = names.get(order['user_id'])
+
+def order_scope(role, user_id):
+    # (conditions, params) limiting orders (o) to those the user may see. Owners get their
+    # restaurant ids spelled out so listings search idx_orders_restaurant.
+    if role == 'restaurant':
+        restaurant_ids = [row[0] for row in get_read_db(consistent=True).execute(
+            'SELECT id FROM restaurants WHERE owner_id = ?', (user_id,))]
+        if not restaurant_ids:
+            return ['0'], []
+        return [f"o.restaurant_id IN ({', '.join('?' * len(restaurant_ids))})"], restaurant_ids
+    if role == 'delivery':
+        return ["(o.delivery_guy_id = ? OR (o.delivery_guy_id IS NULL AND o.status = 'confirmed'))"], [user_id]
+    if role != 'admin':
+        return ['o.user_id = ?'], [user_id]
+    return [], []
+
+def listing_scopes(role, user_id):
+    # order_scope as disjoint parts that each follow one index in (created_at, id) order;
+    # listings page every part and merge them
+    if role == 'delivery':
+        return [(['o.delivery_guy_id = ?'], [user_id]),
+                (["o.status = 'confirmed'", 'o.delivery_guy_id IS NULL'], [])]
+    return [order_scope(role, user_id)]
+
+def add_order_filters(where, params, cursor):
+    # Shared ?status=&restaurant_id=&delivery_guy_id=&since=&until= filters plus the (created_at, id) keyset;
+    # raises ValueError on an id that is not an integer
+    if request.args.get('status'):
+        where.append('o.status = ?')
+        params.append(request.args['status'])
+    for name in ('restaurant_id', 'delivery_guy_id'):
+        if request.args.get(name):
+            try:
+                params.append(int(request.args[name]))
+            except ValueError:
+                raise ValueError(f'Invalid {name}')
+            where.append(f'o.{name} = ?')
+    if request.args.get('since'):
+        where.append('o.created_at >= ?')
+        params.append(request.args['since'])
+    if request.args.get('until'):
+        where.append('o.created_at < ?')
+        params.append(request.args['until'])
+    if cursor:
+        created_at, order_id = cursor
+        where.append('(o.created_at < ? OR (o.created_at = ? AND o.id < ?))')
+        params.extend([created_at, created_at, order_id])
+
 # Authentication routes
 @app.route('/api/auth/register', methods=['POST'])
 def register():
@@ -143,7 +381,7 @@ def register():
     if not all([username, password, role, name]):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    conn = sqlite3.connect(DATABASE)
+    conn = get_db()
     c = conn.cursor()
     
     try:
@@ -156,8 +394,6 @@ def register():
         return jsonify({'token': token, 'user': {'id': user_id, 'username': username, 'role': role, 'name': name}}), 201
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Username already exists'}), 400
-    finally:
-        conn.close()
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -168,14 +404,21 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
-    conn = sqlite3.connect(DATABASE)
+    conn = get_db()
     c = conn.cursor()
-    hashed_password = hash_password(password)
-    
-    c.execute('SELECT id, username, role, name FROM users WHERE username = ? AND password = ?',
-              (username, hashed_password))
+    c.execute('SELECT id, username, role, name, password FROM users WHERE username = ?', (username,))
     user = c.fetchone()
-    conn.close()
+    
+    if user:
+        matches, needs_rehash = verify_password(password, user[4])
+        if not matches:
+            user = None
+        elif needs_rehash:
+            # Upgrade legacy or low-cost hashes while we have the plaintext
+            c.execute('UPDATE users SET password = ? WHERE id = ?', (hash_password(password), user[0]))
+            conn.commit()
+    else:
+        verify_unknown_user(password)
     
     if user:
         token = generate_token(user[0], user[2])
@@ -187,46 +430,92 @@ def login():
         return jsonify({'error': 'Invalid credentials'}), 401
 
 # Restaurant routes
+def catalog_response(entry, cache_status):
+    # Serve cached bytes with a strong ETag; answer 304 when the client already has them
+    if request.if_none_match.contains_weak(entry.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Cache'] = cache_status
+    return response
+
 @app.route('/api/restaurants', methods=['GET'])
 def get_restaurants():
-    conn = sqlite3.connect(DATABASE)
+    entry = catalog.get('restaurants')
+    if entry:
+        return catalog_response(entry, 'HIT')
+    
+    version = catalog.version
+    conn = get_read_db(consistent=True)
     c = conn.cursor()
-    c.execute('SELECT * FROM restaurants WHERE is_active = 1')
-    restaurants = []
-    for row in c.fetchall():
-        restaurants.append({
-            'id': row[0],
-            'name': row[1],
-            'description': row[2],
-            'cuisine_type': row[3],
-            'address': row[4],
-            'phone': row[5],
-            'image_url': row[6],
-            'owner_id': row[7]
-        })
-    conn.close()
-    return jsonify(restaurants), 200
+    c.execute('''SELECT id, name, description, cuisine_type, address, phone, image_url, owner_id,
+                        latitude, longitude
+                 FROM restaurants WHERE is_active = 1''')
+    restaurants = fetch_dicts(c)
+    return catalog_response(catalog.put('restaurants', restaurants, version), 'MISS')
 
 @app.route('/api/restaurants/<int:restaurant_id>/menu', methods=['GET'])
 def get_menu(restaurant_id):
-    conn = sqlite3.connect(DATABASE)
+    key = f'menu:{restaurant_id}'
+    entry = catalog.get(key)
+    if entry:
+        return catalog_response(entry, 'HIT')
+    
+    version = catalog.version
+    conn = get_read_db(consistent=True)
     c = conn.cursor()
-    c.execute('SELECT * FROM menu_items WHERE restaurant_id = ?', (restaurant_id,))
-    menu_items = []
-    for row in c.fetchall():
-        menu_items.append({
-            'id': row[0],
-            'restaurant_id': row[1],
-            'name': row[2],
-            'description': row[3],
-            'price': row[4],
-            'image_url': row[5],
-            'category': row[6]
-        })
-    conn.close()
-    return jsonify(menu_items), 200
+    c.execute('''SELECT id, restaurant_id, name, description, price, image_url, category
+                 FROM menu_items WHERE restaurant_id = ?''', (restaurant_id,))
+    menu_items = fetch_dicts(c)
+    return catalog_response(catalog.put(key, menu_items, version), 'MISS')
+
+# Search routes
+@app.route('/api/search', methods=['GET'])
+def search_catalog():
+    text = request.args.get('q', '')
+    if not search.parse_terms(text):
+        return jsonify({'error': 'Search query required'}), 400
+    kinds = [request.args['type']] if request.args.get('type') else sorted(search.SEARCH_QUERIES)
+    if any(kind not in search.SEARCH_QUERIES for kind in kinds):
+        return jsonify({'error': 'Invalid search type'}), 400
+    try:
+        limit, cursor = page_args((int, float), str, int)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    conn = get_read_db()
+    hits = search.search(conn.cursor(), text, kinds, limit + 1, cursor)
+    return paginated(hits, limit, lambda hit: encode_cursor(*search.hit_key(hit)))
 
 # Order routes
+class UnknownMenuItems(Exception):
+    def __init__(self, menu_item_ids):
+        super().__init__(menu_item_ids)
+        self.menu_item_ids = menu_item_ids
+
+def place_order(c, user_id, restaurant_id, lines, delivery_address, delivery_location):
+    # Price the lines from this restaurant's menu and insert the order inside the caller's
+    # transaction; returns (order_id, total)
+    c.execute('''SELECT id, price FROM menu_items
+                 WHERE restaurant_id = ? AND id IN (SELECT value FROM json_each(?))''',
+              (restaurant_id, json.dumps([menu_item_id for menu_item_id, _ in lines])))
+    prices = dict(c.fetchall())
+    unknown = sorted({menu_item_id for menu_item_id, _ in lines if menu_item_id not in prices})
+    if unknown:
+        raise UnknownMenuItems(unknown)
+    
+    total = round(sum(prices[menu_item_id] * quantity for menu_item_id, quantity in lines), 2)
+    c.execute('''INSERT INTO orders (user_id, restaurant_id, total_amount, delivery_address,
+                                     delivery_latitude, delivery_longitude, status)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+              (user_id, restaurant_id, total, delivery_address, *delivery_location, 'pending'))
+    order_id = c.lastrowid
+    c.executemany('INSERT INTO order_items (order_id, menu_item_id, quantity, price) VALUES (?, ?, ?, ?)',
+                  [(order_id, menu_item_id, quantity, prices[menu_item_id]) for menu_item_id, quantity in lines])
+    return order_id, total
+
 @app.route('/api/orders', methods=['POST'])
 @token_required
 def create_order():
@@ -239,96 +528,162 @@ def create_order():
     if not all([restaurant_id, items, delivery_address]):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    # Calculate total
-    total = 0
-    for item in items:
-        c.execute('SELECT price FROM menu_items WHERE id = ?', (item['menu_item_id'],))
-        price_row = c.fetchone()
-        if price_row:
-            total += price_row[0] * item['quantity']
-    
-    # Create order
-    c.execute('INSERT INTO orders (user_id, restaurant_id, total_amount, delivery_address, status) VALUES (?, ?, ?, ?, ?)',
-              (user_id, restaurant_id, total, delivery_address, 'pending'))
-    order_id = c.lastrowid
-    
-    # Add order items
-    for item in items:
-        c.execute('SELECT price FROM menu_items WHERE id = ?', (item['menu_item_id'],))
-        price_row = c.fetchone()
-        if price_row:
-            c.execute('INSERT INTO order_items (order_id, menu_item_id, quantity, price) VALUES (?, ?, ?, ?)',
-                      (order_id, item['menu_item_id'], item['quantity'], price_row[0]))
+    try:
+        lines = [(int(item['menu_item_id']), int(item['quantity'])) for item in items]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid order items'}), 400
+    if any(quantity < 1 for _, quantity in lines):
+        return jsonify({'error': 'Invalid order items'}), 400
+    delivery_location = (None, None)
+    if data.get('delivery_latitude') is not None or data.get('delivery_longitude') is not None:
+        try:
+            delivery_location = dispatch.parse_coordinates(data.get('delivery_latitude'), data.get('delivery_longitude'))
+        except ValueError:
+            return jsonify({'error': 'Invalid delivery coordinates'}), 400
     
-    conn.commit()
-    conn.close()
-    return jsonify({'message': 'Order created', 'order_id': order_id}), 201
+    shard = shards.for_restaurant(restaurant_id)
+    conn = shards.get_shard_db(shard)
+    c = conn.cursor()
+    try:
+        if app.config['ORDER_WRITER']:
+            order_id, total = group_commit.get_writer(shard).submit(
+                lambda wc: place_order(wc, user_id, restaurant_id, lines, delivery_address, delivery_location))
+        else:
+            # Take the write lock up front so price resolution and inserts share one snapshot
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                order_id, total = place_order(c, user_id, restaurant_id, lines, delivery_address, delivery_location)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except UnknownMenuItems as exc:
+        return jsonify({'error': 'Items not on this restaurant\'s menu', 'menu_item_ids': exc.menu_item_ids}), 400
+    except group_commit.WriterUnavailable:
+        response = jsonify({'error': 'Order placement is busy, try again'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    publish_order_event(c, 'created', order_id)
+    return jsonify({'message': 'Order created', 'order_id': order_id, 'total_amount': total}), 201
 
 @app.route('/api/orders', methods=['GET'])
 @token_required
+@rate_limited
 def get_orders():
     role = request.current_user['role']
     user_id = request.current_user['user_id']
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
+    try:
+        limit, cursor = page_args(str, int)
+        scopes = []
+        for where, params in listing_scopes(role, user_id):
+            add_order_filters(where, params, cursor)
+            scopes.append((where, params))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
-    if role == 'admin':
-        c.execute('''SELECT o.*, r.name as restaurant_name, u.name as customer_name 
-                     FROM orders o 
-                     LEFT JOIN restaurants r ON o.restaurant_id = r.id
-                     LEFT JOIN users u ON o.user_id = u.id
-                     ORDER BY o.created_at DESC''')
-    elif role == 'restaurant':
-        c.execute('''SELECT o.*, r.name as restaurant_name, u.name as customer_name 
-                     FROM orders o 
-                     LEFT JOIN restaurants r ON o.restaurant_id = r.id
-                     LEFT JOIN users u ON o.user_id = u.id
-                     WHERE o.restaurant_id IN (SELECT id FROM restaurants WHERE owner_id = ?)
-                     ORDER BY o.created_at DESC''', (user_id,))
-    elif role == 'delivery':
-        c.execute('''SELECT o.*, r.name as restaurant_name, u.name as customer_name 
-                     FROM orders o 
-                     LEFT JOIN restaurants r ON o.restaurant_id = r.id
-                     LEFT JOIN users u ON o.user_id = u.id
-                     WHERE o.delivery_guy_id = ? OR (o.delivery_guy_id IS NULL AND o.status = 'confirmed')
-                     ORDER BY o.created_at DESC''', (user_id,))
-    else:
-        c.execute('''SELECT o.*, r.name as restaurant_name, u.name as customer_name 
-                     FROM orders o 
-                     LEFT JOIN restaurants r ON o.restaurant_id = r.id
-                     LEFT JOIN users u ON o.user_id = u.id
-                     WHERE o.user_id = ?
-                     ORDER BY o.created_at DESC''', (user_id,))
-    
-    orders = []
+    # Every shard's hot orders, and its archive too with ?include_archived=1; each database
+    # (and each part of the scope) is paged with its own indexes and the pages merged
+    sources, pages = [], []
+    for shard in range(shards.count()):
+        c = shards.get_shard_read_db(shard, user_id).cursor()
+        schemas = ['main']
+        if request.args.get('include_archived') == '1' and archive.attach(c.connection, archive_database(shard)):
+            schemas.append('archive')
+        for schema, (where, params) in itertools.product(schemas, scopes):
+            c.execute(f'''SELECT {ORDER_COLUMNS}
+                          FROM {schema}.orders o 
+                          LEFT JOIN restaurants r ON o.restaurant_id = r.id
+                          LEFT JOIN users u ON o.user_id = u.id
+                          {where_clause(where)}
+                          ORDER BY o.created_at DESC, o.id DESC
+                          LIMIT ?''', params + [limit + 1])
+            sources.append((c, schema))
+            pages.append(fetch_dicts(c))
+    orders = list(heapq.merge(*pages, key=lambda o: (o['created_at'], o['id']), reverse=True))[:limit + 1]
+    add_customer_names(orders)
+    
+    shown = {order['id'] for order in orders[:limit]}
+    items_by_order = {}
+    for (c, schema), page in zip(sources, pages):
+        order_ids = [order['id'] for order in page if order['id'] in shown]
+        if order_ids:
+            items_by_order.update(fetch_order_items(c, order_ids, schema))
+    for order in orders:
+        order['items'] = items_by_order.get(order['id'], [])
+    
+    return paginated(orders, limit, lambda o: encode_cursor(o['created_at'], o['id']))
+
+@app.route('/api/orders/export', methods=['GET'])
+@token_required
+@rate_limited
+@role_required('admin', 'restaurant')
+def export_orders():
+    # Every matching order with its items, oldest first, as NDJSON or CSV; streamed from a
+    # dedicated read-only connection so the body starts at once and memory stays flat
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in order_export.FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
+    user_id = request.current_user['user_id']
+    where, params = order_scope(request.current_user['role'], user_id)
+    try:
+        add_order_filters(where, params, None)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    databases = list(app.config['SHARD_DATABASES'])
+    if app.config['READ_REPLICA'] and not db.wrote_recently(user_id):
+        databases[0] = app.config['READ_REPLICA']
+    factory = app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection)
+    
+    def generate():
+        conns = [db.connect(database, factory, read_only=True) for database in databases]
+        try:
+            yield from order_export.ENCODERS[fmt](order_export.export_orders(conns, where, params))
+        finally:
+            for conn in conns:
+                conn.close()
+    
+    body = generate()
+    gzipped = bool(request.accept_encodings['gzip'])
+    if gzipped:
+        body = responses.gzip_chunks(body)
+    response = app.response_class(body, mimetype=order_export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=orders.{fmt}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.vary.add('Accept-Encoding')
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def publish_order_event(c, event_type, order_id):
+    publish_order_events(c, event_type, [order_id])
+
+def publish_order_events(c, event_type, order_ids):
+    # Called after commit; the payload carries what order_event_filter needs to route it
+    c.execute('''SELECT o.id, o.user_id, o.restaurant_id, r.owner_id, o.delivery_guy_id, o.status
+                 FROM orders o
+                 LEFT JOIN restaurants r ON o.restaurant_id = r.id
+                 WHERE o.id IN (SELECT value FROM json_each(?))''', (json.dumps(order_ids),))
     for row in c.fetchall():
-        # Get order items
-        c.execute('''SELECT mi.name, oi.quantity, oi.price 
-                     FROM order_items oi 
-                     JOIN menu_items mi ON oi.menu_item_id = mi.id 
-                     WHERE oi.order_id = ?''', (row[0],))
-        items = [{'name': item[0], 'quantity': item[1], 'price': item[2]} for item in c.fetchall()]
-        
-        orders.append({
-            'id': row[0],
-            'user_id': row[1],
-            'restaurant_id': row[2],
-            'delivery_guy_id': row[3],
-            'status': row[4],
-            'total_amount': row[5],
-            'delivery_address': row[6],
-            'created_at': row[7],
-            'restaurant_name': row[8] if len(row) > 8 else None,
-            'customer_name': row[9] if len(row) > 9 else None,
-            'items': items
-        })
-    
-    conn.close()
-    return jsonify(orders), 200
+        event_hub.publish(event_type, order_id=row[0], user_id=row[1], restaurant_id=row[2],
+                          owner_id=row[3], delivery_guy_id=row[4], status=row[5])
+
+@app.route('/api/orders/stream', methods=['GET'])
+def stream_order_events():
+    # EventSource cannot send headers, so the token may also be passed as ?token=
+    token = request.args.get('token') or request.headers.get('Authorization', '').replace('Bearer ', '')
+    try:
+        user = decode_token(token)
+    except jwt.InvalidTokenError:
+        return jsonify({'error': 'Token is invalid'}), 401
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    accept = events.order_event_filter(user['role'], user['user_id'])
+    response = app.response_class(event_hub.stream(last_event_id, accept), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/orders/<int:order_id>/status', methods=['PUT'])
 @token_required
@@ -337,92 +692,356 @@ def update_order_status(order_id):
     new_status = data.get('status')
     role = request.current_user['role']
     user_id = request.current_user['user_id']
+    if new_status not in order_states.STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    delivery_guy_id = data.get('delivery_guy_id') if role == 'admin' else None
+    shard = order_shard(order_id)
+    if shard is None:
+        return jsonify({'error': 'Order not found'}), 404
     
-    conn = sqlite3.connect(DATABASE)
+    conn = shards.get_shard_db(shard)
     c = conn.cursor()
-    
-    # Check permissions
-    c.execute('SELECT restaurant_id, delivery_guy_id FROM orders WHERE id = ?', (order_id,))
-    order = c.fetchone()
-    if not order:
-        conn.close()
+    if not order_states.transition(c, order_id, role, user_id, new_status, delivery_guy_id):
+        conn.rollback()
+        error, status_code = order_states.rejection(c, order_id, role, user_id, new_status)
+        return jsonify({'error': error}), status_code
+    conn.commit()
+    available_orders.invalidate()
+    publish_order_event(c, 'assigned' if new_status == 'accepted' or delivery_guy_id else 'status_changed', order_id)
+    return jsonify({'message': 'Order status updated'}), 200
+
+@app.route('/api/orders/events', methods=['GET'])
+@token_required
+@rate_limited
+def get_order_events():
+    # Status changes after event ?since= (exclusive), oldest first, for orders the user may see;
+    # pass the X-Next-Since header (the last id, or one last id per shard) back as ?since=
+    try:
+        positions = [int(position) for position in request.args.get('since', '0').split(',')]
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('Invalid limit')
+    except ValueError:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    where, params = order_scope(request.current_user['role'], request.current_user['user_id'])
+    since, pages = [], []
+    for shard in range(shards.count()):
+        since.append(max([position for position in positions if shards.shard_of(position) == shard],
+                         default=shard * shards.ID_SPAN))
+        c = shards.get_shard_read_db(shard, request.current_user['user_id']).cursor()
+        c.execute(f'''SELECT {order_states.EVENT_COLUMNS}
+                      FROM order_events e
+                      JOIN orders o ON o.id = e.order_id
+                      {where_clause(['e.id > ?'] + where)}
+                      ORDER BY e.id LIMIT ?''', [since[shard]] + params + [limit])
+        pages.append(fetch_dicts(c))
+    order_events = list(heapq.merge(*pages, key=lambda e: e['created_at']))[:limit]
+    for event in order_events:
+        shard = shards.shard_of(event['id'])
+        since[shard] = max(since[shard], event['id'])
+    response = jsonify(order_events)
+    response.headers['X-Next-Since'] = ','.join(map(str, since))
+    return response, 200
+
+@app.route('/api/orders/<int:order_id>/events', methods=['GET'])
+@token_required
+def get_order_timeline(order_id):
+    shard = order_shard(order_id)
+    if shard is None:
         return jsonify({'error': 'Order not found'}), 404
-    
-    # Restaurant can confirm or reject
-    if role == 'restaurant':
-        c.execute('SELECT owner_id FROM restaurants WHERE id = ?', (order[0],))
-        owner = c.fetchone()
-        if owner and owner[0] == user_id:
-            if new_status in ['confirmed', 'rejected', 'preparing', 'ready']:
-                c.execute('UPDATE orders SET status = ? WHERE id = ?', (new_status, order_id))
-                conn.commit()
-                conn.close()
-                return jsonify({'message': 'Order status updated'}), 200
-    
-    # Delivery guy can accept and update delivery status
-    if role == 'delivery':
-        if new_status == 'accepted':
-            c.execute('UPDATE orders SET delivery_guy_id = ?, status = ? WHERE id = ? AND delivery_guy_id IS NULL',
-                      (user_id, 'accepted', order_id))
-        elif new_status in ['picked_up', 'delivered']:
-            c.execute('UPDATE orders SET status = ? WHERE id = ? AND delivery_guy_id = ?',
-                      (new_status, order_id, user_id))
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Order status updated'}), 200
-    
-    # Admin can do anything
-    if role == 'admin':
-        delivery_guy_id = data.get('delivery_guy_id')
-        if delivery_guy_id:
-            c.execute('UPDATE orders SET delivery_guy_id = ?, status = ? WHERE id = ?',
-                      (delivery_guy_id, new_status, order_id))
-        else:
-            c.execute('UPDATE orders SET status = ? WHERE id = ?', (new_status, order_id))
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Order status updated'}), 200
-    
-    conn.close()
-    return jsonify({'error': 'Insufficient permissions'}), 403
+    where, params = order_scope(request.current_user['role'], request.current_user['user_id'])
+    c = shards.get_shard_read_db(shard, request.current_user['user_id']).cursor()
+    # Finished orders may have been moved to the archive, events and all
+    for schema in ('main', 'archive'):
+        if schema == 'archive' and not archive.attach(c.connection, archive_database(shard)):
+            return jsonify({'error': 'Order not found'}), 404
+        c.execute(f'SELECT 1 FROM {schema}.orders o {where_clause(["o.id = ?"] + where)}', [order_id] + params)
+        if c.fetchone():
+            break
+    else:
+        return jsonify({'error': 'Order not found'}), 404
+    c.execute(f'''SELECT {order_states.EVENT_COLUMNS} FROM {schema}.order_events e
+                  WHERE e.order_id = ? ORDER BY e.id''', (order_id,))
+    return jsonify(fetch_dicts(c)), 200
 
 # Admin routes
 @app.route('/api/admin/users', methods=['GET'])
 @token_required
 @role_required('admin')
 def get_all_users():
-    conn = sqlite3.connect(DATABASE)
+    conn = get_read_db(request.current_user['user_id'])
     c = conn.cursor()
-    c.execute('SELECT id, username, role, name, email, phone FROM users')
-    users = []
-    for row in c.fetchall():
-        users.append({
-            'id': row[0],
-            'username': row[1],
-            'role': row[2],
-            'name': row[3],
-            'email': row[4],
-            'phone': row[5]
-        })
-    conn.close()
-    return jsonify(users), 200
+    try:
+        limit, cursor = page_args(int)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    where, params = [], []
+    if request.args.get('role'):
+        where.append('role = ?')
+        params.append(request.args['role'])
+    if cursor:
+        where.append('id > ?')
+        params.append(cursor[0])
+    c.execute(f'''SELECT id, username, role, name, email, phone FROM users
+                  {where_clause(where)}
+                  ORDER BY id
+                  LIMIT ?''', params + [limit + 1])
+    users = fetch_dicts(c)
+    return paginated(users, limit, lambda u: encode_cursor(u['id']))
 
 @app.route('/api/admin/restaurants', methods=['POST'])
 @token_required
 @role_required('admin')
 def create_restaurant():
     data = request.json
-    conn = sqlite3.connect(DATABASE)
+    location = (None, None)
+    if data.get('latitude') is not None or data.get('longitude') is not None:
+        try:
+            location = dispatch.parse_coordinates(data.get('latitude'), data.get('longitude'))
+        except ValueError:
+            return jsonify({'error': 'Invalid coordinates'}), 400
+    shard = data.get('shard')
+    if shard is not None and (type(shard) is not int or not 0 <= shard < shards.count()):
+        return jsonify({'error': 'Invalid shard'}), 400
+    conn = get_db()
     c = conn.cursor()
-    c.execute('''INSERT INTO restaurants (name, description, cuisine_type, address, phone, image_url, owner_id)
-                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+    c.execute('''INSERT INTO restaurants (name, description, cuisine_type, address, phone, image_url, owner_id,
+                                      latitude, longitude)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
               (data.get('name'), data.get('description'), data.get('cuisine_type'),
-               data.get('address'), data.get('phone'), data.get('image_url'), data.get('owner_id')))
+               data.get('address'), data.get('phone'), data.get('image_url'), data.get('owner_id'),
+               *location))
     conn.commit()
     restaurant_id = c.lastrowid
-    conn.close()
+    if shards.count() > 1:
+        # Placed by region with ?shard=, otherwise spread by id
+        shard = restaurant_id % shards.count() if shard is None else shard
+        shards.move_restaurant(conn, restaurant_id, shard, shards.get_shard_db(shard) if shard else None)
+    catalog.invalidate('restaurants')
     return jsonify({'message': 'Restaurant created', 'id': restaurant_id}), 201
 
+@app.route('/api/admin/orders/batch', methods=['POST'])
+@token_required
+@role_required('admin')
+def batch_update_orders():
+    # {"operations": [{"order_id", "status"?, "delivery_guy_id"?}, ...]} applied in one transaction,
+    # one UPDATE per distinct change; a null delivery_guy_id unassigns. One result per operation.
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if not isinstance(operations, list) or not operations or len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'Send 1 to {MAX_BATCH_OPERATIONS} operations'}), 400
+    
+    c = get_db().cursor()
+    courier_ids = [op.get('delivery_guy_id') for op in operations if isinstance(op, dict)]
+    c.execute("SELECT id FROM users WHERE role = 'delivery' AND id IN (SELECT value FROM json_each(?))",
+              (json.dumps([courier_id for courier_id in courier_ids if type(courier_id) is int]),))
+    couriers = {row[0] for row in c.fetchall()}
+    
+    errors = [None] * len(operations)
+    groups = {}
+    seen = set()
+    for n, op in enumerate(operations):
+        op = op if isinstance(op, dict) else {}
+        order_id, status = op.get('order_id'), op.get('status')
+        assign = 'delivery_guy_id' in op
+        if type(order_id) is not int:
+            errors[n] = 'Invalid order_id'
+        elif order_id in seen:
+            errors[n] = 'Duplicate order_id'
+        elif status is not None and status not in order_states.STATUSES:
+            errors[n] = 'Invalid status'
+        elif assign and op['delivery_guy_id'] is not None and (type(op['delivery_guy_id']) is not int
+                                                               or op['delivery_guy_id'] not in couriers):
+            errors[n] = 'Unknown courier'
+        elif status is None and not assign:
+            errors[n] = 'Nothing to change'
+        else:
+            seen.add(order_id)
+            groups.setdefault((status, assign, op.get('delivery_guy_id')), []).append((n, order_id))
+    
+    # One transaction per shard holding any of the orders
+    changed = {}
+    for (status, assign, delivery_guy_id), group in groups.items():
+        by_shard = {}
+        for n, order_id in group:
+            by_shard.setdefault(order_shard(order_id), []).append((n, order_id))
+        for shard, shard_group in by_shard.items():
+            found = set()
+            if shard is not None:
+                found = order_states.transition_many(shards.get_shard_db(shard).cursor(),
+                                                     [order_id for _, order_id in shard_group],
+                                                     status, assign, delivery_guy_id)
+                changed.setdefault(shard, {'status_changed': [], 'assigned': []})[
+                    'assigned' if assign or status == 'accepted' else 'status_changed'].extend(found)
+            for n, order_id in shard_group:
+                if order_id not in found:
+                    errors[n] = 'Order not found'
+    for shard in changed:
+        shards.get_shard_db(shard).commit()
+    
+    if any(order_ids for shard_changes in changed.values() for order_ids in shard_changes.values()):
+        available_orders.invalidate()
+    for shard, shard_changes in changed.items():
+        for event_type, order_ids in shard_changes.items():
+            if order_ids:
+                publish_order_events(shards.get_shard_db(shard).cursor(), event_type, order_ids)
+    results = []
+    for op, error in zip(operations, errors):
+        results.append({'order_id': op.get('order_id') if isinstance(op, dict) else None, 'ok': error is None})
+        if error:
+            results[-1]['error'] = error
+    failed = sum(1 for error in errors if error)
+    return jsonify({'updated': len(operations) - failed, 'failed': failed, 'results': results}), 200
+
+@app.route('/api/admin/cache', methods=['GET'])
+@token_required
+@role_required('admin')
+def get_cache_stats():
+    return jsonify({'catalog': catalog.stats(), 'tokens': token_cache.stats(),
+                    'available_orders': available_orders.stats(),
+                    'rate_limits': app.extensions['rate_limiter'].stats()}), 200
+
+@app.route('/api/admin/dispatch', methods=['POST'])
+@token_required
+@role_required('admin')
+def dispatch_orders():
+    # Assign open orders to idle couriers nearby, minimizing pickup distance
+    data = request.get_json(silent=True) or {}
+    try:
+        max_distance_km = float(data.get('max_distance_km', 5))
+        candidates = int(data.get('candidates', 8))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid dispatch parameters'}), 400
+    if max_distance_km <= 0 or candidates < 1:
+        return jsonify({'error': 'Invalid dispatch parameters'}), 400
+    
+    if shards.count() == 1:
+        conn = get_db()
+        assignments, decided = dispatch.dispatch_batch(conn, max_distance_km, candidates)
+        if assignments:
+            publish_order_events(conn.cursor(), 'assigned', [order_id for _, order_id, _ in assignments])
+    else:
+        # Couriers are located in the directory and may be busy on any shard; they are
+        # matched once against the open orders of every shard
+        busy = set()
+        for shard in range(shards.count()):
+            busy.update(row[0] for row in shards.get_shard_db(shard).execute(
+                "SELECT delivery_guy_id FROM orders WHERE status IN ('accepted', 'picked_up')"))
+        couriers = [courier for courier in dispatch.available_couriers(get_db().cursor())
+                    if courier[0] not in busy]
+        conns = [shards.get_shard_db(shard) for shard in range(shards.count())]
+        assignments, decided = dispatch.dispatch_databases(conns, couriers, max_distance_km, candidates)
+        for shard, conn in enumerate(conns):
+            assigned = [order_id for _, order_id, _ in assignments if shards.shard_of(order_id) == shard]
+            if assigned:
+                publish_order_events(conn.cursor(), 'assigned', assigned)
+    if assignments:
+        available_orders.invalidate()
+    return jsonify({
+        'assigned': [{'order_id': order_id, 'courier_id': courier_id, 'distance_km': distance}
+                     for courier_id, order_id, distance in assignments],
+        'decision_ms': round(decided * 1000, 2),
+    }), 200
+
+# Analytics routes, served from the summary tables maintained by the order triggers
+def analytics_args():
+    # (since, until, restaurant_id, owner_id) from ?since=&until=&restaurant_id=; raises
+    # ValueError on bad input and PermissionError for another owner's restaurant
+    until = datetime.date.fromisoformat(request.args['until']) if request.args.get('until') else datetime.datetime.utcnow().date()
+    since = (datetime.date.fromisoformat(request.args['since']) if request.args.get('since')
+             else until - datetime.timedelta(days=analytics.DEFAULT_DAYS - 1))
+    if since > until or (until - since).days >= analytics.MAX_DAYS:
+        raise ValueError('Invalid date range')
+    restaurant_id = int(request.args['restaurant_id']) if request.args.get('restaurant_id') else None
+    owner_id = None
+    if request.current_user['role'] == 'restaurant':
+        owner_id = request.current_user['user_id']
+        if restaurant_id is not None:
+            c = get_read_db(request.current_user['user_id']).cursor()
+            c.execute('SELECT owner_id FROM restaurants WHERE id = ?', (restaurant_id,))
+            owner = c.fetchone()
+            if not owner or owner[0] != owner_id:
+                raise PermissionError(restaurant_id)
+    return since.isoformat(), until.isoformat(), restaurant_id, owner_id
+
+def shard_read_cursors():
+    return [shards.get_shard_read_db(shard, request.current_user['user_id']).cursor()
+            for shard in range(shards.count())]
+
+def analytics_route(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            return f(*analytics_args(), *args, **kwargs)
+        except ValueError:
+            return jsonify({'error': 'Invalid analytics parameters'}), 400
+        except PermissionError:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+    return decorated
+
+@app.route('/api/analytics/daily', methods=['GET'])
+@token_required
+@rate_limited
+@role_required('admin', 'restaurant')
+@analytics_route
+def get_daily_analytics(since, until, restaurant_id, owner_id):
+    # Orders, revenue, rejections and average delivery time per day
+    return jsonify(analytics.merge_daily([analytics.daily_stats(c, since, until, restaurant_id, owner_id)
+                                          for c in shard_read_cursors()])), 200
+
+@app.route('/api/analytics/top-items', methods=['GET'])
+@token_required
+@rate_limited
+@role_required('admin', 'restaurant')
+@analytics_route
+def get_top_items(since, until, restaurant_id, owner_id):
+    limit = min(int(request.args.get('limit', analytics.TOP_ITEMS_LIMIT)), analytics.MAX_TOP_ITEMS)
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    return jsonify(analytics.merge_top_items([analytics.top_items(c, since, until, limit, restaurant_id, owner_id)
+                                              for c in shard_read_cursors()], limit)), 200
+
+@app.route('/api/analytics/status', methods=['GET'])
+@token_required
+@rate_limited
+@role_required('admin', 'restaurant')
+@analytics_route
+def get_status_counts(since, until, restaurant_id, owner_id):
+    # Current order count per status; not limited to the date range
+    return jsonify(analytics.merge_status_counts([analytics.status_counts(c, restaurant_id, owner_id)
+                                                  for c in shard_read_cursors()])), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    catalog_stats = catalog.stats()
+    token_stats = token_cache.stats()
+    flight_stats = available_orders.stats()
+    limit_stats = app.extensions['rate_limiter'].stats()
+    counters = [
+        ('catalog_cache_hits', 'Catalog cache hits.', catalog_stats['hits']),
+        ('catalog_cache_misses', 'Catalog cache misses.', catalog_stats['misses']),
+        ('token_cache_hits', 'Verified-token cache hits.', token_stats['hits']),
+        ('token_cache_misses', 'Verified-token cache misses.', token_stats['misses']),
+        ('available_orders_queries', 'Available-order queries executed.', flight_stats['executions']),
+        ('available_orders_coalesced', 'Available-order requests that shared an in-flight query.', flight_stats['coalesced']),
+        ('available_orders_cache_hits', 'Available-order requests served from the micro-cache.', flight_stats['hits']),
+        ('rate_limited_user', 'Requests rejected by the per-user rate limit.', limit_stats['limited_by_user']),
+        ('rate_limited_role', 'Requests rejected by the per-role rate limit.', limit_stats['limited_by_role']),
+    ]
+    gauges = [
+        ('catalog_cache_entries', 'Cached catalog responses.', catalog_stats['entries']),
+        ('token_cache_entries', 'Cached verified tokens.', token_stats['entries']),
+    ]
+    if app.config['ORDER_WRITER']:
+        writer_stats = [writer.stats() for writer in app.extensions['order_writers']]
+        counters += [
+            ('order_writer_batches', 'Order placement batches committed.', sum(s['batches'] for s in writer_stats)),
+            ('order_writer_orders', 'Orders committed through the group-commit writer.', sum(s['items'] for s in writer_stats)),
+        ]
+        gauges.append(('order_writer_queued', 'Order placements waiting for the writer.',
+                       sum(s['queued'] for s in writer_stats)))
+    return metrics.registry.render(counters, gauges), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 # Restaurant owner routes
 @app.route('/api/restaurant/menu', methods=['POST'])
 @token_required
@@ -431,14 +1050,13 @@ def add_menu_item():
     data = request.json
     user_id = request.current_user['user_id']
     
-    conn = sqlite3.connect(DATABASE)
+    conn = get_db()
     c = conn.cursor()
     
     # Verify ownership
     c.execute('SELECT id FROM restaurants WHERE owner_id = ? AND id = ?',
               (user_id, data.get('restaurant_id')))
     if not c.fetchone():
-        conn.close()
         return jsonify({'error': 'Not your restaurant'}), 403
     
     c.execute('''INSERT INTO menu_items (restaurant_id, name, description, price, image_url, category)
@@ -447,33 +1065,122 @@ def add_menu_item():
                data.get('price'), data.get('image_url'), data.get('category')))
     conn.commit()
     item_id = c.lastrowid
-    conn.close()
+    shards.sync_catalog([data.get('restaurant_id')])
+    catalog.invalidate(f"menu:{data.get('restaurant_id')}")
     return jsonify({'message': 'Menu item added', 'id': item_id}), 201
 
+@app.route('/api/restaurant/menu/import', methods=['POST'])
+@token_required
+@role_required('restaurant', 'admin')
+def import_menu_items():
+    # Upsert menu items streamed as CSV or NDJSON (?format= or Content-Type); rows without a
+    # restaurant_id go to ?restaurant_id=. Returns counts and the rejected rows.
+    fmt = request.args.get('format') or menu_import.MIMETYPES.get(request.mimetype)
+    if fmt not in menu_import.READERS:
+        return jsonify({'error': 'Send CSV or NDJSON'}), 400
+    default_restaurant_id = request.args.get('restaurant_id', type=int)
+    
+    conn = get_db()
+    if request.current_user['role'] == 'admin':
+        owned = conn.execute('SELECT id FROM restaurants')
+    else:
+        owned = conn.execute('SELECT id FROM restaurants WHERE owner_id = ?', (request.current_user['user_id'],))
+    allowed = {row[0] for row in owned}
+    if not allowed or (default_restaurant_id is not None and default_restaurant_id not in allowed):
+        return jsonify({'error': 'Not your restaurant'}), 403
+    
+    report = menu_import.import_menu(conn, menu_import.READERS[fmt](request.stream), allowed, default_restaurant_id)
+    shards.sync_catalog(report.restaurants)
+    catalog.invalidate(*[f'menu:{restaurant_id}' for restaurant_id in report.restaurants])
+    return jsonify(report.as_dict()), 200
+
 @app.route('/api/delivery/available', methods=['GET'])
 @token_required
+@rate_limited
 @role_required('delivery')
 def get_available_orders():
-    conn = sqlite3.connect(DATABASE)
+    where = ["o.status = 'confirmed'", 'o.delivery_guy_id IS NULL']
+    params = []
+    try:
+        limit, cursor = page_args(str, int)
+        add_order_filters(where, params, cursor)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    user_id = request.current_user['user_id']
+    sql = f'''SELECT o.id, r.name AS restaurant_name, u.name AS customer_name,
+                     o.total_amount, o.delivery_address, o.created_at, o.user_id
+              FROM orders o 
+              LEFT JOIN restaurants r ON o.restaurant_id = r.id
+              LEFT JOIN users u ON o.user_id = u.id
+              {where_clause(where)}
+              ORDER BY o.created_at DESC, o.id DESC
+              LIMIT ?'''
+    params.append(limit + 1)
+    
+    def load():
+        pages = [fetch_dicts(shards.get_shard_read_db(shard, user_id).execute(sql, params))
+                 for shard in range(shards.count())]
+        orders = list(heapq.merge(*pages, key=lambda o: (o['created_at'], o['id']), reverse=True))[:limit + 1]
+        add_customer_names(orders)
+        for order in orders:
+            del order['user_id']
+        return orders
+    
+    # Couriers who just changed an order read it fresh; everyone else shares the query
+    orders = load() if db.wrote_recently(user_id) else available_orders.do((sql, tuple(params)), load)
+    return paginated(orders, limit, lambda o: encode_cursor(o['created_at'], o['id']))
+
+@app.route('/api/delivery/location', methods=['PUT'])
+@token_required
+@role_required('delivery')
+def update_courier_location():
+    data = request.get_json(silent=True) or {}
+    try:
+        latitude, longitude = dispatch.parse_coordinates(data.get('latitude'), data.get('longitude'))
+    except ValueError:
+        return jsonify({'error': 'Invalid coordinates'}), 400
+    conn = get_db()
+    conn.execute('''INSERT INTO courier_locations (courier_id, latitude, longitude, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (courier_id) DO UPDATE
+                    SET latitude = excluded.latitude, longitude = excluded.longitude,
+                        updated_at = excluded.updated_at''',
+                 (request.current_user['user_id'], latitude, longitude))
+    conn.commit()
+    return jsonify({'message': 'Location updated'}), 200
+
+@app.route('/api/delivery/nearby', methods=['GET'])
+@token_required
+@rate_limited
+@role_required('delivery')
+def get_nearby_orders():
+    # Open orders with the closest pickups to ?latitude=&longitude= or the last reported location
+    conn = get_read_db(request.current_user['user_id'])
     c = conn.cursor()
-    c.execute('''SELECT o.*, r.name as restaurant_name, u.name as customer_name 
-                 FROM orders o 
-                 LEFT JOIN restaurants r ON o.restaurant_id = r.id
-                 LEFT JOIN users u ON o.user_id = u.id
-                 WHERE o.status = 'confirmed' AND o.delivery_guy_id IS NULL
-                 ORDER BY o.created_at DESC''')
-    orders = []
-    for row in c.fetchall():
-        orders.append({
-            'id': row[0],
-            'restaurant_name': row[8] if len(row) > 8 else None,
-            'customer_name': row[9] if len(row) > 9 else None,
-            'total_amount': row[5],
-            'delivery_address': row[6],
-            'created_at': row[7]
-        })
-    conn.close()
-    return jsonify(orders), 200
+    try:
+        if request.args.get('latitude') is not None or request.args.get('longitude') is not None:
+            latitude, longitude = dispatch.parse_coordinates(request.args.get('latitude'),
+                                                             request.args.get('longitude'))
+        else:
+            c.execute('SELECT latitude, longitude FROM courier_locations WHERE courier_id = ?',
+                      (request.current_user['user_id'],))
+            location = c.fetchone()
+            if not location:
+                return jsonify({'error': 'Location unknown'}), 400
+            latitude, longitude = location
+        limit = min(int(request.args.get('limit', 10)), MAX_PAGE_SIZE)
+        radius_km = min(float(request.args.get('radius_km', dispatch.MAX_RADIUS_KM)), dispatch.MAX_RADIUS_KM)
+        if limit < 1 or radius_km <= 0:
+            raise ValueError('Invalid parameters')
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
+    nearby = []
+    for shard in range(shards.count()):
+        shard_cursor = shards.get_shard_read_db(shard, request.current_user['user_id']).cursor()
+        nearby += dispatch.nearest_open_orders(shard_cursor, latitude, longitude, limit, radius_km)
+    nearby.sort(key=lambda order: (order['distance_km'], order['id']))
+    return jsonify(nearby[:limit]), 200
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,205 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import db
+
+# Hot/cold split: finished orders older than a cutoff move, with their items and
+# events, from the live database into an archive database attached as `archive`.
+# Each batch is copied in one transaction (touching only the archive) and then
+# deleted from the live tables in a second short one, so live writers only ever wait
+# for the delete. A crash in between leaves a duplicate that the next run removes.
+# Analytics summaries are left alone: they keep counting archived history.
+ARCHIVED_TABLES = [('orders', 'id'), ('order_items', 'order_id'), ('order_events', 'order_id')]
+ARCHIVED_STATUSES = ('delivered', 'rejected')
+ARCHIVE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_created ON orders (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_user ON orders (user_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_restaurant ON orders (restaurant_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_delivery ON orders (delivery_guy_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_order_items_order ON order_items (order_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_order_events_order ON order_events (order_id, id)',
+]
+
+OLDER_THAN_DAYS = 90
+BATCH_SIZE = 500
+PAUSE = 0.05
+
+# Text columns stored as a dictionary plus integer codes in exports
+DICTIONARY_COLUMNS = {'status', 'from_status', 'to_status'}
+
+
+def archive_path(database):
+    return os.path.splitext(database)[0] + '_archive.db'
+
+
+def attach(conn, path, create=False):
+    # Attach the archive as `archive` (once per connection). Only reads, so it also works on
+    # mode=ro connections; returns False when there is no archive to read, or while it lags
+    # the live schema until the archiver next syncs it.
+    if not any(row[1] == 'archive' for row in conn.execute('PRAGMA database_list')):
+        if not create and not os.path.exists(path):
+            return False
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    return all(set(columns(conn, table)) <= set(columns(conn, table, 'archive')) for table, _ in ARCHIVED_TABLES)
+
+
+def sync_schema(conn):
+    # Bring the archive tables in line with the live ones; only the archiver writes them
+    for table, _ in ARCHIVED_TABLES:
+        live = conn.execute(f'PRAGMA main.table_info({table})').fetchall()
+        archived = set(columns(conn, table, 'archive'))
+        if not archived:
+            definitions = ', '.join(f'{name} {kind}' + (' PRIMARY KEY' if primary_key else '')
+                                    for _, name, kind, _, _, primary_key in live)
+            conn.execute(f'CREATE TABLE archive.{table} ({definitions})')
+        else:
+            # Columns added to the live table by later migrations
+            for _, name, kind, _, _, _ in live:
+                if name not in archived:
+                    conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {name} {kind}')
+    for sql in ARCHIVE_INDEXES:
+        conn.execute(sql)
+    conn.commit()
+
+
+def columns(conn, table, schema='main'):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def candidates(conn, cutoff, after, batch_size):
+    # Next finished orders placed before cutoff, in (created_at, id) order after `after`
+    placeholders = ', '.join('?' * len(ARCHIVED_STATUSES))
+    return conn.execute(f'''SELECT id, created_at FROM main.orders
+                            WHERE created_at < ? AND (created_at, id) > (?, ?)
+                              AND status IN ({placeholders})
+                            ORDER BY created_at, id LIMIT ?''',
+                        (cutoff, *after, *ARCHIVED_STATUSES, batch_size)).fetchall()
+
+
+def move_batch(conn, order_ids):
+    # Copy, then delete what was copied; returns the number of orders moved
+    ids = json.dumps(order_ids)
+    placeholders = ', '.join('?' * len(ARCHIVED_STATUSES))
+    with conn:
+        for table, key in ARCHIVED_TABLES:
+            names = ', '.join(columns(conn, table))
+            conn.execute(f'''INSERT OR REPLACE INTO archive.{table} ({names})
+                             SELECT {names} FROM main.{table}
+                             WHERE {key} IN (SELECT value FROM json_each(?))''', (ids,))
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Orders whose status changed since the copy stay live (and their stale copy is dropped)
+        moved = [row[0] for row in conn.execute(f'''SELECT o.id FROM main.orders o
+                                                    JOIN archive.orders a ON a.id = o.id
+                                                    WHERE o.id IN (SELECT value FROM json_each(?))
+                                                      AND o.status IN ({placeholders}) AND o.status = a.status''',
+                                                (ids, *ARCHIVED_STATUSES))]
+        stale = sorted(set(order_ids) - set(moved))
+        if stale:
+            for table, key in ARCHIVED_TABLES:
+                conn.execute(f'DELETE FROM archive.{table} WHERE {key} IN (SELECT value FROM json_each(?))',
+                             (json.dumps(stale),))
+        for table, key in reversed(ARCHIVED_TABLES):
+            conn.execute(f'DELETE FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))',
+                         (json.dumps(moved),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(moved)
+
+
+def archive_orders(conn, archive_database, older_than_days=OLDER_THAN_DAYS, batch_size=BATCH_SIZE,
+                   pause=PAUSE, max_batches=None, progress=None):
+    # Move every eligible order in batches, sleeping `pause` between them so live
+    # writers get the lock; returns the number of orders moved
+    attach(conn, archive_database, create=True)
+    sync_schema(conn)
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    after = ('', 0)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = candidates(conn, cutoff, after, batch_size)
+        if not batch:
+            break
+        moved += move_batch(conn, [order_id for order_id, _ in batch])
+        batches += 1
+        after = batch[-1][1], batch[-1][0]
+        if progress:
+            progress(moved)
+        time.sleep(pause)
+    return moved
+
+
+def export_month(conn, month, path):
+    # Archived orders placed in `month` (YYYY-MM), with their items and events, as
+    # gzip'd JSON holding one array per column; returns the number of orders written
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1)
+    bounds = (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    export = {'month': month}
+    for table, key in ARCHIVED_TABLES:
+        names = columns(conn, table)
+        selected = ', '.join(f't.{name}' for name in names)
+        if table == 'orders':
+            rows = conn.execute(f'''SELECT {selected} FROM archive.orders t
+                                    WHERE t.created_at >= ? AND t.created_at < ? ORDER BY t.id''', bounds)
+        else:
+            rows = conn.execute(f'''SELECT {selected} FROM archive.{table} t
+                                    JOIN archive.orders o ON o.id = t.{key}
+                                    WHERE o.created_at >= ? AND o.created_at < ? ORDER BY t.{key}, t.rowid''',
+                                bounds)
+        export[table] = encode_columns(names, rows.fetchall())
+    with gzip.open(path, 'wt', compresslevel=9) as out:
+        json.dump(export, out, separators=(',', ':'))
+    return len(export['orders']['id'])
+
+
+def encode_columns(names, rows):
+    table = {}
+    for n, name in enumerate(names):
+        values = [row[n] for row in rows]
+        if name in DICTIONARY_COLUMNS:
+            dictionary = sorted({value for value in values if value is not None})
+            codes = {value: code for code, value in enumerate(dictionary)}
+            table[name] = {'dictionary': dictionary, 'codes': [codes.get(value, -1) for value in values]}
+        else:
+            table[name] = values
+    return table
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Move finished orders to the archive database, or export a month of it')
+    parser.add_argument('--database', default='food_delivery.db')
+    parser.add_argument('--archive', help='archive database (default: <database>_archive.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='archive delivered and rejected orders older than --older-than-days')
+    run.add_argument('--older-than-days', type=int, default=OLDER_THAN_DAYS)
+    run.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    run.add_argument('--pause', type=float, default=PAUSE, help='seconds to sleep between batches')
+    export = commands.add_parser('export', help='write one month of the archive as compressed columns')
+    export.add_argument('month', help='YYYY-MM')
+    export.add_argument('path', help='output file, e.g. orders-2024-01.json.gz')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    conn = db.connect(args.database)
+    archive_database = args.archive or archive_path(args.database)
+    if args.command == 'run':
+        started = time.perf_counter()
+        moved = archive_orders(conn, archive_database, args.older_than_days, args.batch_size, args.pause)
+        print(f'Archived {moved} orders to {archive_database} in {time.perf_counter() - started:.1f}s')
+    else:
+        if not os.path.exists(archive_database):
+            sys.exit(f'No archive at {archive_database}')
+        attach(conn, archive_database)
+        sync_schema(conn)
+        print(f'Exported {export_month(conn, args.month, args.path)} orders to {args.path}')
+    conn.close()
@@ -0,0 +1,80 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# PBKDF2-SHA256 work factor for new hashes; raising it rehashes users on their next login
+PASSWORD_ITERATIONS = int(os.environ.get('PASSWORD_ITERATIONS', 600000))
+PASSWORD_ALGORITHM = 'pbkdf2_sha256'
+DUMMY_SALT = secrets.token_hex(16)
+
+
+def hash_password(password, iterations=None):
+    # Stored as pbkdf2_sha256$<iterations>$<salt>$<hash>
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return f'{PASSWORD_ALGORITHM}${iterations}${salt}${digest}'
+
+
+def verify_password(password, stored):
+    # Returns (matches, needs_rehash). Unsalted SHA-256 hashes from before the
+    # switch to PBKDF2 still verify but are flagged for rehashing.
+    if '$' not in stored:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        algorithm, iterations, salt, digest = stored.split('$')
+        iterations = int(iterations)
+    except ValueError:
+        return False, False
+    if algorithm != PASSWORD_ALGORITHM:
+        return False, False
+    candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return hmac.compare_digest(candidate, digest), iterations < PASSWORD_ITERATIONS
+
+
+def verify_unknown_user(password):
+    # The same KDF work as checking a real hash, for usernames that do not exist, so
+    # response times do not tell which accounts exist. The digest can never match.
+    verify_password(password, f'{PASSWORD_ALGORITHM}${PASSWORD_ITERATIONS}${DUMMY_SALT}${"0" * 64}')
+    return False
+
+
+class TokenCache:
+    # Bounded LRU of already-verified JWT claims keyed by the raw token, so a
+    # token is only signature-checked once until it expires or is evicted
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is not None and claims.get('exp', 0) > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return claims
+            self._entries.pop(token, None)
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,43 @@
+# Analytics endpoint latency as order volume grows: the summary-table reads should
+# stay flat while the equivalent aggregate over orders grows with the table.
+# Also reports the cost of a full summary rebuild.
+# Run from backend/: python -m benchmarks.analytics [orders ...]
+import sys
+import time
+
+import analytics
+import db
+from app import app
+from benchmarks.common import make_database, auth_headers, timed
+
+SCALES = [10000, 100000, 500000]
+
+# What /api/analytics/daily would cost without the summaries (restaurant 1, 30 days)
+RAW_DAILY = '''SELECT date(created_at) AS day, COUNT(*), sum(total_amount) FROM orders
+               WHERE restaurant_id = 1 AND created_at >= date('now', '-29 days') AND status != 'rejected'
+               GROUP BY day'''
+
+
+def run(scales=SCALES):
+    print(f"{'orders':>8} {'daily ms':>9} {'top items ms':>13} {'status ms':>10} {'raw daily ms':>13} {'rebuild s':>10}")
+    for orders in scales:
+        path = make_database(orders, restaurants=20, days=365)
+        client = app.test_client()
+        headers = auth_headers(client, 'restaurant')
+        args = {'restaurant_id': 1}
+        daily = timed(lambda: client.get('/api/analytics/daily', headers=headers, query_string=args), 20)
+        top = timed(lambda: client.get('/api/analytics/top-items', headers=headers, query_string=args), 20)
+        status = timed(lambda: client.get('/api/analytics/status', headers=headers, query_string=args), 20)
+        conn = db.connect(path)
+        raw = timed(lambda: conn.execute(RAW_DAILY).fetchall(), 5)
+        started = time.perf_counter()
+        with conn:
+            analytics.rebuild(conn)
+        rebuild = time.perf_counter() - started
+        conn.close()
+        print(f'{orders:>8} {daily * 1000:>9.2f} {top * 1000:>13.2f} {status * 1000:>10.2f} '
+              f'{raw * 1000:>13.2f} {rebuild:>10.2f}')
+
+
+if __name__ == '__main__':
+    run([int(n) for n in sys.argv[1:]] or SCALES)
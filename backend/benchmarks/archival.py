@@ -0,0 +1,111 @@
+# Hot/cold archival: order listing latency before and after moving old finished
+# orders to the archive, archival throughput, order placement latency while an
+# archival run is in progress, and the size of a monthly columnar export.
+# Run from backend/: python -m benchmarks.archival [orders] [threads]
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import archive
+import db
+from app import app
+from benchmarks.common import make_database, auth_headers, connection_factory, timed
+from benchmarks.group_commit import percentile
+
+OLDER_THAN_DAYS = 30
+LISTINGS = [
+    ('admin, first page', 'admin', {}),
+    ('admin, pending', 'admin', {'status': 'pending'}),
+    ('restaurant, first page', 'restaurant', {}),
+    ('customer, first page', 'customer', {}),
+    ('admin, include_archived', 'admin', {'include_archived': 1}),
+]
+
+
+def listing_latencies(client, headers):
+    return {label: timed(lambda: client.get('/api/orders', headers=headers[role],
+                                            query_string={'limit': 50, **query}), repeat=21)
+            for label, role, query in LISTINGS}
+
+
+def place_orders_during(headers, busy, threads):
+    # Place orders from `threads` clients for as long as busy() runs; returns sorted latencies
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def worker():
+        client = app.test_client()
+        local = []
+        while not done.is_set():
+            start = time.perf_counter()
+            client.post('/api/orders', headers=headers, json={
+                'restaurant_id': 1, 'delivery_address': 'Archive St',
+                'items': [{'menu_item_id': 1, 'quantity': 1}]})
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    result = busy()
+    done.set()
+    for w in workers:
+        w.join()
+    return sorted(latencies), result
+
+
+def run(orders=100000, threads=4):
+    path = make_database(orders, days=365)
+    app.extensions['db_pool'] = db.ConnectionPool(path, size=threads + 1, factory=connection_factory())
+    client = app.test_client()
+    headers = {role: auth_headers(client, role) for role in ('admin', 'restaurant', 'customer')}
+    before = listing_latencies(client, headers)
+
+    idle, _ = place_orders_during(headers['customer'], lambda: time.sleep(3), threads)
+
+    conn = db.connect(path)
+    hot = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+
+    def archive_all():
+        started = time.perf_counter()
+        moved = archive.archive_orders(conn, archive.archive_path(path), OLDER_THAN_DAYS)
+        return moved, time.perf_counter() - started
+
+    busy, (moved, elapsed) = place_orders_during(headers['customer'], archive_all, threads)
+    after = listing_latencies(client, headers)
+
+    print(f'{hot} orders, {moved} archived (older than {OLDER_THAN_DAYS} days) in {elapsed:.1f}s: '
+          f'{moved / elapsed:.0f} orders/s with {archive.PAUSE * 1000:.0f} ms pauses, batches of {archive.BATCH_SIZE}')
+    print(f"\n{'listing':>24} {'before ms':>10} {'after ms':>10}")
+    for label, _, _ in LISTINGS:
+        print(f'{label:>24} {before[label] * 1000:>10.2f} {after[label] * 1000:>10.2f}')
+
+    print(f"\n{'order placement':>24} {'orders':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, latencies in (('idle', idle), ('during archival', busy)):
+        print(f'{label:>24} {len(latencies):>7} {percentile(latencies, 0.5) * 1000:>8.2f} '
+              f'{percentile(latencies, 0.99) * 1000:>8.2f}')
+
+    month = conn.execute('''SELECT substr(created_at, 1, 7) FROM archive.orders
+                            GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1''').fetchone()[0]
+    export_path = os.path.join(tempfile.mkdtemp(prefix='export_'), f'orders-{month}.json.gz')
+    exported = archive.export_month(conn, month, export_path)
+    conn.row_factory = sqlite3.Row
+    rows = {table: [dict(row) for row in conn.execute(
+                f'''SELECT t.* FROM archive.{table} t JOIN archive.orders o ON o.id = t.{key}
+                    WHERE substr(o.created_at, 1, 7) = ?''', (month,))]
+            for table, key in archive.ARCHIVED_TABLES}
+    row_json = json.dumps(rows).encode()
+    print(f'\nexport of {month}: {exported} orders, {os.path.getsize(export_path) / 1024:.0f} KiB columnar gzip '
+          f'vs {len(row_json) / 1024:.0f} KiB row JSON ({len(gzip.compress(row_json)) / 1024:.0f} KiB gzipped)')
+    conn.close()
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,57 @@
+# Per-request authentication cost: JWT verification with and without the claims
+# cache, end-to-end throughput of an authenticated route, and password KDF cost.
+# Run from backend/: python -m benchmarks.auth_overhead
+import time
+
+import jwt
+
+import app as app_module
+from app import app, generate_token, token_cache
+from auth import hash_password, verify_password
+from benchmarks.common import make_database, auth_headers
+
+
+def per_call(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def token_decode(n=50000):
+    with app.app_context():
+        token = generate_token(1, 'admin')
+    secret = app.config['SECRET_KEY']
+    uncached = per_call(lambda: jwt.decode(token, secret, algorithms=['HS256']), n)
+    app_module.decode_token(token)
+    cached = per_call(lambda: app_module.decode_token(token), n)
+    print(f'jwt.decode        {uncached * 1e6:8.2f} us/call')
+    print(f'cached claims     {cached * 1e6:8.2f} us/call')
+
+
+def request_throughput(n=5000):
+    make_database(0)
+    client = app.test_client()
+    headers = auth_headers(client, 'admin')
+    for label, size in (('cache on', 10000), ('cache off', 0)):
+        token_cache.max_entries = size
+        token_cache._entries.clear()
+        elapsed = per_call(lambda: client.get('/api/admin/cache', headers=headers), n)
+        print(f'GET /api/admin/cache, {label:9} {1 / elapsed:8.0f} req/s')
+    token_cache.max_entries = 10000
+
+
+def password_kdf():
+    start = time.perf_counter()
+    stored = hash_password('bench-password')
+    hashed = time.perf_counter() - start
+    start = time.perf_counter()
+    verify_password('bench-password', stored)
+    verified = time.perf_counter() - start
+    print(f'hash_password     {hashed * 1000:8.1f} ms   verify_password {verified * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    token_decode()
+    request_throughput()
+    password_kdf()
@@ -0,0 +1,48 @@
+# Admin order changes one PUT /api/orders/<id>/status per order versus one
+# POST /api/admin/orders/batch, for growing numbers of orders: cancelling a backlog
+# and reassigning a courier's orders.
+# Run from backend/: python -m benchmarks.batch_orders [max orders]
+import sys
+import time
+
+from app import app
+from benchmarks.common import make_database, auth_headers, COURIER_ID
+
+SIZES = (100, 1000, 10000)
+
+
+def one_by_one(client, headers, operations):
+    started = time.perf_counter()
+    for op in operations:
+        client.put(f"/api/orders/{op['order_id']}/status", headers=headers,
+                   json={'status': op['status'], 'delivery_guy_id': op.get('delivery_guy_id')})
+    return time.perf_counter() - started
+
+
+def batched(client, headers, operations):
+    started = time.perf_counter()
+    response = client.post('/api/admin/orders/batch', headers=headers, json={'operations': operations})
+    assert response.json['failed'] == 0, response.json
+    return time.perf_counter() - started
+
+
+def run(max_orders=10000):
+    sizes = [size for size in SIZES if size <= max_orders]
+    make_database(4 * sum(sizes))
+    client = app.test_client()
+    headers = auth_headers(client, 'admin')
+    print(f"{'operation':>10} {'orders':>7} {'one by one s':>13} {'batch s':>8} {'speedup':>8}")
+    next_id = 1
+    for size in sizes:
+        for label, change in (('reject', {'status': 'rejected'}),
+                              ('reassign', {'status': 'accepted', 'delivery_guy_id': COURIER_ID})):
+            singles = [{'order_id': order_id, **change} for order_id in range(next_id, next_id + size)]
+            batch = [{'order_id': order_id, **change} for order_id in range(next_id + size, next_id + 2 * size)]
+            next_id += 2 * size
+            single_time = one_by_one(client, headers, singles)
+            batch_time = batched(client, headers, batch)
+            print(f'{label:>10} {size:>7} {single_time:>13.2f} {batch_time:>8.3f} {single_time / batch_time:>7.0f}x')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
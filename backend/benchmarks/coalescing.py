@@ -0,0 +1,82 @@
+# Couriers polling /api/delivery/available at once: queries executed, latency and
+# throughput without coalescing, with singleflight only, and with the micro-cache, then
+# how the per-user and per-role rate limits answer a burst.
+# Run from backend/: python -m benchmarks.coalescing [seconds] [couriers]
+import sys
+import threading
+import time
+
+import app as app_module
+import db
+import ratelimit
+from app import app
+from benchmarks.common import make_database, auth_headers, connection_factory
+from benchmarks.group_commit import percentile
+from coalescing import SingleFlight
+
+
+class Uncoalesced(SingleFlight):
+    def do(self, key, fn):
+        with self._lock:
+            self.executions += 1
+        return fn()
+
+
+# (label, flight)
+CONFIGURATIONS = [
+    ('no coalescing', Uncoalesced()),
+    ('singleflight', SingleFlight()),
+    ('singleflight + 1 s', SingleFlight(ttl=1)),
+]
+
+
+def poll(headers, seconds, couriers):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def courier():
+        client = app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            status = client.get('/api/delivery/available?limit=50', headers=headers).status_code
+            local.append(time.perf_counter() - start)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=courier) for _ in range(couriers)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latencies), statuses
+
+
+def run(seconds=5, couriers=32):
+    path = make_database(100000)
+    app.extensions['db_pool'] = db.ConnectionPool(path, size=couriers, factory=connection_factory())
+    db.init_read_pool(app)
+    headers = auth_headers(app.test_client(), 'delivery')
+    print(f"{'mode':>20} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'coalesced':>10} {'cached':>7}")
+    for label, flight in CONFIGURATIONS:
+        app_module.available_orders = flight
+        latencies, _ = poll(headers, seconds, couriers)
+        stats = flight.stats()
+        print(f'{label:>20} {len(latencies) / seconds:>11.0f} {percentile(latencies, 0.5) * 1000:>8.2f} '
+              f'{percentile(latencies, 0.99) * 1000:>8.2f} {stats["executions"]:>8} {stats["coalesced"]:>10} '
+              f'{stats["hits"]:>7}')
+
+    print(f"\n{'rate limits':>20} {'requests/s':>11} {'200':>7} {'429':>7}")
+    for user_rate, role_rate in ((20, 0), (0, 200)):
+        app.extensions['rate_limiter'] = ratelimit.RateLimiter(user_rate, role_rate)
+        latencies, statuses = poll(headers, seconds, couriers)
+        label = f'user {user_rate}/s' if user_rate else f'role {role_rate}/s'
+        print(f'{label:>20} {len(latencies) / seconds:>11.0f} {statuses.get(200, 0):>7} {statuses.get(429, 0):>7}')
+    app.extensions['rate_limiter'] = ratelimit.RateLimiter(0, 0)
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
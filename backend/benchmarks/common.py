@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import db
+import group_commit
+import ratelimit
+import shards
+from app import app, init_db
+from seed_data import seed_database
+
+# Ids of the seed_data.py demo accounts: admin, rest1 (owns restaurant 1), delivery1, customer1
+ADMIN_ID, OWNER_ID, COURIER_ID, CUSTOMER_ID = 1, 2, 5, 7
+
+CREDENTIALS = {
+    'admin': ('admin', 'admin123'),
+    'restaurant': ('rest1', 'rest123'),
+    'delivery': ('delivery1', 'delivery123'),
+    'customer': ('customer1', 'customer123'),
+}
+
+
+def connection_factory():
+    return app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection)
+
+
+def use_database(path):
+    # Point the app (and a fresh pool) at a benchmark database
+    app.config['DATABASE'] = path
+    app.extensions['db_pool'] = db.ConnectionPool(path, size=1, factory=connection_factory())
+    db.init_read_pool(app)
+    shards.init_pools(app)
+    # The benchmarks drive many requests through each demo account
+    app.extensions['rate_limiter'] = ratelimit.RateLimiter(0, 0)
+    if 'order_writers' in app.extensions:
+        for writer in app.extensions['order_writers']:
+            writer.close()
+        group_commit.init_app(app)
+    init_db()
+
+
+def make_database(orders, items_per_order=3, restaurants=20, customers=200, couriers=1,
+                  menu_items=10, days=365, seed=42, path=None):
+    # Demo data from seed_data.py plus the requested synthetic scale, in a fresh file
+    path = path or os.path.join(tempfile.mkdtemp(prefix='bench_'), 'food_delivery.db')
+    use_database(path)
+    seed_database(path, restaurants=restaurants, menu_items=menu_items, customers=customers,
+                  couriers=couriers, orders=orders, items_per_order=items_per_order, days=days,
+                  seed=seed, quiet=True)
+    return path
+
+
+def auth_headers(client, username, password=None):
+    if password is None:
+        username, password = CREDENTIALS[username]
+    response = client.post('/api/auth/login', json={'username': username, 'password': password})
+    return {'Authorization': 'Bearer ' + response.json['token']}
+
+
+class QueryCounter:
+    # Counts statements executed on the pooled read and write connections via SQLite's trace hook
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self):
+        with app.app_context():
+            self.conns = [db.get_read_db(), db.get_db()]
+        for conn in self.conns:
+            conn.set_trace_callback(self._trace)
+        return self
+
+    def __exit__(self, *exc):
+        for conn in self.conns:
+            conn.set_trace_callback(None)
+
+    def _trace(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
@@ -0,0 +1,54 @@
+# Courier dispatch at scale: nearest-order offers from the R*Tree index and batch
+# assignment decisions for thousands of idle couriers and open orders.
+# Run from backend/: python -m benchmarks.dispatch [couriers] [orders]
+import random
+import sys
+import time
+
+import db
+import dispatch
+from app import app
+from benchmarks.common import make_database, auth_headers, timed
+
+
+def run(couriers=3000, orders=100000):
+    path = make_database(orders, restaurants=2000, customers=2000, couriers=couriers)
+    conn = db.connect(path)
+    # Free every courier so the whole fleet is dispatchable
+    conn.execute("UPDATE orders SET status = 'delivered' WHERE status IN ('accepted', 'picked_up')")
+    conn.commit()
+    open_orders = conn.execute('SELECT COUNT(*) FROM open_orders_index').fetchone()[0]
+    c = conn.cursor()
+    idle = dispatch.available_couriers(c)
+    print(f'{len(idle)} idle couriers, {open_orders} open orders')
+
+    rng = random.Random(1)
+    sample = rng.sample(idle, min(200, len(idle)))
+    start = time.perf_counter()
+    for _, latitude, longitude in sample:
+        dispatch.nearest_open_orders(c, latitude, longitude, 10)
+    print(f'nearest 10 open orders   {(time.perf_counter() - start) / len(sample) * 1000:8.2f} ms per courier')
+
+    locations = dispatch.open_order_locations(c)
+    print(f'load idle couriers       {timed(lambda: dispatch.available_couriers(c), 10) * 1000:8.2f} ms')
+    print(f'load open order index    {timed(lambda: dispatch.open_order_locations(c), 10) * 1000:8.2f} ms')
+    for max_distance_km in (2, 5):
+        plan = timed(lambda: dispatch.plan_assignments(idle, locations, max_distance_km), 10)
+        planned = dispatch.plan_assignments(idle, locations, max_distance_km)
+        total = sum(distance for _, _, distance in planned)
+        print(f'plan, {max_distance_km} km radius       {plan * 1000:8.2f} ms   '
+              f'{plan / len(idle) * 1e6:.1f} us per courier, {len(planned)} assignments, '
+              f'mean pickup {total / max(len(planned), 1):.2f} km')
+    conn.close()
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.post('/api/admin/dispatch', headers=auth_headers(client, 'admin'),
+                           json={'max_distance_km': 5})
+    elapsed = time.perf_counter() - start
+    print(f"POST /api/admin/dispatch {elapsed * 1000:8.2f} ms   {len(response.json['assigned'])} assigned, "
+          f"decision {response.json['decision_ms']} ms")
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,80 @@
+# Order placement throughput and latency with and without the group-commit writer.
+# Concurrent clients place small orders for a fixed time against each configuration:
+# direct (one transaction per order) and the writer at several batch delays, with
+# synchronous=NORMAL (the default) and FULL (an fsync per commit).
+# Run from backend/: python -m benchmarks.group_commit [seconds] [threads]
+import sys
+import threading
+import time
+
+import db
+import group_commit
+from app import app
+from benchmarks.common import make_database, auth_headers, connection_factory
+
+# (label, writer enabled, max batch delay ms)
+CONFIGURATIONS = [
+    ('direct', False, 0),
+    ('writer, 0 ms', True, 0),
+    ('writer, 2 ms', True, 2),
+    ('writer, 10 ms', True, 10),
+]
+
+
+def percentile(samples, q):
+    return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+def place_orders(headers, seconds, threads):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def worker(n):
+        client = app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            response = client.post('/api/orders', headers=headers, json={
+                'restaurant_id': 1, 'delivery_address': 'Batch St',
+                'items': [{'menu_item_id': 1 + n % 4, 'quantity': 1}, {'menu_item_id': 2, 'quantity': 2}]})
+            local.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                failures.append(response.status_code)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latencies), time.perf_counter() - started, failures
+
+
+def run(seconds=5, threads=16):
+    path = make_database(1000)
+    headers = auth_headers(app.test_client(), 'customer')
+    default_synchronous = dict(db.PRAGMAS)['synchronous']
+    print(f"{'synchronous':>11} {'mode':>14} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for synchronous in (default_synchronous, 'FULL'):
+        db.PRAGMAS[:] = [(name, synchronous if name == 'synchronous' else value) for name, value in db.PRAGMAS]
+        for label, enabled, delay_ms in CONFIGURATIONS:
+            app.extensions['db_pool'] = db.ConnectionPool(path, size=threads, factory=connection_factory())
+            app.config['ORDER_WRITER'] = enabled
+            app.config['ORDER_BATCH_DELAY_MS'] = delay_ms
+            group_commit.init_app(app)
+            latencies, elapsed, failures = place_orders(headers, seconds, threads)
+            stats = app.extensions['order_writer'].stats()
+            app.extensions['order_writer'].close()
+            batch = f"{stats['mean_batch']:.1f}" if enabled else '-'
+            print(f'{synchronous:>11} {label:>14} {len(latencies) / elapsed:>9.0f} '
+                  f'{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} '
+                  f'{batch:>11}' + (f'  {len(failures)} failed' if failures else ''))
+    db.PRAGMAS[:] = [(name, default_synchronous if name == 'synchronous' else value) for name, value in db.PRAGMAS]
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,287 @@
+# Mixed-role load test. Builds (or reuses) a synthetic dataset, replays a weighted
+# workload of customer, restaurant, courier and admin requests against the Flask
+# test client or a running server, and reports p50/p95/p99 latency, throughput and
+# SQL statements per route. Results are written as JSON and can be compared with a
+# previous run.
+#
+# Run from backend/:
+#   python -m benchmarks.load --orders 100000 --duration 30 --output results.json
+#   python -m benchmarks.load --database /tmp/big.db --compare results.json
+#   USER_RATE_LIMIT=0 python3 app.py  (in another shell, then:)
+#   python -m benchmarks.load --target http://127.0.0.1:5001 --database food_delivery.db
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import db
+from app import app
+from benchmarks.common import make_database, use_database, connection_factory, CREDENTIALS
+
+# (name, role, weight, method, path factory, body factory)
+WORKLOAD = [
+    ('GET /api/restaurants', 'customer', 20, 'GET', lambda w: '/api/restaurants', None),
+    ('GET /api/restaurants/<id>/menu', 'customer', 20, 'GET',
+     lambda w: f'/api/restaurants/{w.restaurant()}/menu', None),
+    ('GET /api/orders [customer]', 'customer', 10, 'GET', lambda w: '/api/orders?limit=20', None),
+    ('POST /api/orders', 'customer', 5, 'POST', lambda w: '/api/orders', lambda w: w.new_order()),
+    ('GET /api/orders [restaurant]', 'restaurant', 6, 'GET', lambda w: '/api/orders?limit=50', None),
+    ('PUT /api/orders/<id>/status [restaurant]', 'restaurant', 3, 'PUT',
+     lambda w: f'/api/orders/{w.order()}/status', lambda w: {'status': 'confirmed'}),
+    ('GET /api/delivery/available', 'delivery', 12, 'GET', lambda w: '/api/delivery/available?limit=20', None),
+    ('GET /api/orders [delivery]', 'delivery', 6, 'GET', lambda w: '/api/orders?limit=20', None),
+    ('PUT /api/orders/<id>/status [delivery]', 'delivery', 2, 'PUT',
+     lambda w: f'/api/orders/{w.order()}/status', lambda w: {'status': 'accepted'}),
+    ('GET /api/orders [admin]', 'admin', 3, 'GET', lambda w: '/api/orders?limit=50', None),
+    ('GET /api/admin/users', 'admin', 1, 'GET', lambda w: '/api/admin/users?limit=50', None),
+]
+
+
+class TracingPool(db.ConnectionPool):
+    # Pool whose connections count executed statements per calling thread; the counts
+    # are shared by the read and write pools
+    local = threading.local()
+
+    def __init__(self, database, size, read_only=False):
+        super().__init__(database, size, connection_factory(), read_only)
+
+    def acquire(self):
+        conn = super().acquire()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def take_count(self):
+        count = getattr(self.local, 'count', 0)
+        self.local.count = 0
+        return count
+
+
+class TestClientTarget:
+    def __init__(self, pool):
+        self.pool = pool
+        self.local = threading.local()
+
+    def request(self, method, path, headers, body):
+        if not hasattr(self.local, 'client'):
+            self.local.client = app.test_client()
+        self.pool.take_count()
+        response = self.local.client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True), self.pool.take_count()
+
+
+class HTTPTarget:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, headers, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers=dict(headers, **{'Content-Type': 'application/json'}))
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or 'null'), None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None, None
+
+
+class Workload:
+    def __init__(self, target, meta, seed):
+        self.target = target
+        self.meta = meta
+        self.rng = random.Random(seed)
+        self.headers = {}
+
+    def login(self):
+        for role, (username, password) in CREDENTIALS.items():
+            status, body, _ = self.target.request('POST', '/api/auth/login', {},
+                                                  {'username': username, 'password': password})
+            if status != 200:
+                raise RuntimeError(f'login failed for {username}: {status}')
+            self.headers[role] = {'Authorization': f"Bearer {body['token']}"}
+
+    def load_menus(self, path):
+        # (first, last) menu item id per restaurant, so placed orders stay on one menu
+        conn = db.connect(path)
+        self.menus = conn.execute('''SELECT restaurant_id, MIN(id), MAX(id) FROM menu_items
+                                     GROUP BY restaurant_id''').fetchall()
+        conn.close()
+
+    def restaurant(self):
+        return self.rng.choice(self.menus)[0]
+
+    def order(self):
+        return self.rng.randint(1, max(self.meta['orders'], 1))
+
+    def new_order(self):
+        restaurant_id, first, last = self.rng.choice(self.menus)
+        return {'restaurant_id': restaurant_id, 'delivery_address': 'Load St',
+                'items': [{'menu_item_id': self.rng.randint(first, last), 'quantity': 1}
+                          for _ in range(self.rng.randint(1, 5))]}
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+
+def run_load(workload, concurrency, duration, seed):
+    names = [op[0] for op in WORKLOAD]
+    weights = [op[2] for op in WORKLOAD]
+    results = {name: {'latencies': [], 'errors': 0, 'queries': []} for name in names}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        while time.monotonic() < stop:
+            name, role, _, method, path, body = WORKLOAD[rng.choices(range(len(WORKLOAD)), weights)[0]]
+            with lock:
+                request_path = path(workload)
+                request_body = body(workload) if body else None
+            start = time.perf_counter()
+            status, _, queries = workload.target.request(method, request_path, workload.headers[role], request_body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                entry = results[name]
+                entry['latencies'].append(elapsed)
+                if status >= 500:
+                    entry['errors'] += 1
+                if queries is not None:
+                    entry['queries'].append(queries)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    routes = {}
+    everything = []
+    for name, entry in results.items():
+        samples = sorted(entry['latencies'])
+        everything.extend(samples)
+        if not samples:
+            continue
+        routes[name] = {
+            'requests': len(samples),
+            'errors': entry['errors'],
+            'throughput_rps': len(samples) / elapsed,
+            'mean_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'queries_per_request': (sum(entry['queries']) / len(entry['queries'])) if entry['queries'] else None,
+        }
+    everything.sort()
+    total = {
+        'requests': len(everything),
+        'errors': sum(r['errors'] for r in routes.values()),
+        'throughput_rps': len(everything) / elapsed,
+        'p50_ms': percentile(everything, 0.50) * 1000,
+        'p95_ms': percentile(everything, 0.95) * 1000,
+        'p99_ms': percentile(everything, 0.99) * 1000,
+    }
+    return routes, total
+
+
+def print_report(routes, total, baseline=None):
+    print(f"{'route':44} {'reqs':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql/req':>8}")
+    rows = list(routes.items()) + [('TOTAL', total)]
+    for name, r in rows:
+        queries = r.get('queries_per_request')
+        line = (f"{name:44} {r['requests']:>7} {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.2f} "
+                f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {queries if queries is None else round(queries, 1)!s:>8}")
+        if baseline:
+            before = baseline['total'] if name == 'TOTAL' else baseline['routes'].get(name)
+            if before and before['p95_ms']:
+                line += f"  p95 {(r['p95_ms'] / before['p95_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed-role load test for the food delivery API')
+    parser.add_argument('--target', default='testclient', help="'testclient' or a server URL")
+    parser.add_argument('--database', help='reuse an existing database instead of generating one')
+    parser.add_argument('--restaurants', type=int, default=200)
+    parser.add_argument('--menu-items', type=int, default=20, help='menu items per restaurant')
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--couriers', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--items-per-order', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to diff against')
+    args = parser.parse_args()
+
+    meta = {'restaurants': args.restaurants, 'menu_items': args.menu_items, 'customers': args.customers,
+            'couriers': args.couriers, 'orders': args.orders, 'items_per_order': args.items_per_order}
+    if args.database:
+        conn = db.connect(args.database)
+        meta['restaurants'] = conn.execute('SELECT COUNT(*) FROM restaurants').fetchone()[0]
+        meta['orders'] = conn.execute('SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]
+        conn.close()
+        path = args.database
+    else:
+        started = time.perf_counter()
+        path = make_database(args.orders, args.items_per_order, args.restaurants, args.customers,
+                             args.couriers, args.menu_items, seed=args.seed)
+        print(f'Generated dataset in {time.perf_counter() - started:.1f}s: {path}')
+
+    if args.target == 'testclient':
+        use_database(path)
+        pool = TracingPool(path, size=args.concurrency)
+        app.extensions['db_pool'] = pool
+        app.extensions['db_read_pool'] = TracingPool(path, size=args.concurrency, read_only=True)
+        target = TestClientTarget(pool)
+    else:
+        target = HTTPTarget(args.target)
+
+    workload = Workload(target, meta, args.seed)
+    workload.load_menus(path)
+    workload.login()
+    results, elapsed = run_load(workload, args.concurrency, args.duration, args.seed)
+    routes, total = summarize(results, elapsed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(routes, total, baseline)
+
+    if args.output:
+        report = {
+            'meta': dict(meta, target=args.target, database=path, concurrency=args.concurrency,
+                         duration=elapsed, seed=args.seed, revision=git_revision(),
+                         python=sys.version.split()[0], timestamp=datetime.now().isoformat(timespec='seconds')),
+            'routes': routes,
+            'total': total,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {os.path.abspath(args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Bulk menu import through POST /api/restaurant/menu/import: time and peak Python memory
+# for CSV and NDJSON uploads of growing size (all new items, then the same file again as
+# updates), against adding items one POST /api/restaurant/menu at a time.
+# Run from backend/: python -m benchmarks.menu_import [max items]
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app import app
+from benchmarks.common import make_database, auth_headers, timed
+
+RESTAURANTS = 20
+SINGLE_POSTS = 500
+
+
+def write_file(directory, fmt, items, prefix):
+    path = os.path.join(directory, f'menu_{items}.{fmt}')
+    with open(path, 'w') as out:
+        if fmt == 'csv':
+            out.write('restaurant_id,name,description,price,category\n')
+        for n in range(items):
+            row = {'restaurant_id': 1 + n % RESTAURANTS, 'name': f'{prefix} {n}',
+                   'description': f'Imported dish number {n}', 'price': round(3 + n % 2000 / 100, 2),
+                   'category': 'Imported'}
+            if fmt == 'csv':
+                out.write(f"{row['restaurant_id']},{row['name']},{row['description']},{row['price']},{row['category']}\n")
+            else:
+                out.write(json.dumps(row) + '\n')
+    return path
+
+
+def upload(client, headers, path, fmt):
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    started = time.perf_counter()
+    with open(path, 'rb') as body:
+        # input_stream, unlike data, is not read into memory by the test client
+        response = client.post('/api/restaurant/menu/import', headers={**headers, 'Content-Type': mimetype},
+                               input_stream=body, content_length=os.path.getsize(path))
+    return response.json, time.perf_counter() - started
+
+
+def peak_memory(client, headers, path, fmt):
+    # Peak Python allocations during an upload; tracemalloc slows it down, so this is a separate pass
+    tracemalloc.start()
+    upload(client, headers, path, fmt)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(max_items=100000):
+    make_database(0, restaurants=RESTAURANTS)
+    client = app.test_client()
+    headers = auth_headers(client, 'admin')
+    directory = tempfile.mkdtemp(prefix='menu_import_')
+
+    owner = auth_headers(client, 'restaurant')
+    n = iter(range(SINGLE_POSTS * 10))
+    per_item = timed(lambda: client.post('/api/restaurant/menu', headers=owner, json={
+        'restaurant_id': 1, 'name': f'Single {next(n)}', 'price': 5}), repeat=SINGLE_POSTS)
+    print(f'one item per POST: {per_item * 1000:.2f} ms/item, '
+          f'{max_items * per_item:.0f}s for {max_items} items\n')
+
+    print(f"{'format':>7} {'items':>8} {'insert s':>9} {'update s':>9} {'items/s':>9} {'peak MiB':>9}")
+    sizes = [size for size in (1000, 10000, max_items) if size <= max_items]
+    for fmt in ('csv', 'ndjson'):
+        for items in sizes:
+            path = write_file(directory, fmt, items, f'{fmt} {items}')
+            inserted, insert_time = upload(client, headers, path, fmt)
+            updated, update_time = upload(client, headers, path, fmt)
+            assert inserted['inserted'] == updated['updated'] == items, (inserted, updated)
+            peak = peak_memory(client, headers, path, fmt)
+            print(f'{fmt:>7} {items:>8} {insert_time:>9.2f} {update_time:>9.2f} {items / insert_time:>9.0f} '
+                  f'{peak / 2 ** 20:>9.1f}')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
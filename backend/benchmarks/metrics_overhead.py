@@ -0,0 +1,66 @@
+# Cost of request instrumentation: per-request latency of a few routes with
+# METRICS=1 and METRICS=0. Each mode runs in its own process, because metrics
+# are wired into the app (and its connection factory) at import time.
+# Each mode is run a few times, alternating, and the fastest median is kept.
+# Run from backend/: python -m benchmarks.metrics_overhead [orders]
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROUTES = [
+    ('GET /api/restaurants', 'customer', '/api/restaurants'),
+    ('GET /api/orders [admin]', 'admin', '/api/orders?limit=50'),
+    ('GET /api/delivery/available', 'delivery', '/api/delivery/available?limit=20'),
+    ('GET /api/admin/users', 'admin', '/api/admin/users?limit=50'),
+]
+
+
+def measure(path, n):
+    from app import app
+    from benchmarks.common import use_database, auth_headers
+    use_database(path)
+    client = app.test_client()
+    headers = {role: auth_headers(client, role) for role in ('customer', 'admin', 'delivery')}
+    results = {}
+    for name, role, url in ROUTES:
+        for _ in range(n // 10):
+            client.get(url, headers=headers[role])
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            client.get(url, headers=headers[role])
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        results[name] = samples[len(samples) // 2]
+    return results
+
+
+def run_mode(path, enabled, n):
+    env = dict(os.environ, METRICS='1' if enabled else '0')
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.metrics_overhead', '--child', path, str(n)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(orders=20000, n=2000, rounds=3):
+    # Alternate the modes and keep each route's best median to damp machine noise
+    from benchmarks.common import make_database
+    path = make_database(orders)
+    off, on = {}, {}
+    for _ in range(rounds):
+        for enabled, best in ((False, off), (True, on)):
+            for name, value in run_mode(path, enabled, n).items():
+                best[name] = min(best.get(name, value), value)
+    print(f"{'route':32} {'off us':>9} {'on us':>9} {'overhead':>9}")
+    for name, _, _ in ROUTES:
+        print(f'{name:32} {off[name] * 1e6:>9.0f} {on[name] * 1e6:>9.0f} '
+              f'{(on[name] / off[name] - 1) * 100:>+8.1f}%')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+    else:
+        main(*[int(arg) for arg in sys.argv[1:2]])
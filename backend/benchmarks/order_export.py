@@ -0,0 +1,71 @@
+# Full order exports through GET /api/orders/export (NDJSON, CSV and gzipped NDJSON)
+# against paging through GET /api/orders: time to first byte, total time, throughput and
+# peak Python memory as the number of orders grows.
+# Run from backend/: python -m benchmarks.order_export [orders]
+import sys
+import time
+import tracemalloc
+
+from app import app
+from benchmarks.common import make_database, auth_headers
+
+SIZES = (10000, 100000, 300000)
+
+
+def stream(client, headers, query):
+    # (seconds to the first chunk, total seconds, bytes) reading the body as it is produced
+    started = time.perf_counter()
+    response = client.get('/api/orders/export', headers=headers, query_string=query, buffered=False)
+    first, size = None, 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    return first, time.perf_counter() - started, size
+
+
+def paged(client, headers):
+    started = time.perf_counter()
+    query = {'limit': 200}
+    response = client.get('/api/orders', headers=headers, query_string=query)
+    first, size = time.perf_counter() - started, len(response.data)
+    while response.headers.get('X-Next-Cursor'):
+        query['cursor'] = response.headers['X-Next-Cursor']
+        response = client.get('/api/orders', headers=headers, query_string=query)
+        size += len(response.data)
+    return first, time.perf_counter() - started, size
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+MODES = [
+    ('ndjson', lambda client, headers: stream(client, headers, {'format': 'ndjson'})),
+    ('csv', lambda client, headers: stream(client, headers, {'format': 'csv'})),
+    ('ndjson gzip', lambda client, headers: stream(client, {**headers, 'Accept-Encoding': 'gzip'},
+                                                   {'format': 'ndjson'})),
+    ('paged /api/orders', paged),
+]
+
+
+def run(max_orders=300000):
+    print(f"{'mode':>18} {'orders':>8} {'first ms':>9} {'total s':>8} {'orders/s':>9} {'MiB':>7} {'peak MiB':>9}")
+    for size in [size for size in SIZES if size <= max_orders]:
+        make_database(size)
+        client = app.test_client()
+        headers = auth_headers(client, 'admin')
+        for label, mode in MODES:
+            first, total, body = mode(client, headers)
+            peak = peak_memory(lambda: mode(client, headers))
+            print(f'{label:>18} {size:>8} {first * 1000:>9.1f} {total:>8.2f} {size / total:>9.0f} '
+                  f'{body / 2 ** 20:>7.1f} {peak / 2 ** 20:>9.1f}')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
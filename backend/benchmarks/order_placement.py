@@ -0,0 +1,65 @@
+# Latency of POST /api/orders (restaurant 1, whose demo menu is items 1-4) for 1-200 line orders, plus a concurrent placement
+# check that every order's total matches its stored lines.
+# Run from backend/: python -m benchmarks.order_placement
+import threading
+import time
+
+import db
+from app import app
+from benchmarks.common import make_database, auth_headers, timed
+
+LINE_COUNTS = [1, 10, 50, 100, 200]
+
+
+def place(client, headers, lines):
+    response = client.post('/api/orders', headers=headers, json={
+        'restaurant_id': 1, 'delivery_address': 'Bench St',
+        'items': [{'menu_item_id': 1 + n % 4, 'quantity': 1 + n % 3} for n in range(lines)]})
+    assert response.status_code == 201, response.json
+    return response.json
+
+
+def latency_by_size(headers):
+    client = app.test_client()
+    print(f"{'lines':>6} {'median ms':>10}")
+    for lines in LINE_COUNTS:
+        latency = timed(lambda: place(client, headers, lines), repeat=20)
+        print(f'{lines:>6} {latency * 1000:>10.2f}')
+
+
+def concurrent_placement(path, headers, threads=8, per_thread=50):
+    errors = []
+    conn = db.connect(path)
+    first_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]
+
+    def worker():
+        client = app.test_client()
+        for n in range(per_thread):
+            try:
+                place(client, headers, 1 + n % 20)
+            except AssertionError as exc:
+                errors.append(exc)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    mismatched = conn.execute('''SELECT COUNT(*) FROM orders o
+                                 WHERE o.id > ? AND ABS(o.total_amount - (SELECT SUM(price * quantity) FROM order_items
+                                                             WHERE order_id = o.id)) > 0.005''',
+                              (first_id,)).fetchone()[0]
+    conn.close()
+    placed = threads * per_thread - len(errors)
+    print(f'{placed} concurrent orders in {elapsed:.2f}s ({placed / elapsed:.0f}/s), '
+          f'{len(errors)} failed, {mismatched} with mismatched totals')
+
+
+if __name__ == '__main__':
+    path = make_database(0)
+    headers = auth_headers(app.test_client(), 'customer')
+    latency_by_size(headers)
+    concurrent_placement(path, headers)
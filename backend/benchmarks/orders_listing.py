@@ -0,0 +1,25 @@
+# Query count and latency of GET /api/orders (admin) as order volume grows.
+# Run from backend/: python -m benchmarks.orders_listing
+import sys
+
+from app import app
+from benchmarks.common import make_database, auth_headers, QueryCounter, timed
+
+SCALES = [100, 1000, 10000, 50000]
+
+
+def run(scales=SCALES):
+    print(f"{'orders':>8} {'queries':>8} {'median ms':>10}")
+    for orders in scales:
+        make_database(orders)
+        client = app.test_client()
+        headers = auth_headers(client, 'admin', 'admin123')
+        with QueryCounter() as counter:
+            response = client.get('/api/orders', headers=headers)
+        assert response.status_code == 200
+        latency = timed(lambda: client.get('/api/orders', headers=headers), repeat=3)
+        print(f'{orders:>8} {counter.count:>8} {latency * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    run([int(n) for n in sys.argv[1:]] or SCALES)
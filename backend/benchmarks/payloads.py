@@ -0,0 +1,101 @@
+# Cost of building and encoding large listing responses: row mapping strategies,
+# JSON backends, response compression, and end-to-end time for full-size pages.
+# Run from backend/: python -m benchmarks.payloads [orders]
+import gzip
+import json
+import sqlite3
+import sys
+
+import db
+import responses
+from app import app, ORDER_COLUMNS
+from benchmarks.common import make_database, auth_headers, timed
+
+LISTING_SQL = f'''SELECT {ORDER_COLUMNS}
+                  FROM orders o
+                  LEFT JOIN restaurants r ON o.restaurant_id = r.id
+                  LEFT JOIN users u ON o.user_id = u.id
+                  ORDER BY o.created_at DESC, o.id DESC
+                  LIMIT 5000'''
+
+def row_mapping(path):
+    conn = db.connect(path)
+    described = conn.execute(LISTING_SQL)
+    rows = described.fetchall()
+
+    def positional():
+        return [{'id': row[0], 'user_id': row[1], 'restaurant_id': row[2], 'delivery_guy_id': row[3],
+                 'status': row[4], 'total_amount': row[5], 'delivery_address': row[6],
+                 'created_at': row[7], 'restaurant_name': row[8] if len(row) > 8 else None,
+                 'customer_name': row[9] if len(row) > 9 else None} for row in rows]
+
+    def fetch_dicts():
+        return responses.fetch_dicts(described, rows)
+
+    def sqlite_row():
+        return [dict(zip(row.keys(), row)) for row in rows_as_row]
+
+    conn.row_factory = sqlite3.Row
+    rows_as_row = conn.execute(LISTING_SQL).fetchall()
+    conn.row_factory = None
+    print(f'Row mapping, {len(rows)} rows (fetch excluded)')
+    for label, fn in (('positional dicts', positional), ('fetch_dicts', fetch_dicts), ('sqlite3.Row', sqlite_row)):
+        print(f'  {label:18} {timed(fn, 20) * 1000:8.2f} ms')
+    conn.close()
+
+
+def encoding(payloads):
+    print('JSON encoding')
+    backends = [('json (sort_keys)', lambda obj: json.dumps(obj, sort_keys=True).encode()),
+                ('json (compact)', lambda obj: json.dumps(obj, separators=(',', ':')).encode())]
+    if responses.orjson is not None:
+        backends.append(('orjson', responses.orjson.dumps))
+    for name, obj in payloads:
+        for label, dumps in backends:
+            print(f'  {name:28} {label:18} {timed(lambda: dumps(obj), 20) * 1000:8.2f} ms')
+
+
+def compression(payloads):
+    print('Compression')
+    for name, obj in payloads:
+        body = responses.dumps(obj)
+        variants = [(f'gzip {level}', lambda level=level: gzip.compress(body, compresslevel=level))
+                    for level in (1, 5, 9)]
+        if responses.brotli is not None:
+            variants += [(f'br {quality}', lambda quality=quality: responses.brotli.compress(body, quality=quality))
+                         for quality in (1, 4, 11)]
+        for label, fn in variants:
+            size = len(fn())
+            print(f'  {name:28} {label:8} {len(body):>9} -> {size:>8} bytes '
+                  f'({size / len(body):5.1%})  {timed(fn, 10) * 1000:8.2f} ms')
+
+
+def end_to_end():
+    client = app.test_client()
+    admin = auth_headers(client, 'admin')
+    print('End to end (test client)')
+    for url in ('/api/orders?limit=200', '/api/admin/users?limit=200', '/api/restaurants'):
+        for label, extra in (('identity', {}), ('gzip', {'Accept-Encoding': 'gzip'})):
+            headers = dict(admin, **extra)
+            size = len(client.get(url, headers=headers).data)
+            latency = timed(lambda: client.get(url, headers=headers), 30)
+            print(f'  {url:30} {label:9} {size:>9} bytes {latency * 1000:8.2f} ms')
+
+
+def run(orders=20000):
+    path = make_database(orders, items_per_order=5, restaurants=2000, customers=2000, menu_items=20)
+    client = app.test_client()
+    admin = auth_headers(client, 'admin')
+    payloads = [
+        ('orders page (200, 5 items)', client.get('/api/orders?limit=200', headers=admin).json),
+        ('restaurants (2000)', client.get('/api/restaurants').json),
+        ('users page (200)', client.get('/api/admin/users?limit=200', headers=admin).json),
+    ]
+    row_mapping(path)
+    encoding(payloads)
+    compression(payloads)
+    end_to_end()
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
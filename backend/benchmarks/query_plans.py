@@ -0,0 +1,153 @@
+# EXPLAIN QUERY PLAN regression check for every SQL statement the routes run.
+# Drives each endpoint through the test client, captures the statements SQLite
+# executed and fails if any of them falls back to a full scan of a large table, or walks a
+# whole index of one when its WHERE terms could have searched an index instead.
+# Run from backend/: python -m benchmarks.query_plans
+import datetime
+import re
+import sys
+
+import archive
+import db
+import menu_import
+import order_export
+import search
+from app import app, order_scope
+from benchmarks.common import make_database, auth_headers, QueryCounter, COURIER_ID
+
+# Tables (and the aliases the routes use for them) that must never be scanned
+LARGE_TABLES = {'orders', 'o', 'order_items', 'oi', 'menu_items', 'mi', 'order_events', 'e', 'a'}
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?$')
+PLANNED = ('SELECT', 'UPDATE', 'DELETE', 'INSERT')
+
+
+def exercise_routes(client):
+    h = {role: auth_headers(client, role) for role in ('admin', 'restaurant', 'delivery', 'customer')}
+    client.post('/api/auth/register', json={'username': 'planner', 'password': 'x',
+                                            'role': 'customer', 'name': 'Planner'})
+    client.get('/api/restaurants')
+    client.get('/api/restaurants/1/menu')
+    page = client.get('/api/search', query_string={'q': 'pizza', 'limit': 2})
+    client.get('/api/search', query_string={'q': 'pizza', 'limit': 2, 'cursor': page.headers['X-Next-Cursor']})
+    ranked_match_limit, search.RANKED_MATCH_LIMIT = search.RANKED_MATCH_LIMIT, 1
+    page = client.get('/api/search', query_string={'q': 'no', 'limit': 2})
+    client.get('/api/search', query_string={'q': 'no', 'limit': 2, 'cursor': page.headers['X-Next-Cursor']})
+    search.RANKED_MATCH_LIMIT = ranked_match_limit
+    order_id = client.post('/api/orders', headers=h['customer'], json={
+        'restaurant_id': 1, 'delivery_address': 'Plan St',
+        'items': [{'menu_item_id': 1, 'quantity': 2}, {'menu_item_id': 2, 'quantity': 1}]}).json['order_id']
+    for role, headers in h.items():
+        first = client.get('/api/orders', headers=headers, query_string={'limit': 20})
+        cursor = first.headers.get('X-Next-Cursor')
+        if cursor:
+            client.get('/api/orders', headers=headers, query_string={'limit': 20, 'cursor': cursor})
+        client.get('/api/orders', headers=headers, query_string={'limit': 20, 'include_archived': 1})
+    archived = (datetime.date.today() - datetime.timedelta(days=90)).isoformat()
+    client.get('/api/orders', headers=h['admin'], query_string={'limit': 20, 'include_archived': 1, 'until': archived})
+    client.get('/api/orders', headers=h['admin'], query_string={'status': 'pending', 'restaurant_id': 1,
+                                                                 'since': '2024-01-01', 'until': '2024-02-01'})
+    client.get('/api/delivery/available', headers=h['delivery'])
+    client.put('/api/delivery/location', headers=h['delivery'], json={'latitude': 40.75, 'longitude': -73.99})
+    client.get('/api/delivery/nearby', headers=h['delivery'])
+    client.post('/api/admin/dispatch', headers=h['admin'], json={'max_distance_km': 2})
+    client.put(f'/api/orders/{order_id}/status', headers=h['restaurant'], json={'status': 'confirmed'})
+    client.put(f'/api/orders/{order_id}/status', headers=h['delivery'], json={'status': 'accepted'})
+    client.put(f'/api/orders/{order_id}/status', headers=h['delivery'], json={'status': 'picked_up'})
+    client.put(f'/api/orders/{order_id}/status', headers=h['admin'],
+               json={'status': 'delivered', 'delivery_guy_id': COURIER_ID})
+    client.put(f'/api/orders/{order_id}/status', headers=h['restaurant'], json={'status': 'rejected'})
+    client.put(f'/api/orders/{order_id}/status', headers=h['delivery'], json={'status': 'picked_up'})
+    for headers in h.values():
+        client.get('/api/orders/events', headers=headers, query_string={'since': 1000})
+        client.get(f'/api/orders/{order_id}/events', headers=headers)
+    client.get('/api/admin/users', headers=h['admin'], query_string={'role': 'customer'})
+    client.post('/api/admin/orders/batch', headers=h['admin'], json={'operations': [
+        {'order_id': order_id, 'status': 'confirmed'}, {'order_id': 1, 'delivery_guy_id': COURIER_ID},
+        {'order_id': 2, 'status': 'ready', 'delivery_guy_id': None}]})
+    for role in ('admin', 'restaurant'):
+        for route in ('daily', 'top-items', 'status'):
+            client.get(f'/api/analytics/{route}', headers=h[role])
+            client.get(f'/api/analytics/{route}', headers=h[role], query_string={'restaurant_id': 1})
+    client.post('/api/admin/restaurants', headers=h['admin'], json={'name': 'Plan Bistro', 'owner_id': 2})
+    client.post('/api/restaurant/menu', headers=h['restaurant'],
+                json={'restaurant_id': 1, 'name': 'Plan Soup', 'price': 4.5})
+    client.post('/api/restaurant/menu/import', headers={**h['restaurant'], 'Content-Type': 'text/csv'},
+                query_string={'restaurant_id': 1}, data='name,price\nPlan Soup,5\nPlan Stew,6\nPlan Broth,\n')
+
+
+def archive_orders(path, statements):
+    conn = db.connect(path)
+    conn.set_trace_callback(statements.append)
+    archive.archive_orders(conn, archive.archive_path(path), older_than_days=60, batch_size=200, pause=0)
+    conn.close()
+
+
+def export_orders(path, statements):
+    # The export route streams from its own connection, so its queries are traced here
+    conn = db.connect(path, read_only=True)
+    conn.set_trace_callback(statements.append)
+    with app.app_context():
+        owner_where, owner_params = order_scope('restaurant', 2)
+    for where, params in (order_export.filters(), order_export.filters('2024-01-01', '2099-01-01'),
+                          order_export.filters(restaurant_id=1, status='delivered'),
+                          (owner_where, owner_params)):
+        for _ in order_export.iter_orders(conn, where, params):
+            break
+    conn.close()
+
+
+def filters(statement, alias):
+    # Whether the statement has a WHERE term on this table (or alias)
+    return any(re.search(rf'\b{alias}\.|^\s*{alias}\b', part)
+               for part in re.split(r'\bWHERE\b', statement, flags=re.IGNORECASE)[1:])
+
+
+def full_scan(detail, statement, partial_indexes):
+    # A plain SCAN of a large table, or a SCAN along an index that ignores the statement's
+    # WHERE terms on it. Walking an index is fine when it is partial (its own WHERE is the
+    # filter) or when the statement only orders by it, stopping at its LIMIT.
+    match = FULL_SCAN.match(detail)
+    if not match or match.group(1) not in LARGE_TABLES:
+        return False
+    index = match.group(2)
+    return index is None or (index not in partial_indexes and filters(statement, match.group(1)))
+
+
+def check_plans(path, statements):
+    conn = db.connect(path)
+    archive.attach(conn, archive.archive_path(path))
+    conn.execute(menu_import.STAGING)
+    partial_indexes = {name for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index'")
+                       if sql and re.search(r'\bWHERE\b', sql, re.IGNORECASE)}
+    failures = []
+    for statement in dict.fromkeys(statements):
+        if not statement.lstrip().upper().startswith(PLANNED):
+            continue
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + statement)]
+        if any(full_scan(detail, statement, partial_indexes) for detail in plan):
+            failures.append((statement, plan))
+    conn.close()
+    return failures
+
+
+def run():
+    path = make_database(2000)
+    client = app.test_client()
+    statements = []
+    archive_orders(path, statements)
+    export_orders(path, statements)
+    with QueryCounter() as counter:
+        exercise_routes(client)
+    statements += counter.statements
+    failures = check_plans(path, statements)
+    checked = len({s for s in statements if s.lstrip().upper().startswith(PLANNED)})
+    for statement, plan in failures:
+        print('FULL SCAN:', ' '.join(statement.split()))
+        for detail in plan:
+            print('    ', detail)
+    print(f'{checked} statements checked, {len(failures)} full scans')
+    return not failures
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
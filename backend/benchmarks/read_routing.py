@@ -0,0 +1,113 @@
+# Dashboard reads under concurrent order placement, with reads on the read-write pool
+# (as before read routing), on read-only connections to the primary, and on a replica
+# refreshed in the background. Also checks that a customer sees their own new order
+# immediately in every configuration.
+# Run from backend/: python -m benchmarks.read_routing [seconds] [readers] [writers]
+import sys
+import threading
+import time
+
+import db
+import replica
+from app import app
+from benchmarks.common import make_database, auth_headers, connection_factory
+from benchmarks.group_commit import percentile
+
+READS = [
+    ('admin', '/api/orders?limit=50'),
+    ('admin', '/api/admin/users?limit=50'),
+    ('restaurant', '/api/orders?limit=50'),
+    ('restaurant', '/api/analytics/daily'),
+    ('delivery', '/api/delivery/available?limit=50'),
+]
+
+
+def use_pools(path, configuration, readers, writers):
+    app.config['READ_REPLICA'] = replica.replica_path(path) if configuration == 'replica' else None
+    app.extensions['db_pool'] = db.ConnectionPool(path, size=readers + writers, factory=connection_factory())
+    db.init_read_pool(app)
+    if configuration == 'read-write pool':
+        app.extensions['db_read_pool'] = app.extensions['db_pool']
+
+
+def read_your_writes(headers):
+    # The client echoes the write marker back, as the frontend does
+    client = app.test_client()
+    response = client.post('/api/orders', headers=headers, json={
+        'restaurant_id': 1, 'delivery_address': 'Replica St',
+        'items': [{'menu_item_id': 1, 'quantity': 1}]})
+    marker = {db.WRITE_MARKER_HEADER: response.headers[db.WRITE_MARKER_HEADER]}
+    return response.json['order_id'] in [order['id'] for order in
+                                         client.get('/api/orders', headers={**headers, **marker}).json]
+
+
+def run_mix(headers, seconds, readers, writers):
+    reads, writes = [], []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def reader(n):
+        client = app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            role, url = READS[(n + len(local)) % len(READS)]
+            start = time.perf_counter()
+            client.get(url, headers=headers[role])
+            local.append(time.perf_counter() - start)
+        with lock:
+            reads.extend(local)
+
+    def writer():
+        client = app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            client.post('/api/orders', headers=headers['customer'], json={
+                'restaurant_id': 1, 'delivery_address': 'Routing St',
+                'items': [{'menu_item_id': 2, 'quantity': 1}]})
+            local.append(time.perf_counter() - start)
+        with lock:
+            writes.extend(local)
+
+    workers = ([threading.Thread(target=reader, args=(n,)) for n in range(readers)] +
+               [threading.Thread(target=writer) for _ in range(writers)])
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(reads), sorted(writes)
+
+
+def run(seconds=5, readers=6, writers=2):
+    path = make_database(50000)
+    headers = {role: auth_headers(app.test_client(), role)
+               for role in ('admin', 'restaurant', 'delivery', 'customer')}
+    replica_database = replica.replica_path(path)
+    source, target = db.connect(path), db.connect(replica_database)
+    started = time.perf_counter()
+    replica.refresh(source, target)
+    pages = target.execute('PRAGMA page_count').fetchone()[0]
+    print(f'replica refresh of {pages} pages: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+    stop = threading.Event()
+
+    def refresher():
+        while not stop.wait(1):
+            replica.refresh(source, target)
+
+    threading.Thread(target=refresher, daemon=True).start()
+    print(f"{'reads from':>16} {'reads/s':>8} {'read p50':>9} {'read p99':>9} {'writes/s':>9} "
+          f"{'write p99':>10} {'own order visible':>18}")
+    for configuration in ('read-write pool', 'read-only', 'replica'):
+        use_pools(path, configuration, readers, writers)
+        visible = read_your_writes(headers['customer'])
+        reads, writes = run_mix(headers, seconds, readers, writers)
+        print(f'{configuration:>16} {len(reads) / seconds:>8.0f} {percentile(reads, 0.5) * 1000:>9.2f} '
+              f'{percentile(reads, 0.99) * 1000:>9.2f} {len(writes) / seconds:>9.0f} '
+              f'{percentile(writes, 0.99) * 1000:>10.2f} {str(visible):>18}')
+    stop.set()
+    app.config['READ_REPLICA'] = None
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:4]])
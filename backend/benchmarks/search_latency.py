@@ -0,0 +1,41 @@
+# GET /api/search latency on a large catalog (default 5000 restaurants x 20 menu
+# items = 100k items), for selective and broad queries, first and later pages,
+# plus the time to rebuild the FTS5 indexes from scratch.
+# Run from backend/: python -m benchmarks.search_latency [restaurants] [menu_items]
+import sys
+import time
+
+import db
+import search
+from app import app
+from benchmarks.common import make_database, timed
+
+QUERIES = ['sushi', 'sus', 'pizza marg', 'japanese kitchen', 'curry', 'house bowl', 'no']
+
+
+def run(restaurants=5000, menu_items=20):
+    path = make_database(0, restaurants=restaurants, menu_items=menu_items)
+    client = app.test_client()
+    print(f'{restaurants * menu_items} synthetic menu items, {restaurants} restaurants')
+    print(f"{'query':18} {'hits':>5} {'page 1 ms':>10} {'page 2 ms':>10}")
+    for q in QUERIES:
+        first = client.get('/api/search', query_string={'q': q, 'limit': 20})
+        cursor = first.headers.get('X-Next-Cursor')
+        latency = timed(lambda: client.get('/api/search', query_string={'q': q, 'limit': 20}), 20)
+        line = f'{q:18} {len(first.json):>5} {latency * 1000:>10.2f}'
+        if cursor:
+            next_page = timed(lambda: client.get('/api/search', query_string={'q': q, 'limit': 20,
+                                                                              'cursor': cursor}), 20)
+            line += f' {next_page * 1000:>10.2f}'
+        print(line)
+
+    conn = db.connect(path)
+    started = time.perf_counter()
+    search.rebuild_indexes(conn)
+    conn.commit()
+    print(f'Index rebuild: {time.perf_counter() - started:.2f}s')
+    conn.close()
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,110 @@
+# Load test comparing the dev server (python3 app.py) with serve.py.
+# Starts each server on a synthetic database, hammers a mixed read workload
+# from concurrent client threads and reports throughput and latency, the last
+# run with many order streams open as well.
+# Run from backend/: python -m benchmarks.serving [--concurrency 32] [--duration 10]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from benchmarks.common import make_database
+
+DEV_SERVER = "from app import app, init_db; init_db(); app.run(host='127.0.0.1', port={port}, threaded=True)"
+
+
+def wait_ready(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/restaurants', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def login(port):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/api/auth/login',
+                                     data=json.dumps({'username': 'customer1', 'password': 'customer123'}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    return json.load(urllib.request.urlopen(request))['token']
+
+
+def load(port, concurrency, duration):
+    token = login(port)
+    paths = ['/api/restaurants', '/api/restaurants/1/menu', '/api/orders?limit=20']
+    latencies = []
+    errors = []
+    stop = time.monotonic() + duration
+
+    def client(n):
+        while time.monotonic() < stop:
+            request = urllib.request.Request(f'http://127.0.0.1:{port}{paths[n % len(paths)]}',
+                                             headers={'Authorization': f'Bearer {token}'})
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(request, timeout=10).read()
+                latencies.append(time.perf_counter() - start)
+            except OSError as exc:
+                errors.append(exc)
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    return {'requests': len(latencies), 'errors': len(errors), 'rps': len(latencies) / duration,
+            'p50_ms': pick(0.50), 'p99_ms': pick(0.99)}
+
+
+def open_streams(port, count):
+    # Idle order streams, as open courier dashboards hold them; closed with the server
+    token = login(port)
+    streams = []
+    for _ in range(count):
+        threading.Thread(target=lambda: streams.append(urllib.request.urlopen(
+            f'http://127.0.0.1:{port}/api/orders/stream?token={token}', timeout=60)), daemon=True).start()
+    return streams
+
+
+def run_server(name, command, port, env, args, streams=0):
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        open_streams(port, streams)
+        result = load(port, args.concurrency, args.duration)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    print(f"{name:28} {result['rps']:8.0f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+          f"p99 {result['p99_ms']:7.1f} ms  errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--streams', type=int, default=200, help='order streams held open during the second run')
+    args = parser.parse_args()
+
+    path = make_database(args.orders)
+    env = dict(os.environ, DATABASE=path)
+    run_server('dev server (app.run)', [sys.executable, '-c', DEV_SERVER.format(port=5101)], 5101, env, args)
+    serve = [sys.executable, 'serve.py', '--workers', str(args.workers)]
+    run_server(f'serve.py x{args.workers}', serve + ['--port', '5102', '--stream-port', '5202'], 5102, env, args)
+    run_server(f'serve.py x{args.workers}, {args.streams} streams',
+               serve + ['--port', '5103', '--stream-port', '5203'], 5103, env, args, args.streams)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Order placement throughput as the number of shards grows: restaurants are spread evenly
+# over 1, 2, 4 and 8 databases and concurrent clients place orders round-robin across
+# them, with synchronous=NORMAL (the default) and FULL (an fsync per commit). Also times
+# the admin order listing, which fans out to every shard.
+# Run from backend/: python -m benchmarks.sharding [seconds] [threads]
+import sys
+import threading
+import time
+
+import db
+import shards
+from app import app
+from benchmarks.common import make_database, auth_headers, connection_factory, timed
+from benchmarks.group_commit import percentile
+
+SHARD_COUNTS = (1, 2, 4, 8)
+RESTAURANTS = 32
+ORDERS = 20000
+
+
+def spread_restaurants(count):
+    # Restaurant n on shard n % count, and the first menu item of each restaurant
+    with app.app_context():
+        directory = db.get_db()
+        items = dict(directory.execute('SELECT restaurant_id, min(id) FROM menu_items GROUP BY restaurant_id'))
+        for restaurant_id in items:
+            shard = restaurant_id % count
+            shards.move_restaurant(directory, restaurant_id, shard, shards.get_shard_db(shard) if shard else None)
+    return sorted(items.items())
+
+
+def place_orders(headers, menu, seconds, threads):
+    latencies, failures = [], []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def worker(n):
+        client = app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            restaurant_id, menu_item_id = menu[(n + len(local) * threads) % len(menu)]
+            start = time.perf_counter()
+            response = client.post('/api/orders', headers=headers, json={
+                'restaurant_id': restaurant_id, 'delivery_address': 'Shard St',
+                'items': [{'menu_item_id': menu_item_id, 'quantity': 2}]})
+            local.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                failures.append(response.status_code)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latencies), time.perf_counter() - started, failures
+
+
+def run(seconds=5, threads=16):
+    default_synchronous = dict(db.PRAGMAS)['synchronous']
+    print(f"{'synchronous':>11} {'shards':>7} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'listing ms':>11}")
+    for synchronous in (default_synchronous, 'FULL'):
+        db.PRAGMAS[:] = [(name, synchronous if name == 'synchronous' else value) for name, value in db.PRAGMAS]
+        for count in SHARD_COUNTS:
+            app.config['SHARDS'] = str(count)
+            app.config['DB_POOL_SIZE'] = threads
+            path = make_database(ORDERS, restaurants=RESTAURANTS)
+            app.extensions['db_pool'] = db.ConnectionPool(path, size=threads, factory=connection_factory())
+            menu = spread_restaurants(count)
+            client = app.test_client()
+            headers = auth_headers(client, 'customer')
+            latencies, elapsed, failures = place_orders(headers, menu, seconds, threads)
+            admin = auth_headers(client, 'admin')
+            listing = timed(lambda: client.get('/api/orders?limit=50', headers=admin), repeat=20)
+            print(f'{synchronous:>11} {count:>7} {len(latencies) / elapsed:>9.0f} '
+                  f'{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} '
+                  f'{listing * 1000:>11.2f}' + (f'  {len(failures)} failed' if failures else ''))
+    db.PRAGMAS[:] = [(name, default_synchronous if name == 'synchronous' else value) for name, value in db.PRAGMAS]
+    app.config['SHARDS'] = None
+    app.config.pop('DB_POOL_SIZE')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A cached response body plus its strong ETag
+CacheEntry = namedtuple('CacheEntry', ['body', 'etag', 'stored_at'])
+
+
+class CatalogCache:
+    # Bounded LRU of pre-serialized catalog responses (restaurant list, menus).
+    # Mutation routes invalidate the keys they touch; the TTL bounds staleness
+    # when several worker processes each hold their own copy.
+    def __init__(self, max_entries=1024, ttl=60, dumps=lambda data: json.dumps(data).encode()):
+        self.max_entries = max_entries
+        self.dumps = dumps
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, data, version):
+        # version is the value of self.version read before loading data; if an
+        # invalidation happened meanwhile the result may be stale, so serve it
+        # without caching it
+        body = self.dumps(data)
+        entry = CacheEntry(body, hashlib.sha256(body).hexdigest()[:32], time.monotonic())
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'version': self.version,
+            }
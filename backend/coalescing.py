@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import Future
+
+# Request coalescing ("singleflight"): concurrent calls with the same key share one
+# execution and its result, so a burst of identical queries runs once. With ttl > 0
+# results are also kept for that many seconds (a micro-cache); invalidate() drops them
+# and keeps results of calls already in flight from being stored.
+MAX_ENTRIES = 1024
+
+
+class SingleFlight:
+    def __init__(self, ttl=0, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.hits = 0
+        self._calls = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        # fn()'s result, computed at most once for all concurrent callers with this key.
+        # The result is shared between callers and must not be modified.
+        with self._lock:
+            now = time.monotonic()
+            result = self._results.get(key)
+            if result is not None and now - result[1] < self.ttl:
+                self.hits += 1
+                return result[0]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                version = self.version
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+        try:
+            value = fn()
+        except Exception as exc:
+            with self._lock:
+                del self._calls[key]
+            call.set_exception(exc)
+            raise
+        with self._lock:
+            del self._calls[key]
+            if self.ttl > 0 and version == self.version:
+                if len(self._results) >= self.max_entries:
+                    self._results = {k: r for k, r in self._results.items() if now - r[1] < self.ttl}
+                if len(self._results) < self.max_entries:
+                    self._results[key] = (value, now)
+        call.set_result(value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'executions': self.executions, 'coalesced': self.coalesced, 'hits': self.hits,
+                    'in_flight': len(self._calls), 'entries': len(self._results), 'ttl': self.ttl}
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import time
+from queue import Queue, Empty, Full
+from urllib.parse import quote
+from flask import current_app, g, has_request_context, request
+
+# Connection tuning applied to every pooled connection
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),        # ~16 MB page cache
+    ('mmap_size', 134217728),      # 128 MB memory-mapped I/O
+    ('busy_timeout', 5000),
+    ('temp_store', 'MEMORY'),
+]
+
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+
+# Seconds a client's reads stay on the primary after it writes, when reads go to a replica.
+# Writes answer with the time in WRITE_MARKER_HEADER and the client sends it back, so the
+# marker reaches whichever worker process serves the next request.
+READ_AFTER_WRITE_SECONDS = 10
+WRITE_MARKER_HEADER = 'X-Wrote-At'
+
+
+def connect(database, factory=sqlite3.Connection, read_only=False):
+    # Read-only connections (mode=ro) can never take the write lock
+    if read_only:
+        database = f'file:{quote(os.path.abspath(database))}?mode=ro'
+    conn = sqlite3.connect(database, check_same_thread=False, uri=read_only,
+                           cached_statements=STATEMENT_CACHE_SIZE, factory=factory)
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, database, size=POOL_SIZE, factory=sqlite3.Connection, read_only=False):
+        self.database = database
+        self.factory = factory
+        self.read_only = read_only
+        self._idle = Queue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return connect(self.database, self.factory, self.read_only)
+
+    def release(self, conn):
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+
+def init_app(app):
+    app.extensions['db_pool'] = ConnectionPool(app.config['DATABASE'],
+                                               app.config.get('DB_POOL_SIZE', POOL_SIZE),
+                                               app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection))
+    init_read_pool(app)
+    app.after_request(mark_write)
+    app.teardown_appcontext(close_db)
+
+
+def init_read_pool(app):
+    # Read-only connections for the read routes: the primary file itself, or a replica
+    # refreshed by replica.py, in which case recent writers keep reading the primary
+    replica = app.config.get('READ_REPLICA')
+    app.extensions['db_read_pool'] = ConnectionPool(replica or app.config['DATABASE'],
+                                                    app.config.get('DB_POOL_SIZE', POOL_SIZE),
+                                                    app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection),
+                                                    read_only=True)
+
+
+def get_db():
+    # One pooled connection per app context, returned to the pool on teardown
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].acquire()
+    return g.db
+
+
+def get_read_db(user_id=None, consistent=False):
+    # Read-only connection for this app context. Falls back to the primary connection when
+    # the context already has one, when user_id wrote recently (read-your-writes) or when
+    # the caller cannot tolerate replica lag.
+    if 'db' in g or wrote_recently(user_id) or (
+            consistent and current_app.config.get('READ_REPLICA')):
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = current_app.extensions['db_read_pool'].acquire()
+    return g.read_db
+
+
+def wrote_recently(user_id):
+    # Whether the signed-in client sent the marker of one of its writes within the window
+    if user_id is None or not has_request_context() or not current_app.config.get('READ_REPLICA'):
+        return False
+    try:
+        wrote_at = float(request.headers.get(WRITE_MARKER_HEADER, ''))
+    except ValueError:
+        return False
+    window = current_app.config.get('READ_AFTER_WRITE_SECONDS', READ_AFTER_WRITE_SECONDS)
+    return 0 <= time.time() - wrote_at < window
+
+
+def mark_write(response):
+    if request.method in ('POST', 'PUT', 'DELETE') and response.status_code < 400 and hasattr(request, 'current_user'):
+        response.headers[WRITE_MARKER_HEADER] = f'{time.time():.3f}'
+    return response
+
+
+def close_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].release(conn)
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        current_app.extensions['db_read_pool'].release(conn)
@@ -0,0 +1,238 @@
+import math
+import time
+from collections import defaultdict
+
+from responses import fetch_dicts
+
+# Open orders (confirmed, no courier, restaurant with coordinates) are kept in the
+# open_orders_index R*Tree by the triggers from migration 4, keyed by order id and
+# indexed by pickup location.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Couriers whose last location is older than this are not dispatched
+COURIER_LOCATION_MAX_AGE = 600
+
+DEFAULT_RADIUS_KM = 2.0
+MAX_RADIUS_KM = 25.0
+
+
+def parse_coordinates(latitude, longitude):
+    # (lat, lng) as floats; raises ValueError for missing or out-of-range values
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid coordinates')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('Invalid coordinates')
+    return latitude, longitude
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    # Haversine great-circle distance
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    # (south, north, west, east) enclosing the circle, with a margin for the
+    # Earth not being a sphere; generous near the poles
+    radius_km *= 1.01
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+
+
+def nearest_open_orders(c, latitude, longitude, limit, max_radius_km=MAX_RADIUS_KM):
+    # The `limit` open orders with the closest pickups. Searches a small box first and
+    # doubles it until enough orders are certainly within range (or max_radius_km).
+    radius = min(DEFAULT_RADIUS_KM, max_radius_km)
+    while True:
+        south, north, west, east = bounding_box(latitude, longitude, radius)
+        c.execute('''SELECT o.id, o.restaurant_id, r.name AS restaurant_name,
+                            r.latitude AS pickup_latitude, r.longitude AS pickup_longitude,
+                            o.delivery_address, o.delivery_latitude, o.delivery_longitude,
+                            o.total_amount, o.created_at
+                     FROM open_orders_index g
+                     JOIN orders o ON o.id = g.id
+                     JOIN restaurants r ON r.id = o.restaurant_id
+                     WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lng >= ? AND g.min_lng <= ?''',
+                  (south, north, west, east))
+        within = []
+        for order in fetch_dicts(c):
+            order['distance_km'] = round(distance_km(latitude, longitude, order['pickup_latitude'],
+                                                     order['pickup_longitude']), 3)
+            if order['distance_km'] <= radius:
+                within.append(order)
+        if len(within) >= limit or radius >= max_radius_km:
+            within.sort(key=lambda order: (order['distance_km'], order['id']))
+            return within[:limit]
+        radius = min(radius * 2, max_radius_km)
+
+
+def available_couriers(c, max_age=COURIER_LOCATION_MAX_AGE):
+    # Couriers with a recent location and no order in progress
+    c.execute('''SELECT cl.courier_id, cl.latitude, cl.longitude
+                 FROM courier_locations cl
+                 WHERE cl.updated_at >= datetime('now', ?)
+                   AND NOT EXISTS (SELECT 1 FROM orders o
+                                   WHERE o.delivery_guy_id = cl.courier_id
+                                     AND o.status IN ('accepted', 'picked_up'))''',
+              (f'-{int(max_age)} seconds',))
+    return c.fetchall()
+
+
+def open_order_locations(c):
+    c.execute('SELECT id, min_lat, min_lng FROM open_orders_index')
+    return c.fetchall()
+
+
+class Grid:
+    # Points bucketed into square cells on a local equirectangular projection, which
+    # is accurate to well under 1% across a city. Cells are sized from the point
+    # density so each holds a handful of points.
+    def __init__(self, points, reference_latitude):
+        self.x_scale = KM_PER_DEGREE * math.cos(math.radians(reference_latitude))
+        projected = [(*self.project(latitude, longitude), point_id) for point_id, latitude, longitude in points]
+        if projected:
+            xs = [x for x, _, _ in projected]
+            ys = [y for _, y, _ in projected]
+            area = max((max(xs) - min(xs)) * (max(ys) - min(ys)), 1.0)
+            self.cell_km = max(math.sqrt(area / len(projected)) * 2, 0.05)
+        else:
+            self.cell_km = 1.0
+        self.cells = defaultdict(list)
+        for x, y, point_id in projected:
+            self.cells[int(x // self.cell_km), int(y // self.cell_km)].append((x, y, point_id))
+
+    def project(self, latitude, longitude):
+        return longitude * self.x_scale, latitude * KM_PER_DEGREE
+
+    def nearest(self, latitude, longitude, k, max_km):
+        # Up to k (distance, id) within max_km, nearest first. Rings of cells are
+        # visited outwards until no unvisited cell can hold anything closer.
+        x, y = self.project(latitude, longitude)
+        size, cells = self.cell_km, self.cells
+        cx, cy = int(x // size), int(y // size)
+        limit = max_km * max_km
+        found = []
+        for ring in range(int(max_km // size) + 2):
+            for cell in ring_cells(cx, cy, ring):
+                for px, py, point_id in cells.get(cell, ()):
+                    squared = (px - x) ** 2 + (py - y) ** 2
+                    if squared <= limit:
+                        found.append((squared, point_id))
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (ring * size) ** 2:
+                    break
+        found.sort()
+        return [(math.sqrt(squared), point_id) for squared, point_id in found[:k]]
+
+
+def ring_cells(cx, cy, ring):
+    if ring == 0:
+        return ((cx, cy),)
+    cells = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+    cells += [(cx + dx, cy + dy) for dy in range(-ring + 1, ring) for dx in (-ring, ring)]
+    return cells
+
+
+def plan_assignments(couriers, orders, max_distance_km, candidates=8):
+    # Greedy matching that minimizes pickup distance: every courier proposes its
+    # `candidates` nearest orders within range, then (courier, order) pairs are taken
+    # shortest first, each courier and order at most once
+    if not couriers or not orders:
+        return []
+    grid = Grid(orders, sum(latitude for _, latitude, _ in orders) / len(orders))
+    pairs = []
+    for courier_id, latitude, longitude in couriers:
+        pairs += [(distance, courier_id, order_id)
+                  for distance, order_id in grid.nearest(latitude, longitude, candidates, max_distance_km)]
+    pairs.sort()
+    taken_couriers, taken_orders = set(), set()
+    assignments = []
+    for distance, courier_id, order_id in pairs:
+        if courier_id in taken_couriers or order_id in taken_orders:
+            continue
+        taken_couriers.add(courier_id)
+        taken_orders.add(order_id)
+        assignments.append((courier_id, order_id, distance))
+    return assignments
+
+
+def dispatch_batch(conn, max_distance_km, candidates=8, max_age=COURIER_LOCATION_MAX_AGE, couriers=None):
+    # Plan and apply one batch of assignments in a single write transaction, for the given
+    # (courier_id, latitude, longitude) or the available_couriers() of this database.
+    # Returns ([(courier_id, order_id, distance_km)], decision seconds).
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.perf_counter()
+        if couriers is None:
+            couriers = available_couriers(c, max_age)
+        orders = open_order_locations(c) if couriers else []
+        planned = plan_assignments(couriers, orders, max_distance_km, candidates)
+        decided = time.perf_counter() - started
+        applied = apply_assignments(c, planned)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied, decided
+
+
+def dispatch_databases(conns, couriers, max_distance_km, candidates=8):
+    # dispatch_batch() over several databases holding disjoint orders: one plan over all
+    # their open orders, so every courier gets the nearest order wherever it lives, then
+    # applied to each database. All of them stay write-locked from read to commit.
+    cursors = [conn.cursor() for conn in conns]
+    try:
+        for c in cursors:
+            c.execute('BEGIN IMMEDIATE')
+        started = time.perf_counter()
+        owners, orders = {}, []
+        for c in cursors:
+            for order in open_order_locations(c) if couriers else []:
+                owners[order[0]] = c
+                orders.append(order)
+        planned = plan_assignments(couriers, orders, max_distance_km, candidates)
+        decided = time.perf_counter() - started
+        applied = []
+        for c in cursors:
+            applied += apply_assignments(c, [assignment for assignment in planned if owners[assignment[1]] is c])
+        for conn in conns:
+            conn.commit()
+    except Exception:
+        for conn in conns:
+            if conn.in_transaction:
+                conn.rollback()
+        raise
+    return applied, decided
+
+
+def apply_assignments(c, planned):
+    # Orders taken or cancelled since they were read are skipped
+    applied = []
+    for courier_id, order_id, distance in planned:
+        c.execute('''UPDATE orders SET delivery_guy_id = ?, status = 'accepted'
+                     WHERE id = ? AND status = 'confirmed' AND delivery_guy_id IS NULL''',
+                  (courier_id, order_id))
+        if c.rowcount:
+            applied.append((courier_id, order_id, round(distance, 3)))
+    return applied
+
+
+def rebuild_index(conn):
+    # Refill open_orders_index from orders, e.g. after a bulk load with triggers dropped
+    existing = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'open_orders_index'").fetchone()
+    if not existing:
+        return
+    conn.execute('DELETE FROM open_orders_index')
+    conn.execute('''INSERT INTO open_orders_index (id, min_lat, max_lat, min_lng, max_lng)
+                    SELECT o.id, r.latitude, r.latitude, r.longitude, r.longitude
+                    FROM orders o JOIN restaurants r ON r.id = o.restaurant_id
+                    WHERE o.status = 'confirmed' AND o.delivery_guy_id IS NULL
+                      AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL''')
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from collections import deque
+
+import db
+
+HEARTBEAT_INTERVAL = 15
+
+# Order event fields any courier may see about orders that are not theirs
+PUBLIC_FIELDS = ('order_id', 'restaurant_id', 'status')
+
+
+class MemoryBackend:
+    # Ring buffer of recent events shared by all threads of one process
+    def __init__(self, capacity=1000):
+        self._events = deque(maxlen=capacity)
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def publish(self, event_type, payload):
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, event_type, payload))
+            self._cond.notify_all()
+        return event_id
+
+    def latest_id(self):
+        with self._cond:
+            return self._next_id - 1
+
+    def read_since(self, last_id, timeout):
+        with self._cond:
+            if self._next_id - 1 <= last_id:
+                self._cond.wait(timeout)
+            newer = []
+            for event in reversed(self._events):
+                if event[0] <= last_id:
+                    break
+                newer.append(event)
+            newer.reverse()
+            return newer
+
+
+class SQLiteBackend:
+    # Events stored in the stream_events table so every worker process sees them. Reads go
+    # through run_blocking(fn, *args), which a gevent worker points at its threadpool so a
+    # query never blocks the hub while other streams wait.
+    def __init__(self, database, poll_interval=0.5, retention=10000):
+        self.database = database
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.run_blocking = lambda fn, *args: fn(*args)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def publish(self, event_type, payload):
+        with self._lock:
+            # Connect lazily so no connection is inherited by forked workers
+            if self._conn is None:
+                self._conn = db.connect(self.database)
+            c = self._conn.cursor()
+            c.execute('INSERT INTO stream_events (type, payload) VALUES (?, ?)',
+                      (event_type, json.dumps(payload)))
+            event_id = c.lastrowid
+            if event_id % 100 == 0:
+                c.execute('DELETE FROM stream_events WHERE id <= ?', (event_id - self.retention,))
+            self._conn.commit()
+        return event_id
+
+    def _reader(self):
+        # Each streaming (or threadpool) thread polls through its own connection
+        if not hasattr(self._local, 'conn'):
+            self._local.conn = db.connect(self.database)
+        return self._local.conn
+
+    def _fetch(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchall()
+
+    def latest_id(self):
+        return self.run_blocking(self._fetch, 'SELECT COALESCE(MAX(id), 0) FROM stream_events')[0][0]
+
+    def read_since(self, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self.run_blocking(self._fetch, '''SELECT id, type, payload FROM stream_events
+                                                      WHERE id > ? ORDER BY id LIMIT 500''', (last_id,))
+            if rows or time.monotonic() >= deadline:
+                return [(event_id, event_type, json.loads(payload)) for event_id, event_type, payload in rows]
+            time.sleep(self.poll_interval)
+
+
+class EventHub:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def publish(self, event_type, **payload):
+        return self.backend.publish(event_type, payload)
+
+    def stream(self, last_id, accept, heartbeat=HEARTBEAT_INTERVAL):
+        # Server-Sent Events for every event after last_id, with the payload accept(type, payload)
+        # returns (None to skip it). When events after last_id have already left the buffer the
+        # client gets a `resync` event first and should reload its state.
+        latest = self.backend.latest_id()
+        if last_id is None or last_id > latest:
+            # Fresh subscriber, or an id from before a restart: start from now
+            last_id = latest
+        yield f'retry: 3000\nid: {last_id}\n\n'
+        while True:
+            events = self.backend.read_since(last_id, heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            if events[0][0] > last_id + 1:
+                yield 'event: resync\ndata: {}\n\n'
+            for event_id, event_type, payload in events:
+                last_id = event_id
+                payload = accept(event_type, payload)
+                if payload is not None:
+                    yield f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(payload)}\n\n'
+
+
+def order_event_filter(role, user_id):
+    # The payload of an order event a given user may see, or None
+    def accept(event_type, payload):
+        if role == 'admin':
+            return payload
+        if role == 'restaurant':
+            return payload if payload.get('owner_id') == user_id else None
+        if role == 'delivery':
+            if payload.get('delivery_guy_id') == user_id:
+                return payload
+            # Newly available orders, and other couriers' assignments so taken orders drop off,
+            # without the customer, owner or courier behind them
+            available = payload.get('status') == 'confirmed' and payload.get('delivery_guy_id') is None
+            if event_type == 'assigned' or available:
+                return {key: payload.get(key) for key in PUBLIC_FIELDS}
+            return None
+        return payload if payload.get('user_id') == user_id else None
+    return accept
+
+
+def create_backend(name, database):
+    if name == 'sqlite':
+        return SQLiteBackend(database)
+    return MemoryBackend()
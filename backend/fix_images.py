@@ -1,27 +1,28 @@
+import json
 import sqlite3
 
 DATABASE = 'food_delivery.db'
 
+# (menu item name, working image URL)
+IMAGE_FIXES = [
+    ('Bacon Burger', 'https://images.unsplash.com/photo-1553979459-d2229ba7433a?w=400&h=300&fit=crop&q=80'),
+    ('Tuna Roll', 'https://images.unsplash.com/photo-1611143669185-af800c5eabef?w=400&h=300&fit=crop&q=80'),
+]
+
 def fix_broken_images():
     conn = sqlite3.connect(DATABASE)
     c = conn.cursor()
     
-    # Fix Bacon Burger image
-    c.execute('''UPDATE menu_items 
-                 SET image_url = ? 
-                 WHERE name = ?''', 
-              ('https://images.unsplash.com/photo-1553979459-d2229ba7433a?w=400&h=300&fit=crop&q=80', 'Bacon Burger'))
-    
-    # Fix Tuna Roll image
-    c.execute('''UPDATE menu_items 
-                 SET image_url = ? 
-                 WHERE name = ?''', 
-              ('https://images.unsplash.com/photo-1611143669185-af800c5eabef?w=400&h=300&fit=crop&q=80', 'Tuna Roll'))
+    # All fixes in one statement (one pass over menu_items) instead of an UPDATE per item
+    c.execute('''UPDATE menu_items
+                 SET image_url = json_extract(fix.value, '$[1]')
+                 FROM json_each(?) fix
+                 WHERE menu_items.name = json_extract(fix.value, '$[0]')''',
+              (json.dumps(IMAGE_FIXES),))
     
     conn.commit()
     conn.close()
-    print("✅ Fixed broken images for Bacon Burger and Tuna Roll!")
+    print(f"✅ Fixed broken images for {', '.join(name for name, _ in IMAGE_FIXES)}!")
 
 if __name__ == '__main__':
     fix_broken_images()
-
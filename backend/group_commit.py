@@ -0,0 +1,173 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from flask import current_app
+
+import db
+
+# Group commit: request threads hand units of work to a single writer thread, which
+# runs them back to back in one transaction and commits once per batch, so a burst of
+# N writes takes the write lock (and syncs) once instead of N times. A batch closes
+# at max_batch items or max_delay seconds after its first item arrived; max_delay = 0
+# only batches what queued up during the previous commit. A request waits at most
+# timeout seconds for its batch to start before giving up with WriterUnavailable.
+MAX_BATCH = 64
+MAX_DELAY = 0.002
+TIMEOUT = 10
+
+_STOP = object()
+
+
+class WriterUnavailable(Exception):
+    pass
+
+
+class GroupCommitWriter:
+    def __init__(self, database, max_batch=MAX_BATCH, max_delay=MAX_DELAY, factory=sqlite3.Connection,
+                 timeout=TIMEOUT):
+        self.database = database
+        self.factory = factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, work, timeout=None):
+        # Run work(cursor) in the next batch and return its result once the batch has
+        # committed. If work raises, only its own changes are rolled back and the
+        # exception is re-raised here. Raises WriterUnavailable when the writer stops or
+        # the batch has not started within timeout (default self.timeout) seconds; the
+        # work then never runs. A batch already running is waited for, so the caller
+        # always learns whether its work committed.
+        future = Future()
+        self.queue.put((work, future))
+        self._ensure_started()
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriterUnavailable('Timed out waiting for the order writer')
+        return future.result()
+
+    def _ensure_started(self):
+        # Started on first use, so a forked worker process gets its own thread. Called
+        # after queueing: work queued while a stopping thread drains the queue is either
+        # failed by it or left for the thread started here.
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        batch = []
+        try:
+            conn = db.connect(self.database, self.factory)
+            try:
+                stopping = False
+                while not stopping:
+                    item = self.queue.get()
+                    if item is _STOP:
+                        break
+                    batch = [item]
+                    deadline = time.monotonic() + self.max_delay
+                    while len(batch) < self.max_batch:
+                        remaining = deadline - time.monotonic()
+                        try:
+                            item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        batch.append(item)
+                    self._commit(conn, batch)
+                    batch = []
+            finally:
+                conn.close()
+        finally:
+            self._fail_pending(batch)
+
+    def _fail_pending(self, batch):
+        # The thread is exiting, stopped or crashed: fail the work it will never run so
+        # no request waits on it
+        pending = list(batch)
+        with self.lock:
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    pending.append(item)
+            self.thread = None
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(WriterUnavailable('Order writer stopped'))
+
+    def _commit(self, conn, batch):
+        # Skip work whose request already gave up; the rest can no longer be cancelled
+        batch = [(work, future) for work, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        c = conn.cursor()
+        outcomes = []
+        try:
+            c.execute('BEGIN IMMEDIATE')
+            for work, future in batch:
+                c.execute('SAVEPOINT item')
+                try:
+                    outcomes.append((future, work(c), None))
+                    c.execute('RELEASE item')
+                except Exception as exc:
+                    c.execute('ROLLBACK TO item')
+                    c.execute('RELEASE item')
+                    outcomes.append((future, None, exc))
+            conn.commit()
+        except Exception as exc:
+            # The transaction itself failed: nothing in this batch was written
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        with self.lock:
+            self.batches += 1
+            self.items += sum(exc is None for _, _, exc in outcomes)
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+    def stats(self):
+        with self.lock:
+            return {'batches': self.batches, 'items': self.items, 'queued': self.queue.qsize(),
+                    'mean_batch': self.items / self.batches if self.batches else 0.0}
+
+    def close(self):
+        thread = self.thread
+        if thread is not None and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join()
+
+
+def init_app(app):
+    # One writer per shard database (see shards.py); order_writer is shard 0's
+    app.extensions['order_writers'] = [GroupCommitWriter(
+        database, app.config.get('ORDER_BATCH_SIZE', MAX_BATCH),
+        app.config.get('ORDER_BATCH_DELAY_MS', MAX_DELAY * 1000) / 1000,
+        app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection),
+        app.config.get('ORDER_WRITER_TIMEOUT', TIMEOUT))
+        for database in app.config.get('SHARD_DATABASES', [app.config['DATABASE']])]
+    app.extensions['order_writer'] = app.extensions['order_writers'][0]
+
+
+def get_writer(shard=0):
+    return current_app.extensions['order_writers'][shard]
@@ -0,0 +1,181 @@
+import argparse
+import csv
+import io
+import json
+import math
+import time
+
+import db
+
+# Bulk menu import: rows streamed from CSV (with a header row) or NDJSON are validated
+# one at a time and written CHUNK_SIZE at a time, one transaction per chunk. An item is
+# matched by (restaurant_id, name): existing items are updated, with empty fields keeping
+# their current value, and new items are inserted (they need a price). Only the current
+# chunk is held in memory, and at most MAX_ERRORS row errors are reported.
+CHUNK_SIZE = 5000
+MAX_ERRORS = 1000
+FIELDS = ('restaurant_id', 'name', 'description', 'price', 'image_url', 'category')
+TEXT_FIELDS = ('name', 'description', 'image_url', 'category')
+
+MIMETYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+STAGING = '''CREATE TEMP TABLE IF NOT EXISTS menu_import
+             (line INTEGER, restaurant_id INTEGER, name TEXT, description TEXT,
+              price REAL, image_url TEXT, category TEXT)'''
+EXISTING = '''EXISTS (SELECT 1 FROM menu_items m
+                      WHERE m.restaurant_id = s.restaurant_id AND m.name = s.name)'''
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors = []
+        self.restaurants = set()
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'error': error})
+
+    def as_dict(self):
+        return {'inserted': self.inserted, 'updated': self.updated, 'rejected': self.rejected,
+                'errors': sorted(self.errors, key=lambda error: error['line']),
+                'errors_truncated': self.rejected > len(self.errors)}
+
+
+def read_csv(stream):
+    # (line number, row) pairs from a binary stream
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def validate(row, allowed, default_restaurant_id=None):
+    # Row values in FIELDS order; raises ValueError naming the problem
+    if not isinstance(row, dict):
+        raise ValueError('Expected a JSON object')
+    values = {}
+    for field in FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        values[field] = value
+    # int(True) and float(True) succeed, so JSON booleans are rejected up front
+    if isinstance(values['restaurant_id'], bool):
+        raise ValueError('Invalid restaurant_id')
+    try:
+        restaurant_id = int(values['restaurant_id'] or default_restaurant_id)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid restaurant_id')
+    if restaurant_id not in allowed:
+        raise ValueError('Not your restaurant')
+    values['restaurant_id'] = restaurant_id
+    if values['name'] is None:
+        raise ValueError('Name required')
+    for field in TEXT_FIELDS:
+        if values[field] is not None and not isinstance(values[field], str):
+            raise ValueError(f'Invalid {field}')
+    if values['price'] is not None:
+        if isinstance(values['price'], bool):
+            raise ValueError('Invalid price')
+        try:
+            values['price'] = float(values['price'])
+        except (TypeError, ValueError):
+            raise ValueError('Invalid price')
+        if not math.isfinite(values['price']) or values['price'] < 0:
+            raise ValueError('Invalid price')
+    return tuple(values[field] for field in FIELDS)
+
+
+def write_chunk(conn, chunk, report):
+    # chunk maps (restaurant_id, name) to (line, values) for the last row naming that item
+    with conn:
+        conn.execute('DELETE FROM temp.menu_import')
+        conn.executemany('INSERT INTO temp.menu_import VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         [(line, *values) for line, values in chunk.values()])
+        for (line,) in conn.execute(f'SELECT line FROM temp.menu_import s WHERE price IS NULL AND NOT {EXISTING}'):
+            report.reject(line, 'Price required for new items')
+        # Count import rows matching an item, not menu rows touched: a menu may repeat a name
+        report.updated += conn.execute(f'SELECT COUNT(*) FROM temp.menu_import s WHERE {EXISTING}').fetchone()[0]
+        conn.execute('''UPDATE menu_items
+                        SET description = coalesce(s.description, menu_items.description),
+                            price = coalesce(s.price, menu_items.price),
+                            image_url = coalesce(s.image_url, menu_items.image_url),
+                            category = coalesce(s.category, menu_items.category)
+                        FROM temp.menu_import s
+                        WHERE menu_items.restaurant_id = s.restaurant_id
+                          AND menu_items.name = s.name''')
+        report.inserted += conn.execute(f'''INSERT INTO menu_items (restaurant_id, name, description, price, image_url, category)
+                                            SELECT restaurant_id, name, description, price, image_url, category
+                                            FROM temp.menu_import s
+                                            WHERE price IS NOT NULL AND NOT {EXISTING}
+                                            ORDER BY line''').rowcount
+
+
+def import_menu(conn, rows, allowed, default_restaurant_id=None, chunk_size=CHUNK_SIZE):
+    # Upsert (line number, row) pairs into the menus of the restaurant ids in `allowed`
+    conn.execute(STAGING)
+    report = ImportReport()
+    chunk = {}
+    line = 0
+    try:
+        for line, row in rows:
+            try:
+                values = validate(row, allowed, default_restaurant_id)
+            except ValueError as exc:
+                report.reject(line, str(exc))
+                continue
+            chunk.pop(values[:2], None)
+            chunk[values[:2]] = (line, values)
+            report.restaurants.add(values[0])
+            if len(chunk) >= chunk_size:
+                write_chunk(conn, chunk, report)
+                chunk = {}
+    except (csv.Error, UnicodeDecodeError) as exc:
+        report.reject(line + 1, f'Unreadable input, import stopped: {exc}')
+    if chunk:
+        write_chunk(conn, chunk, report)
+    return report
+
+
+def format_for(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import menu items from a CSV or NDJSON file')
+    parser.add_argument('path')
+    parser.add_argument('--database', default='food_delivery.db')
+    parser.add_argument('--format', choices=sorted(READERS), help='default: from the file extension')
+    parser.add_argument('--restaurant-id', type=int, help='restaurant for rows without a restaurant_id')
+    args = parser.parse_args()
+    conn = db.connect(args.database)
+    allowed = {row[0] for row in conn.execute('SELECT id FROM restaurants')}
+    started = time.perf_counter()
+    with open(args.path, 'rb') as stream:
+        report = import_menu(conn, READERS[args.format or format_for(args.path)](stream), allowed, args.restaurant_id)
+    result = report.as_dict()
+    print(f"{result['inserted']} inserted, {result['updated']} updated, {result['rejected']} rejected "
+          f'in {time.perf_counter() - started:.1f}s')
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    conn.close()
@@ -0,0 +1,170 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_QUERY_SECONDS = 0.1
+
+# SQL statistics for the request running on this thread (or greenlet under gevent)
+_current = threading.local()
+
+
+def _record_sql(sql, params, elapsed, statements=1):
+    _current.queries = getattr(_current, 'queries', 0) + statements
+    _current.sql_time = getattr(_current, 'sql_time', 0.0) + elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        registry.observe_slow_query()
+        logger.warning('Slow query (%.1f ms): %s params=%r', elapsed * 1000, ' '.join(sql.split()), params)
+
+
+def _add_fetch_time(elapsed):
+    # SQLite steps through most of a SELECT while rows are fetched, not in execute()
+    _current.sql_time = getattr(_current, 'sql_time', 0.0) + elapsed
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _record_sql(sql, params, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            _record_sql(sql, '<executemany>', time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _add_fetch_time(time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size if size is not None else self.arraysize)
+        finally:
+            _add_fetch_time(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _add_fetch_time(time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection factory whose cursors (including conn.execute) record SQL timings
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.total}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(Histogram)       # (method, route) -> request seconds
+        self.sql_time = defaultdict(Histogram)      # (method, route) -> SQL seconds per request
+        self.responses = defaultdict(int)           # (method, route, status) -> count
+        self.queries = defaultdict(int)             # (method, route) -> statements
+        self.slow_queries = 0
+
+    def observe_request(self, method, route, status, elapsed, queries, sql_time):
+        with self.lock:
+            self.latency[(method, route)].observe(elapsed)
+            self.sql_time[(method, route)].observe(sql_time)
+            self.responses[(method, route, status)] += 1
+            self.queries[(method, route)] += queries
+
+    def observe_slow_query(self):
+        with self.lock:
+            self.slow_queries += 1
+
+    def render(self, counters=(), gauges=()):
+        # Prometheus text exposition format; counters get the _total suffix
+        with self.lock:
+            lines = ['# HELP http_request_duration_seconds Request latency by route.',
+                     '# TYPE http_request_duration_seconds histogram']
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('http_request_duration_seconds', f'method="{method}",route="{route}"'))
+            lines += ['# HELP http_requests_total Responses by route and status.',
+                      '# TYPE http_requests_total counter']
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            lines += ['# HELP db_queries_total SQL statements executed by route.',
+                      '# TYPE db_queries_total counter']
+            for (method, route), count in sorted(self.queries.items()):
+                lines.append(f'db_queries_total{{method="{method}",route="{route}"}} {count}')
+            lines += ['# HELP db_request_sql_seconds Total SQL time per request by route.',
+                      '# TYPE db_request_sql_seconds histogram']
+            for (method, route), histogram in sorted(self.sql_time.items()):
+                lines.extend(histogram.lines('db_request_sql_seconds', f'method="{method}",route="{route}"'))
+            lines += ['# HELP db_slow_queries_total Statements slower than the slow query threshold.',
+                      '# TYPE db_slow_queries_total counter',
+                      f'db_slow_queries_total {self.slow_queries}']
+        for name, help_text, value in counters:
+            lines += [f'# HELP {name}_total {help_text}', f'# TYPE {name}_total counter', f'{name}_total {value}']
+        for name, help_text, value in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def init_app(app):
+    global SLOW_QUERY_SECONDS
+    SLOW_QUERY_SECONDS = app.config.get('SLOW_QUERY_MS', 100) / 1000
+
+    @app.before_request
+    def start_timer():
+        _current.queries = 0
+        _current.sql_time = 0.0
+        _current.started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = getattr(_current, 'started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.observe_request(request.method, route, response.status_code,
+                                     time.perf_counter() - started, _current.queries, _current.sql_time)
+            _current.started = None
+        return response
@@ -0,0 +1,301 @@
+import sys
+
+import db
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each step is either an SQL string or a callable taking the connection. Steps are frozen
+# copies of the SQL as it was when the migration shipped, not calls into modules that may
+# change later: an applied migration must mean the same thing on every database.
+MIGRATIONS = [
+    (1, 'Indexes for order listings, item lookups and menus', [
+        'CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_restaurant ON orders (restaurant_id, created_at, id)',
+        '''CREATE INDEX IF NOT EXISTS idx_orders_delivery ON orders (delivery_guy_id, created_at, id)
+           WHERE delivery_guy_id IS NOT NULL''',
+        '''CREATE INDEX IF NOT EXISTS idx_orders_unassigned ON orders (created_at, id)
+           WHERE status = 'confirmed' AND delivery_guy_id IS NULL''',
+        'CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)',
+        'CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant ON menu_items (restaurant_id)',
+        'CREATE INDEX IF NOT EXISTS idx_restaurants_owner ON restaurants (owner_id)',
+    ]),
+    (2, 'Event stream table shared by worker processes', [
+        '''CREATE TABLE IF NOT EXISTS stream_events
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    ]),
+    (3, 'Full-text search over restaurants and menu items', [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS restaurants_fts USING fts5
+           (name, description, cuisine_type, content='restaurants', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+        '''CREATE TRIGGER IF NOT EXISTS restaurants_fts_insert AFTER INSERT ON restaurants BEGIN
+             INSERT INTO restaurants_fts (rowid, name, description, cuisine_type)
+             VALUES (new.id, new.name, new.description, new.cuisine_type);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS restaurants_fts_delete AFTER DELETE ON restaurants BEGIN
+             INSERT INTO restaurants_fts (restaurants_fts, rowid, name, description, cuisine_type)
+             VALUES ('delete', old.id, old.name, old.description, old.cuisine_type);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS restaurants_fts_update
+           AFTER UPDATE OF name, description, cuisine_type ON restaurants BEGIN
+             INSERT INTO restaurants_fts (restaurants_fts, rowid, name, description, cuisine_type)
+             VALUES ('delete', old.id, old.name, old.description, old.cuisine_type);
+             INSERT INTO restaurants_fts (rowid, name, description, cuisine_type)
+             VALUES (new.id, new.name, new.description, new.cuisine_type);
+           END''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5
+           (name, description, category, content='menu_items', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+        '''CREATE TRIGGER IF NOT EXISTS menu_items_fts_insert AFTER INSERT ON menu_items BEGIN
+             INSERT INTO menu_items_fts (rowid, name, description, category)
+             VALUES (new.id, new.name, new.description, new.category);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS menu_items_fts_delete AFTER DELETE ON menu_items BEGIN
+             INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description, category)
+             VALUES ('delete', old.id, old.name, old.description, old.category);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS menu_items_fts_update
+           AFTER UPDATE OF name, description, category ON menu_items BEGIN
+             INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description, category)
+             VALUES ('delete', old.id, old.name, old.description, old.category);
+             INSERT INTO menu_items_fts (rowid, name, description, category)
+             VALUES (new.id, new.name, new.description, new.category);
+           END''',
+        "INSERT INTO restaurants_fts (restaurants_fts) VALUES ('rebuild')",
+        "INSERT INTO menu_items_fts (menu_items_fts) VALUES ('rebuild')",
+    ]),
+    (4, 'Coordinates, courier locations and a spatial index of open orders', [
+        'ALTER TABLE restaurants ADD COLUMN latitude REAL',
+        'ALTER TABLE restaurants ADD COLUMN longitude REAL',
+        'ALTER TABLE orders ADD COLUMN delivery_latitude REAL',
+        'ALTER TABLE orders ADD COLUMN delivery_longitude REAL',
+        '''CREATE TABLE IF NOT EXISTS courier_locations
+           (courier_id INTEGER PRIMARY KEY,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (courier_id) REFERENCES users(id))''',
+        '''CREATE INDEX IF NOT EXISTS idx_orders_active_courier ON orders (delivery_guy_id)
+           WHERE status IN ('accepted', 'picked_up')''',
+        # Pickup locations of confirmed, unassigned orders, keyed by order id
+        'CREATE VIRTUAL TABLE IF NOT EXISTS open_orders_index USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+        '''CREATE TRIGGER IF NOT EXISTS open_orders_index_insert AFTER INSERT ON orders
+           WHEN new.status = 'confirmed' AND new.delivery_guy_id IS NULL BEGIN
+             INSERT INTO open_orders_index (id, min_lat, max_lat, min_lng, max_lng)
+             SELECT new.id, latitude, latitude, longitude, longitude FROM restaurants
+             WHERE id = new.restaurant_id AND latitude IS NOT NULL AND longitude IS NOT NULL;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS open_orders_index_update AFTER UPDATE OF status, delivery_guy_id ON orders
+           WHEN (old.status = 'confirmed' AND old.delivery_guy_id IS NULL)
+             OR (new.status = 'confirmed' AND new.delivery_guy_id IS NULL) BEGIN
+             DELETE FROM open_orders_index WHERE id = old.id;
+             INSERT INTO open_orders_index (id, min_lat, max_lat, min_lng, max_lng)
+             SELECT new.id, latitude, latitude, longitude, longitude FROM restaurants
+             WHERE id = new.restaurant_id AND latitude IS NOT NULL AND longitude IS NOT NULL
+               AND new.status = 'confirmed' AND new.delivery_guy_id IS NULL;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS open_orders_index_delete AFTER DELETE ON orders
+           WHEN old.status = 'confirmed' AND old.delivery_guy_id IS NULL BEGIN
+             DELETE FROM open_orders_index WHERE id = old.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS open_orders_index_restaurant AFTER UPDATE OF latitude, longitude ON restaurants
+           BEGIN
+             DELETE FROM open_orders_index WHERE id IN
+               (SELECT id FROM orders WHERE restaurant_id = new.id
+                AND status = 'confirmed' AND delivery_guy_id IS NULL);
+             INSERT INTO open_orders_index (id, min_lat, max_lat, min_lng, max_lng)
+             SELECT id, new.latitude, new.latitude, new.longitude, new.longitude FROM orders
+             WHERE restaurant_id = new.id AND status = 'confirmed' AND delivery_guy_id IS NULL
+               AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+           END''',
+        '''INSERT INTO open_orders_index (id, min_lat, max_lat, min_lng, max_lng)
+           SELECT o.id, r.latitude, r.latitude, r.longitude, r.longitude
+           FROM orders o JOIN restaurants r ON r.id = o.restaurant_id
+           WHERE o.status = 'confirmed' AND o.delivery_guy_id IS NULL
+             AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL''',
+    ]),
+    (5, 'Delivery timestamps and incrementally maintained analytics summaries', [
+        'ALTER TABLE orders ADD COLUMN delivered_at TIMESTAMP',
+        '''CREATE TABLE IF NOT EXISTS restaurant_daily_stats
+           (restaurant_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            delivered INTEGER NOT NULL DEFAULT 0,
+            delivery_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, day)) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_restaurant_daily_stats_day ON restaurant_daily_stats (day)',
+        '''CREATE TABLE IF NOT EXISTS menu_item_daily_stats
+           (restaurant_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, day, menu_item_id)) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_menu_item_daily_stats_day ON menu_item_daily_stats (day)',
+        '''CREATE TABLE IF NOT EXISTS order_status_counts
+           (restaurant_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, status)) WITHOUT ROWID''',
+        # Stamp deliveries; the nested update re-fires order_stats_update with the timestamp
+        '''CREATE TRIGGER IF NOT EXISTS orders_delivered_at AFTER UPDATE OF status ON orders
+           WHEN (new.status = 'delivered') IS NOT (old.status = 'delivered') BEGIN
+             UPDATE orders SET delivered_at = CASE WHEN new.status = 'delivered' THEN CURRENT_TIMESTAMP END
+             WHERE id = new.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS order_stats_insert AFTER INSERT ON orders BEGIN
+             INSERT INTO restaurant_daily_stats
+               (restaurant_id, day, orders, revenue, rejected, delivered, delivery_seconds)
+             VALUES (new.restaurant_id, date(new.created_at), 1 * (new.status != 'rejected'),
+                     1 * (CASE WHEN new.status = 'rejected' THEN 0 ELSE new.total_amount END),
+                     1 * (new.status = 'rejected'),
+                     1 * (new.status = 'delivered' AND new.delivered_at IS NOT NULL),
+                     1 * (CASE WHEN new.status = 'delivered' AND new.delivered_at IS NOT NULL
+                          THEN (julianday(new.delivered_at) - julianday(new.created_at)) * 86400 ELSE 0 END))
+             ON CONFLICT (restaurant_id, day) DO UPDATE SET
+               orders = orders + excluded.orders, revenue = revenue + excluded.revenue,
+               rejected = rejected + excluded.rejected, delivered = delivered + excluded.delivered,
+               delivery_seconds = delivery_seconds + excluded.delivery_seconds;
+             INSERT INTO order_status_counts (restaurant_id, status, orders) VALUES (new.restaurant_id, new.status, 1)
+             ON CONFLICT (restaurant_id, status) DO UPDATE SET orders = orders + excluded.orders;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS order_stats_update
+           AFTER UPDATE OF status, total_amount, delivered_at, restaurant_id, created_at ON orders BEGIN
+             INSERT INTO restaurant_daily_stats
+               (restaurant_id, day, orders, revenue, rejected, delivered, delivery_seconds)
+             VALUES (old.restaurant_id, date(old.created_at), -1 * (old.status != 'rejected'),
+                     -1 * (CASE WHEN old.status = 'rejected' THEN 0 ELSE old.total_amount END),
+                     -1 * (old.status = 'rejected'),
+                     -1 * (old.status = 'delivered' AND old.delivered_at IS NOT NULL),
+                     -1 * (CASE WHEN old.status = 'delivered' AND old.delivered_at IS NOT NULL
+                           THEN (julianday(old.delivered_at) - julianday(old.created_at)) * 86400 ELSE 0 END)),
+                    (new.restaurant_id, date(new.created_at), 1 * (new.status != 'rejected'),
+                     1 * (CASE WHEN new.status = 'rejected' THEN 0 ELSE new.total_amount END),
+                     1 * (new.status = 'rejected'),
+                     1 * (new.status = 'delivered' AND new.delivered_at IS NOT NULL),
+                     1 * (CASE WHEN new.status = 'delivered' AND new.delivered_at IS NOT NULL
+                          THEN (julianday(new.delivered_at) - julianday(new.created_at)) * 86400 ELSE 0 END))
+             ON CONFLICT (restaurant_id, day) DO UPDATE SET
+               orders = orders + excluded.orders, revenue = revenue + excluded.revenue,
+               rejected = rejected + excluded.rejected, delivered = delivered + excluded.delivered,
+               delivery_seconds = delivery_seconds + excluded.delivery_seconds;
+             INSERT INTO order_status_counts (restaurant_id, status, orders)
+             VALUES (old.restaurant_id, old.status, -1), (new.restaurant_id, new.status, 1)
+             ON CONFLICT (restaurant_id, status) DO UPDATE SET orders = orders + excluded.orders;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS menu_item_stats_insert AFTER INSERT ON order_items BEGIN
+             INSERT INTO menu_item_daily_stats (restaurant_id, day, menu_item_id, quantity, revenue)
+             SELECT restaurant_id, date(created_at), new.menu_item_id, new.quantity, new.quantity * new.price
+             FROM orders WHERE id = new.order_id AND status != 'rejected'
+             ON CONFLICT (restaurant_id, day, menu_item_id) DO UPDATE SET
+               quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS menu_item_stats_order_update
+           AFTER UPDATE OF status, restaurant_id, created_at ON orders
+           WHEN (old.status = 'rejected') IS NOT (new.status = 'rejected')
+             OR old.restaurant_id IS NOT new.restaurant_id OR old.created_at IS NOT new.created_at BEGIN
+             INSERT INTO menu_item_daily_stats (restaurant_id, day, menu_item_id, quantity, revenue)
+             SELECT old.restaurant_id, date(old.created_at), menu_item_id, -1 * quantity, -1 * quantity * price
+             FROM order_items WHERE order_id = old.id AND old.status != 'rejected'
+             ON CONFLICT (restaurant_id, day, menu_item_id) DO UPDATE SET
+               quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue;
+             INSERT INTO menu_item_daily_stats (restaurant_id, day, menu_item_id, quantity, revenue)
+             SELECT new.restaurant_id, date(new.created_at), menu_item_id, 1 * quantity, 1 * quantity * price
+             FROM order_items WHERE order_id = new.id AND new.status != 'rejected'
+             ON CONFLICT (restaurant_id, day, menu_item_id) DO UPDATE SET
+               quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue;
+           END''',
+        # Backfill the summaries from existing orders
+        '''INSERT INTO restaurant_daily_stats
+             (restaurant_id, day, orders, revenue, rejected, delivered, delivery_seconds)
+           SELECT o.restaurant_id, date(o.created_at), sum(o.status != 'rejected'),
+                  sum(CASE WHEN o.status = 'rejected' THEN 0 ELSE o.total_amount END),
+                  sum(o.status = 'rejected'), sum(o.status = 'delivered' AND o.delivered_at IS NOT NULL),
+                  sum(CASE WHEN o.status = 'delivered' AND o.delivered_at IS NOT NULL
+                      THEN (julianday(o.delivered_at) - julianday(o.created_at)) * 86400 ELSE 0 END)
+           FROM orders o
+           GROUP BY o.restaurant_id, date(o.created_at)''',
+        '''INSERT INTO menu_item_daily_stats (restaurant_id, day, menu_item_id, quantity, revenue)
+           SELECT o.restaurant_id, date(o.created_at), oi.menu_item_id, sum(oi.quantity),
+                  sum(oi.quantity * oi.price)
+           FROM order_items oi JOIN orders o ON o.id = oi.order_id
+           WHERE o.status != 'rejected'
+           GROUP BY o.restaurant_id, date(o.created_at), oi.menu_item_id''',
+        '''INSERT INTO order_status_counts (restaurant_id, status, orders)
+           SELECT restaurant_id, status, COUNT(*) FROM orders GROUP BY restaurant_id, status''',
+    ]),
+    (6, 'Append-only order event log', [
+        '''CREATE TABLE IF NOT EXISTS order_events
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            from_status TEXT,
+            to_status TEXT NOT NULL,
+            delivery_guy_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        'CREATE INDEX IF NOT EXISTS idx_order_events_order ON order_events (order_id, id)',
+        '''CREATE TRIGGER IF NOT EXISTS order_events_insert AFTER INSERT ON orders BEGIN
+             INSERT INTO order_events (order_id, from_status, to_status, delivery_guy_id)
+             VALUES (new.id, NULL, new.status, new.delivery_guy_id);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS order_events_update AFTER UPDATE OF status, delivery_guy_id ON orders
+           WHEN old.status IS NOT new.status OR old.delivery_guy_id IS NOT new.delivery_guy_id BEGIN
+             INSERT INTO order_events (order_id, from_status, to_status, delivery_guy_id)
+             VALUES (new.id, old.status, new.status, new.delivery_guy_id);
+           END''',
+        # One event per existing order, recording its current status
+        '''INSERT INTO order_events (order_id, from_status, to_status, delivery_guy_id, created_at)
+           SELECT id, NULL, status, delivery_guy_id, created_at FROM orders o
+           WHERE NOT EXISTS (SELECT 1 FROM order_events e WHERE e.order_id = o.id)
+           ORDER BY created_at, id''',
+    ]),
+    (7, 'Menu item lookup by name within a restaurant, for bulk menu imports', [
+        'CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant_name ON menu_items (restaurant_id, name)',
+        'DROP INDEX IF EXISTS idx_menu_items_restaurant',
+    ]),
+    (8, 'Restaurant to shard routing map', [
+        '''CREATE TABLE IF NOT EXISTS restaurant_shards
+           (restaurant_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL)''',
+    ]),
+]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    # Upgrade the database in place; every migration runs in its own transaction
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    if applied:
+        conn.execute('PRAGMA optimize')
+    return applied
+
+
+if __name__ == '__main__':
+    database = sys.argv[1] if len(sys.argv) > 1 else 'food_delivery.db'
+    conn = db.connect(database)
+    for version, description in migrate(conn):
+        print(f'Applied migration {version}: {description}')
+    print(f'Schema version: {schema_version(conn)}')
+    conn.close()
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import gzip
+import heapq
+import io
+import itertools
+import os
+import sys
+import time
+
+import db
+import shards
+from responses import dumps
+
+# Streaming order export: one query over orders joined with their items, read FETCH_SIZE
+# rows at a time with fetchmany and regrouped into orders as it goes, so memory stays flat
+# however many orders match. Orders come out oldest first; NDJSON has one order per line
+# with its items, CSV one line per item (or per order without items).
+FETCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+ORDER_FIELDS = ('id', 'created_at', 'status', 'restaurant_id', 'restaurant_name', 'user_id', 'customer_name',
+                'delivery_guy_id', 'total_amount', 'delivery_address', 'delivered_at')
+ITEM_FIELDS = ('menu_item_id', 'name', 'quantity', 'price')
+CSV_HEADER = ('order_id',) + ORDER_FIELDS[1:] + tuple(f'item_{field}' for field in ITEM_FIELDS)
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def iter_orders(conn, where, params, fetch_size=FETCH_SIZE):
+    # Orders (dicts with an 'items' list) matching the conditions on orders `o`
+    c = conn.execute(f'''SELECT o.id, o.created_at, o.status, o.restaurant_id, r.name, o.user_id, u.name,
+                                o.delivery_guy_id, o.total_amount, o.delivery_address, o.delivered_at,
+                                oi.menu_item_id, mi.name, oi.quantity, oi.price
+                         FROM orders o
+                         LEFT JOIN restaurants r ON r.id = o.restaurant_id
+                         LEFT JOIN users u ON u.id = o.user_id
+                         LEFT JOIN order_items oi ON oi.order_id = o.id
+                         LEFT JOIN menu_items mi ON mi.id = oi.menu_item_id
+                         {'WHERE ' + ' AND '.join(where) if where else ''}
+                         ORDER BY o.created_at, o.id, oi.id''', params)
+    split = len(ORDER_FIELDS)
+    order = None
+    while True:
+        rows = c.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            if order is None or order['id'] != row[0]:
+                if order is not None:
+                    yield order
+                order = dict(zip(ORDER_FIELDS, row[:split]))
+                order['items'] = []
+            if row[split] is not None:
+                order['items'].append(dict(zip(ITEM_FIELDS, row[split:])))
+    if order is not None:
+        yield order
+    c.close()
+
+
+def export_orders(conns, where, params, fetch_size=FETCH_SIZE):
+    # iter_orders over every shard (conns[0] being the directory), merged oldest first, with
+    # the customer names of orders from the other shards filled in a batch at a time
+    if len(conns) == 1:
+        yield from iter_orders(conns[0], where, params, fetch_size)
+        return
+    orders = heapq.merge(*[iter_orders(conn, where, params, fetch_size) for conn in conns],
+                         key=lambda order: (order['created_at'], order['id']))
+    while True:
+        batch = list(itertools.islice(orders, fetch_size))
+        if not batch:
+            break
+        missing = {order['user_id'] for order in batch if order['customer_name'] is None and order['user_id'] is not None}
+        names = shards.customer_names(conns[0], missing) if missing else {}
+        for order in batch:
+            if order['customer_name'] is None:
+                order['customer_name'] = names.get(order['user_id'])
+            yield order
+
+
+def ndjson_chunks(orders):
+    buffer = bytearray()
+    for order in orders:
+        buffer += dumps(order)
+        buffer += b'\n'
+        if len(buffer) >= CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def csv_chunks(orders):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    empty = (None,) * len(ITEM_FIELDS)
+    for order in orders:
+        head = [order[field] for field in ORDER_FIELDS]
+        for item in order['items'] or [None]:
+            writer.writerow(head + ([item[field] for field in ITEM_FIELDS] if item else list(empty)))
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+ENCODERS = {'ndjson': ndjson_chunks, 'csv': csv_chunks}
+
+
+def filters(since=None, until=None, restaurant_id=None, status=None):
+    where, params = [], []
+    for condition, value in (('o.created_at >= ?', since), ('o.created_at < ?', until),
+                             ('o.restaurant_id = ?', restaurant_id), ('o.status = ?', status)):
+        if value is not None:
+            where.append(condition)
+            params.append(value)
+    return where, params
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export orders with their items as NDJSON or CSV')
+    parser.add_argument('--database', default='food_delivery.db')
+    parser.add_argument('--shards', default=os.environ.get('SHARDS'),
+                        help='shard count or comma-separated extra shard files (default: $SHARDS)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson')
+    parser.add_argument('--since', help='first day (YYYY-MM-DD), inclusive')
+    parser.add_argument('--until', help='last day (YYYY-MM-DD), exclusive')
+    parser.add_argument('--restaurant-id', type=int)
+    parser.add_argument('--status')
+    parser.add_argument('--output', help='file to write, gzip-compressed if it ends in .gz (default: stdout)')
+    args = parser.parse_args()
+    conns = [db.connect(path, read_only=True) for path in shards.shard_paths(args.database, args.shards)]
+    where, params = filters(args.since, args.until, args.restaurant_id, args.status)
+    if not args.output:
+        out = sys.stdout.buffer
+    elif args.output.endswith('.gz'):
+        out = gzip.open(args.output, 'wb', compresslevel=5)
+    else:
+        out = open(args.output, 'wb')
+    started = time.perf_counter()
+    written = 0
+    for chunk in ENCODERS[args.format](export_orders(conns, where, params)):
+        out.write(chunk)
+        written += len(chunk)
+    out.flush()
+    if args.output:
+        out.close()
+        print(f'Exported {written / 2 ** 20:.1f} MiB to {args.output} in {time.perf_counter() - started:.1f}s')
+    for conn in conns:
+        conn.close()
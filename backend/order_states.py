@@ -0,0 +1,88 @@
+import json
+
+# Order lifecycle: pending -> confirmed -> preparing -> ready, picked up by a courier
+# (accepted -> picked_up -> delivered) once confirmed; restaurants may reject until
+# the kitchen starts. Every change is appended to order_events by the triggers from
+# migration 6, in the same transaction as the status update.
+STATUSES = ('pending', 'confirmed', 'preparing', 'ready', 'rejected', 'accepted', 'picked_up', 'delivered')
+
+# Conditions tying an order to the acting user
+OWNED = 'restaurant_id IN (SELECT id FROM restaurants WHERE owner_id = :user_id)'
+ASSIGNED = 'delivery_guy_id = :user_id'
+UNASSIGNED = 'delivery_guy_id IS NULL'
+
+# role -> {new status: (statuses it may be set from, condition on the order)}.
+# Admins may set any status, and assign any courier with it.
+TRANSITIONS = {
+    'restaurant': {
+        'confirmed': (('pending',), OWNED),
+        'rejected': (('pending', 'confirmed'), OWNED),
+        'preparing': (('confirmed',), OWNED),
+        'ready': (('confirmed', 'preparing'), OWNED),
+    },
+    'delivery': {
+        'accepted': (('confirmed', 'preparing', 'ready'), UNASSIGNED),
+        'picked_up': (('accepted',), ASSIGNED),
+        'delivered': (('accepted', 'picked_up'), ASSIGNED),
+    },
+}
+
+EVENT_COLUMNS = 'e.id, e.order_id, e.from_status, e.to_status, e.delivery_guy_id, e.created_at'
+
+
+def transition(c, order_id, role, user_id, status, delivery_guy_id=None):
+    # Apply one status change as a single conditional UPDATE, so the permission and
+    # current-status checks cannot race the write. True when the order changed.
+    params = {'order_id': order_id, 'user_id': user_id, 'status': status, 'courier': delivery_guy_id}
+    sets, where = ['status = :status'], ['id = :order_id']
+    if role == 'admin':
+        if delivery_guy_id:
+            sets.append('delivery_guy_id = :courier')
+    else:
+        allowed = TRANSITIONS.get(role, {}).get(status)
+        if not allowed:
+            return False
+        sources, condition = allowed
+        if status == 'accepted':
+            sets.append('delivery_guy_id = :user_id')
+        where += [f"status IN ({', '.join(repr(source) for source in sources)})", condition]
+    c.execute(f"UPDATE orders SET {', '.join(sets)} WHERE {' AND '.join(where)}", params)
+    return c.rowcount == 1
+
+
+def transition_many(c, order_ids, status=None, assign=False, delivery_guy_id=None):
+    # One admin change (new status, and/or courier when assign is set; None unassigns) applied
+    # to many orders in a single UPDATE. Returns the ids of the orders that exist.
+    sets = (['status = :status'] if status else []) + (['delivery_guy_id = :courier'] if assign else [])
+    c.execute(f'''UPDATE orders SET {', '.join(sets)}
+                  WHERE id IN (SELECT value FROM json_each(:ids)) RETURNING id''',
+              {'ids': json.dumps(order_ids), 'status': status, 'courier': delivery_guy_id})
+    return {row[0] for row in c.fetchall()}
+
+
+def rejection(c, order_id, role, user_id, status):
+    # (error, http status) explaining why transition() changed nothing; only runs on failure
+    c.execute('SELECT status, delivery_guy_id FROM orders WHERE id = ?', (order_id,))
+    order = c.fetchone()
+    if not order:
+        return 'Order not found', 404
+    allowed = TRANSITIONS.get(role, {}).get(status)
+    if role != 'admin' and not allowed:
+        return 'Insufficient permissions', 403
+    if allowed and allowed[1] != UNASSIGNED:
+        c.execute(f'SELECT 1 FROM orders WHERE id = :order_id AND {allowed[1]}',
+                  {'order_id': order_id, 'user_id': user_id})
+        if not c.fetchone():
+            return 'Insufficient permissions', 403
+    if allowed and allowed[1] == UNASSIGNED and order[1] is not None:
+        return 'Order already taken', 409
+    return f'Cannot change status from {order[0]} to {status}', 409
+
+
+def backfill_events(conn):
+    # One event per order without any, recording its current status; for history
+    # written before the log existed or bulk loads with the triggers dropped
+    conn.execute('''INSERT INTO order_events (order_id, from_status, to_status, delivery_guy_id, created_at)
+                    SELECT id, NULL, status, delivery_guy_id, created_at FROM orders o
+                    WHERE NOT EXISTS (SELECT 1 FROM order_events e WHERE e.order_id = o.id)
+                    ORDER BY created_at, id''')
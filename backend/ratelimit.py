@@ -0,0 +1,52 @@
+import threading
+import time
+
+# Token buckets per user and per role: a user may make `user_rate` requests per second on
+# average and all users of a role together `role_rate`, each in bursts of up to twice
+# that. A request takes a token from both buckets or from neither. Buckets are kept per
+# process; a rate of 0 turns that limit off.
+MAX_BUCKETS = 100000
+
+
+class RateLimiter:
+    def __init__(self, user_rate, role_rate, max_buckets=MAX_BUCKETS):
+        self.rates = {'user': user_rate, 'role': role_rate}
+        self.max_buckets = max_buckets
+        self.allowed = 0
+        self.limited = {'user': 0, 'role': 0}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, user_id, role):
+        # 0 when the request may proceed, else the seconds to wait before retrying
+        keys = [key for key in (('user', user_id), ('role', role)) if self.rates[key[0]]]
+        now = time.monotonic()
+        with self._lock:
+            levels = [self._refill(key, now) for key in keys]
+            waits = [(1 - tokens) / self.rates[key[0]] if tokens < 1 else 0 for key, tokens in zip(keys, levels)]
+            if any(waits):
+                scope = keys[waits.index(max(waits))][0]
+                self.limited[scope] += 1
+                return max(waits)
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - 1, now)
+            self.allowed += 1
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+            return 0
+
+    def _refill(self, key, now):
+        rate = self.rates[key[0]]
+        tokens, updated = self._buckets.get(key, (2 * rate, now))
+        return min(2 * rate, tokens + (now - updated) * rate)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely are the same as new ones
+        self._buckets = {key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+                         if self._refill(key, now) < 2 * self.rates[key[0]]}
+
+    def stats(self):
+        with self._lock:
+            return {'user_rate': self.rates['user'], 'role_rate': self.rates['role'],
+                    'buckets': len(self._buckets), 'allowed': self.allowed,
+                    'limited_by_user': self.limited['user'], 'limited_by_role': self.limited['role']}
@@ -0,0 +1,43 @@
+import argparse
+import os
+import time
+
+import db
+
+# Read replica: a copy of the primary database refreshed with SQLite's online backup,
+# for READ_REPLICA. Each refresh copies a consistent snapshot in one step, holding only a
+# read transaction on the primary, and lands in the replica as a single commit, so
+# readers with the replica open see either the previous snapshot or the new one.
+INTERVAL = 5
+
+
+def replica_path(database):
+    return os.path.splitext(database)[0] + '_replica.db'
+
+
+def refresh(source, target):
+    source.backup(target)
+
+
+def run(database, replica, interval=INTERVAL, once=False):
+    source = db.connect(database)
+    target = db.connect(replica)
+    while True:
+        started = time.perf_counter()
+        refresh(source, target)
+        print(f'Refreshed {replica} in {(time.perf_counter() - started) * 1000:.0f} ms', flush=True)
+        if once:
+            break
+        time.sleep(interval)
+    source.close()
+    target.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep a read replica of the database refreshed')
+    parser.add_argument('--database', default='food_delivery.db')
+    parser.add_argument('--replica', help='replica database (default: <database>_replica.db)')
+    parser.add_argument('--interval', type=float, default=INTERVAL, help='seconds between refreshes')
+    parser.add_argument('--once', action='store_true', help='refresh once and exit')
+    args = parser.parse_args()
+    run(args.database, args.replica or replica_path(args.database), args.interval, args.once)
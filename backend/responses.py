@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 'auto' uses orjson when it is installed, 'json' forces the standard library
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+USE_ORJSON = orjson is not None and JSON_BACKEND != 'json'
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = {'gzip': 5, 'br': 4}
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv', 'application/x-ndjson')
+
+
+def fetch_dicts(cursor, rows=None):
+    # Rows of the last query as dicts keyed by column name (aliases included)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in (cursor.fetchall() if rows is None else rows)]
+
+
+def dumps(obj):
+    # JSON-encode to bytes with the configured backend
+    if USE_ORJSON:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default)
+    return json.dumps(obj, default=DefaultJSONProvider.default, separators=(',', ':')).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Flask JSON provider that serializes jsonify() responses through dumps()
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs):
+        # Same arguments as jsonify(): one value, several (sent as a list) or keywords
+        if args and kwargs:
+            raise TypeError('jsonify() takes either args or kwargs, not both')
+        obj = args[0] if len(args) == 1 else list(args) or kwargs or None
+        return current_app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+class CompressedBodies:
+    # Small LRU of compressed bodies keyed by (ETag, encoding), so cached catalog
+    # responses are compressed once rather than on every hit
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+compressed_bodies = CompressedBodies()
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_LEVEL['br'])
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL['gzip'], mtime=0)
+
+
+def gzip_chunks(chunks, level=COMPRESS_LEVEL['gzip']):
+    # Gzip a streamed body as it goes, flushing after every chunk so the client gets bytes
+    # as soon as they are produced
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def init_compression(app, min_size=COMPRESS_MIN_SIZE):
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or not response.is_sequence
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < min_size:
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+        etag, _ = response.get_etag()
+        body = compressed_bodies.get((etag, encoding)) if etag else None
+        if body is None:
+            body = compress(response.get_data(), encoding)
+            if etag:
+                compressed_bodies.put((etag, encoding), body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # Byte-for-byte different from the identity body, so only weakly equal
+            response.set_etag(etag, weak=True)
+        return response
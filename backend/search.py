@@ -0,0 +1,121 @@
+import heapq
+import re
+
+from responses import fetch_dicts
+
+# External-content FTS5 indexes over the catalog: fts table -> content table.
+# Triggers from migration 3 keep them in sync; bulk loaders rebuild them instead.
+SEARCH_INDEXES = {
+    'restaurants_fts': 'restaurants',
+    'menu_items_fts': 'menu_items',
+}
+
+# Per result type: (fts table, query with a {score} placeholder). bm25 column weights
+# favour names over categories over descriptions; lower scores rank first.
+SEARCH_QUERIES = {
+    'menu_item': ('menu_items_fts', '''
+        SELECT 'menu_item' AS type, mi.id, mi.restaurant_id, r.name AS restaurant_name, mi.name,
+               mi.description, mi.price, mi.category, mi.image_url, {score} AS score
+        FROM menu_items_fts
+        JOIN menu_items mi ON mi.id = menu_items_fts.rowid
+        JOIN restaurants r ON r.id = mi.restaurant_id
+        WHERE menu_items_fts MATCH ? AND r.is_active = 1'''),
+    'restaurant': ('restaurants_fts', '''
+        SELECT 'restaurant' AS type, r.id, r.name, r.description, r.cuisine_type, r.image_url,
+               {score} AS score
+        FROM restaurants_fts
+        JOIN restaurants r ON r.id = restaurants_fts.rowid
+        WHERE restaurants_fts MATCH ? AND r.is_active = 1'''),
+}
+BM25_WEIGHTS = '10.0, 1.0, 4.0'
+
+# bm25 has to score every match before sorting (~1.5us a row). Queries matching more
+# rows than this rank name matches (score 0) ahead of other matches (score 1) instead,
+# each in id order, which FTS5 returns without sorting.
+RANKED_MATCH_LIMIT = 2000
+
+MAX_TERMS = 8
+TERM = re.compile(r'\w+')
+
+
+def parse_terms(text):
+    return TERM.findall(text)[:MAX_TERMS]
+
+
+def match_expression(terms, column=None):
+    # Every word must match; the last one as a prefix, since it may still be being
+    # typed. Words are quoted, so FTS5 operators and punctuation in user input are inert.
+    column = f'{column} : ' if column else ''
+    return ' '.join(f'{column}"{term}"' + ('*' if n == len(terms) - 1 else '') for n, term in enumerate(terms))
+
+
+def match_count(c, table, match, cap):
+    c.execute(f'SELECT COUNT(*) FROM (SELECT rowid FROM {table} WHERE {table} MATCH ? LIMIT ?)', (match, cap))
+    return c.fetchone()[0]
+
+
+def ranked_hits(c, kind, match, limit, cursor):
+    table, sql = SEARCH_QUERIES[kind]
+    score = f'bm25({table}, {BM25_WEIGHTS})'
+    sql = sql.format(score=score)
+    params = [match]
+    if cursor:
+        cursor_score, cursor_kind, cursor_id = cursor
+        if kind > cursor_kind:
+            sql += f' AND {score} >= ?'
+            params.append(cursor_score)
+        elif kind < cursor_kind:
+            sql += f' AND {score} > ?'
+            params.append(cursor_score)
+        else:
+            sql += f' AND ({score} > ? OR ({score} = ? AND {table}.rowid > ?))'
+            params += [cursor_score, cursor_score, cursor_id]
+    c.execute(f'{sql} ORDER BY score, {table}.rowid LIMIT ?', params + [limit])
+    return fetch_dicts(c)
+
+
+def tiered_hits(c, kind, terms, limit, cursor):
+    table, sql = SEARCH_QUERIES[kind]
+    everywhere = match_expression(terms)
+    in_name = match_expression(terms, 'name')
+    hits = []
+    for tier, match in ((0, in_name), (1, f'({everywhere}) NOT ({in_name})')):
+        after_id = 0
+        if cursor:
+            # Skip tiers (and, within the cursor's tier, ids) already paged past
+            if (tier, kind) < tuple(cursor[:2]):
+                continue
+            if (tier, kind) == tuple(cursor[:2]):
+                after_id = cursor[2]
+        c.execute(f'{sql.format(score=tier)} AND {table}.rowid > ? ORDER BY {table}.rowid LIMIT ?',
+                  (match, after_id, limit - len(hits)))
+        hits += fetch_dicts(c)
+        if len(hits) >= limit:
+            break
+    return hits
+
+
+def search(c, text, kinds, limit, cursor=None):
+    # Up to `limit` hits across result types, ordered by (score, type, id) so the
+    # last hit's key works as a keyset cursor for the next page
+    terms = parse_terms(text)
+    match = match_expression(terms)
+    results = []
+    for kind in kinds:
+        table = SEARCH_QUERIES[kind][0]
+        if match_count(c, table, match, RANKED_MATCH_LIMIT + 1) > RANKED_MATCH_LIMIT:
+            results.append(tiered_hits(c, kind, terms, limit, cursor))
+        else:
+            results.append(ranked_hits(c, kind, match, limit, cursor))
+    return list(heapq.merge(*results, key=hit_key))[:limit]
+
+
+def hit_key(hit):
+    return hit['score'], hit['type'], hit['id']
+
+
+def rebuild_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in SEARCH_INDEXES:
+        if table in existing:
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
@@ -1,134 +1,315 @@
+import argparse
+import os
 import sqlite3
-import hashlib
+import math
 import random
+import time
 from datetime import datetime, timedelta
+from itertools import chain, islice
+from auth import hash_password
+import analytics
+import dispatch
+import migrations
+import order_states
+import search
+import shards
 
 DATABASE = 'food_delivery.db'
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Rows per executemany call, and rows per transaction while bulk loading orders
+CHUNK_SIZE = 50000
+COMMIT_EVERY = 1000000
 
-def seed_database():
-    conn = sqlite3.connect(DATABASE)
+# Seeding writes the directory database only (see shards.py): the routing map is cleared
+# and the other shards emptied, so every seeded restaurant and order lives on shard 0
+# until restaurants are moved
+SEEDED_TABLES = ['order_items', 'orders', 'menu_items', 'restaurants', 'courier_locations', 'users',
+                 'order_events', 'restaurant_shards', *analytics.SUMMARY_TABLES]
+
+STATUSES = ['pending', 'confirmed', 'preparing', 'ready', 'accepted', 'picked_up', 'delivered', 'rejected']
+STATUS_WEIGHTS = [3, 3, 2, 2, 2, 2, 80, 6]
+CUISINES = ['Italian', 'American', 'Japanese', 'Mexican', 'Indian', 'Thai', 'Chinese', 'Greek']
+DISHES = ['Curry', 'Noodles', 'Burrito', 'Salad', 'Soup', 'Wrap', 'Bowl', 'Pasta', 'Taco', 'Dumplings']
+
+# Synthetic restaurants and couriers are scattered within AREA_KM of the city centre
+CITY_CENTRE = (40.7580, -73.9855)
+AREA_KM = 15
+
+# Demo accounts, restaurants, menus and orders
+DEMO_USERS = [
+    ('admin', 'admin123', 'admin', 'Admin User', 'admin@foodapp.com', '1234567890'),
+    ('rest1', 'rest123', 'restaurant', 'Pizza Palace Owner', 'pizza@foodapp.com', '1111111111'),
+    ('rest2', 'rest123', 'restaurant', 'Burger King Owner', 'burger@foodapp.com', '2222222222'),
+    ('rest3', 'rest123', 'restaurant', 'Sushi Master Owner', 'sushi@foodapp.com', '3333333333'),
+    ('delivery1', 'delivery123', 'delivery', 'John Delivery', 'john@foodapp.com', '4444444444'),
+    ('delivery2', 'delivery123', 'delivery', 'Mike Rider', 'mike@foodapp.com', '5555555555'),
+    ('customer1', 'customer123', 'customer', 'Customer One', 'customer@foodapp.com', '6666666666'),
+]
+
+# (name, description, cuisine, address, phone, image, owner username, latitude, longitude)
+DEMO_RESTAURANTS = [
+    ('Pizza Palace', 'Best pizza in town!', 'Italian', '123 Main St', '111-111-1111', 'https://images.unsplash.com/photo-1513104890138-7c749659a591?w=400', 'rest1', 40.7506, -73.9935),
+    ('Burger King', 'Juicy burgers and fries', 'American', '456 Oak Ave', '222-222-2222', 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400', 'rest2', 40.7614, -73.9776),
+    ('Sushi Master', 'Fresh sushi daily', 'Japanese', '789 Pine Rd', '333-333-3333', 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=400', 'rest3', 40.7295, -73.9965),
+]
+
+# (restaurant index, name, description, price, image, category)
+DEMO_MENU = [
+    # Pizza Palace
+    (0, 'Margherita Pizza', 'Classic tomato and mozzarella', 12.99, 'https://images.unsplash.com/photo-1574071318508-1cdbab80d002?w=300', 'Pizza'),
+    (0, 'Pepperoni Pizza', 'Pepperoni and cheese', 14.99, 'https://images.unsplash.com/photo-1628840042765-356cda07504e?w=300', 'Pizza'),
+    (0, 'Hawaiian Pizza', 'Ham and pineapple', 15.99, 'https://images.unsplash.com/photo-1604382354936-07c5d9983bd3?w=300', 'Pizza'),
+    (0, 'Caesar Salad', 'Fresh romaine with caesar dressing', 8.99, 'https://images.unsplash.com/photo-1546793665-c74683f339c1?w=300', 'Salad'),
+    # Burger King
+    (1, 'Classic Burger', 'Beef patty with lettuce and tomato', 9.99, 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=300', 'Burgers'),
+    (1, 'Cheeseburger', 'Beef patty with cheese', 10.99, 'https://images.unsplash.com/photo-1550547660-d9450f859349?w=300', 'Burgers'),
+    (1, 'Bacon Burger', 'Beef patty with bacon', 12.99, 'https://images.unsplash.com/photo-1553979459-d2229ba7433a?w=400&h=300&fit=crop&q=80', 'Burgers'),
+    (1, 'French Fries', 'Crispy golden fries', 4.99, 'https://images.unsplash.com/photo-1573080496219-bb080dd4f877?w=300', 'Sides'),
+    # Sushi Master
+    (2, 'Salmon Sushi', 'Fresh salmon nigiri', 6.99, 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=300', 'Sushi'),
+    (2, 'Tuna Roll', 'Tuna maki roll', 7.99, 'https://images.unsplash.com/photo-1611143669185-af800c5eabef?w=400&h=300&fit=crop&q=80', 'Sushi'),
+    (2, 'Dragon Roll', 'Eel and cucumber roll', 9.99, 'https://images.unsplash.com/photo-1617196034796-73dfa7b1fd56?w=300', 'Sushi'),
+    (2, 'Miso Soup', 'Traditional miso soup', 3.99, 'https://images.unsplash.com/photo-1574894709920-11b28e7367e3?w=300', 'Soup'),
+]
+
+# (restaurant index, courier username, status, total, address, [(menu index, quantity)])
+DEMO_ORDERS = [
+    (0, None, 'pending', 27.98, '123 Customer St, City, State', [(0, 2)]),                # 2x Margherita
+    (1, 'delivery1', 'confirmed', 14.98, '456 Delivery Ave, City, State', [(4, 1), (7, 1)]),  # Burger + Fries
+    (2, 'delivery2', 'preparing', 16.98, '789 Food Blvd, City, State', [(8, 2), (11, 1)]),   # 2x Salmon + Miso
+]
+
+
+def insert_chunked(c, sql, rows):
+    # executemany over a generator in fixed-size chunks so memory stays flat
+    count = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return count
+        c.executemany(sql, chunk)
+        count += len(chunk)
+
+
+def drop_secondary_indexes(conn):
+    # Indexes and triggers (search and dispatch index sync, analytics, event log) are
+    # recreated once after the load instead of being maintained row by row
+    placeholders = ','.join('?' * len(SEEDED_TABLES))
+    objects = conn.execute(f'''SELECT type, name, sql FROM sqlite_master
+                               WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+                               AND tbl_name IN ({placeholders})''',
+                           SEEDED_TABLES).fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    return [sql for _, _, sql in objects]
+
+
+def clear_shards(database, shard_files):
+    # Seeded orders all live on shard 0, so the other shard files (SHARDS, as in shards.py)
+    # lose their orders and catalog copies; their id numbering is kept
+    for path in shards.shard_paths(database, shard_files)[1:]:
+        if not os.path.exists(path):
+            continue
+        conn = sqlite3.connect(path)
+        with conn:
+            for table in SEEDED_TABLES:
+                conn.execute(f'DELETE FROM {table}')
+        conn.close()
+
+
+def random_location(rng):
+    # Uniform over a disc of AREA_KM around the city centre
+    radius = AREA_KM * rng.random() ** 0.5 / dispatch.KM_PER_DEGREE
+    angle = rng.uniform(0, 2 * math.pi)
+    latitude = CITY_CENTRE[0] + radius * math.sin(angle)
+    longitude = CITY_CENTRE[1] + radius * math.cos(angle) / math.cos(math.radians(CITY_CENTRE[0]))
+    return round(latitude, 6), round(longitude, 6)
+
+
+def seed_database(database=DATABASE, restaurants=0, menu_items=10, customers=0, couriers=0,
+                  orders=0, items_per_order=3, days=30, seed=42, quiet=False, shard_files=None):
+    # Demo data plus optional synthetic restaurants, users and orders on top of it.
+    # Ids are assigned in insertion order from 1, so every range below is known up front.
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    conn = sqlite3.connect(database)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    conn.execute('PRAGMA temp_store = MEMORY')
     c = conn.cursor()
-    
-    # Clear existing data
-    c.execute('DELETE FROM order_items')
-    c.execute('DELETE FROM orders')
-    c.execute('DELETE FROM menu_items')
-    c.execute('DELETE FROM restaurants')
-    c.execute('DELETE FROM users')
-    
-    # Create admin user
-    c.execute('''INSERT INTO users (username, password, role, name, email, phone)
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              ('admin', hash_password('admin123'), 'admin', 'Admin User', 'admin@foodapp.com', '1234567890'))
-    admin_id = c.lastrowid
-    
-    # Create restaurant owners
-    restaurant_owners = [
-        ('rest1', hash_password('rest123'), 'restaurant', 'Pizza Palace Owner', 'pizza@foodapp.com', '1111111111'),
-        ('rest2', hash_password('rest123'), 'restaurant', 'Burger King Owner', 'burger@foodapp.com', '2222222222'),
-        ('rest3', hash_password('rest123'), 'restaurant', 'Sushi Master Owner', 'sushi@foodapp.com', '3333333333'),
-    ]
-    
-    owner_ids = []
-    for owner in restaurant_owners:
-        c.execute('''INSERT INTO users (username, password, role, name, email, phone)
-                     VALUES (?, ?, ?, ?, ?, ?)''', owner)
-        owner_ids.append(c.lastrowid)
-    
-    # Create delivery guys
-    delivery_guys = [
-        ('delivery1', hash_password('delivery123'), 'delivery', 'John Delivery', 'john@foodapp.com', '4444444444'),
-        ('delivery2', hash_password('delivery123'), 'delivery', 'Mike Rider', 'mike@foodapp.com', '5555555555'),
-    ]
-    
-    delivery_ids = []
-    for guy in delivery_guys:
-        c.execute('''INSERT INTO users (username, password, role, name, email, phone)
-                     VALUES (?, ?, ?, ?, ?, ?)''', guy)
-        delivery_ids.append(c.lastrowid)
-    
-    # Create customer
-    c.execute('''INSERT INTO users (username, password, role, name, email, phone)
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              ('customer1', hash_password('customer123'), 'customer', 'Customer One', 'customer@foodapp.com', '6666666666'))
-    customer_id = c.lastrowid
-    
-    # Create restaurants
-    restaurants_data = [
-        ('Pizza Palace', 'Best pizza in town!', 'Italian', '123 Main St', '111-111-1111', 'https://images.unsplash.com/photo-1513104890138-7c749659a591?w=400', owner_ids[0]),
-        ('Burger King', 'Juicy burgers and fries', 'American', '456 Oak Ave', '222-222-2222', 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400', owner_ids[1]),
-        ('Sushi Master', 'Fresh sushi daily', 'Japanese', '789 Pine Rd', '333-333-3333', 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=400', owner_ids[2]),
-    ]
-    
-    restaurant_ids = []
-    for rest in restaurants_data:
-        c.execute('''INSERT INTO restaurants (name, description, cuisine_type, address, phone, image_url, owner_id)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''', rest)
-        restaurant_ids.append(c.lastrowid)
-    
-    # Create menu items
-    menu_items_data = [
-        # Pizza Palace
-        (restaurant_ids[0], 'Margherita Pizza', 'Classic tomato and mozzarella', 12.99, 'https://images.unsplash.com/photo-1574071318508-1cdbab80d002?w=300', 'Pizza'),
-        (restaurant_ids[0], 'Pepperoni Pizza', 'Pepperoni and cheese', 14.99, 'https://images.unsplash.com/photo-1628840042765-356cda07504e?w=300', 'Pizza'),
-        (restaurant_ids[0], 'Hawaiian Pizza', 'Ham and pineapple', 15.99, 'https://images.unsplash.com/photo-1604382354936-07c5d9983bd3?w=300', 'Pizza'),
-        (restaurant_ids[0], 'Caesar Salad', 'Fresh romaine with caesar dressing', 8.99, 'https://images.unsplash.com/photo-1546793665-c74683f339c1?w=300', 'Salad'),
-        # Burger King
-        (restaurant_ids[1], 'Classic Burger', 'Beef patty with lettuce and tomato', 9.99, 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=300', 'Burgers'),
-        (restaurant_ids[1], 'Cheeseburger', 'Beef patty with cheese', 10.99, 'https://images.unsplash.com/photo-1550547660-d9450f859349?w=300', 'Burgers'),
-        (restaurant_ids[1], 'Bacon Burger', 'Beef patty with bacon', 12.99, 'https://images.unsplash.com/photo-1553979459-d2229ba7433a?w=400&h=300&fit=crop&q=80', 'Burgers'),
-        (restaurant_ids[1], 'French Fries', 'Crispy golden fries', 4.99, 'https://images.unsplash.com/photo-1573080496219-bb080dd4f877?w=300', 'Sides'),
-        # Sushi Master
-        (restaurant_ids[2], 'Salmon Sushi', 'Fresh salmon nigiri', 6.99, 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=300', 'Sushi'),
-        (restaurant_ids[2], 'Tuna Roll', 'Tuna maki roll', 7.99, 'https://images.unsplash.com/photo-1611143669185-af800c5eabef?w=400&h=300&fit=crop&q=80', 'Sushi'),
-        (restaurant_ids[2], 'Dragon Roll', 'Eel and cucumber roll', 9.99, 'https://images.unsplash.com/photo-1617196034796-73dfa7b1fd56?w=300', 'Sushi'),
-        (restaurant_ids[2], 'Miso Soup', 'Traditional miso soup', 3.99, 'https://images.unsplash.com/photo-1574894709920-11b28e7367e3?w=300', 'Soup'),
-    ]
-    
-    menu_item_ids = []
-    for item in menu_items_data:
-        c.execute('''INSERT INTO menu_items (restaurant_id, name, description, price, image_url, category)
-                     VALUES (?, ?, ?, ?, ?, ?)''', item)
-        menu_item_ids.append(c.lastrowid)
-    
-    # Create some sample orders
-    orders_data = [
-        (customer_id, restaurant_ids[0], None, 'pending', 27.98, '123 Customer St, City, State'),
-        (customer_id, restaurant_ids[1], delivery_ids[0], 'confirmed', 14.98, '456 Delivery Ave, City, State'),
-        (customer_id, restaurant_ids[2], delivery_ids[1], 'preparing', 16.98, '789 Food Blvd, City, State'),
-    ]
-    
-    order_ids = []
-    for order in orders_data:
-        c.execute('''INSERT INTO orders (user_id, restaurant_id, delivery_guy_id, status, total_amount, delivery_address)
-                     VALUES (?, ?, ?, ?, ?, ?)''', order)
-        order_ids.append(c.lastrowid)
-    
-    # Create order items
-    order_items_data = [
-        (order_ids[0], menu_item_ids[0], 2, 12.99),  # 2x Margherita
-        (order_ids[1], menu_item_ids[4], 1, 9.99),   # 1x Classic Burger
-        (order_ids[1], menu_item_ids[7], 1, 4.99),   # 1x French Fries
-        (order_ids[2], menu_item_ids[8], 2, 6.99),   # 2x Salmon Sushi
-        (order_ids[2], menu_item_ids[11], 1, 3.99), # 1x Miso Soup
-    ]
-    
-    for item in order_items_data:
-        c.execute('''INSERT INTO order_items (order_id, menu_item_id, quantity, price)
-                     VALUES (?, ?, ?, ?)''', item)
-    
+    counts = {}
+    migrations.migrate(conn)
+
+    # Clear existing data. The indexes and triggers dropped here are rebuilt even if the
+    # load fails or is interrupted: migrations would not bring them back.
+    index_sql = drop_secondary_indexes(conn)
+    try:
+        for table in SEEDED_TABLES:
+            c.execute(f'DELETE FROM {table}')
+        placeholders = ','.join('?' * len(SEEDED_TABLES))
+        c.execute(f'DELETE FROM sqlite_sequence WHERE name IN ({placeholders})', SEEDED_TABLES)
+
+        # Users: demo accounts, then one owner per synthetic restaurant, couriers, customers.
+        # Synthetic users share one hash per role so seeding stays fast with a costly KDF.
+        shared = {'restaurant': hash_password('rest123'), 'delivery': hash_password('delivery123'),
+                  'customer': hash_password('customer123')}
+        user_ids = {username: n for n, (username, *_) in enumerate(DEMO_USERS, 1)}
+        first_owner = len(DEMO_USERS) + 1
+        first_courier = first_owner + restaurants
+        first_customer = first_courier + couriers
+        users = chain(
+            [(username, hash_password(password), role, name, email, phone)
+             for username, password, role, name, email, phone in DEMO_USERS],
+            ((f'owner{i}', shared['restaurant'], 'restaurant', f'Owner {i}', None, None)
+             for i in range(1, restaurants + 1)),
+            ((f'delivery{i}', shared['delivery'], 'delivery', f'Courier {i}', None, None)
+             for i in range(3, couriers + 3)),
+            ((f'customer{i}', shared['customer'], 'customer', f'Customer {i}', None, None)
+             for i in range(2, customers + 2)))
+        counts['users'] = insert_chunked(c, '''INSERT INTO users (username, password, role, name, email, phone)
+                                               VALUES (?, ?, ?, ?, ?, ?)''', users)
+        courier_ids = [user_ids['delivery1'], user_ids['delivery2']] + list(range(first_courier, first_customer))
+        counts['courier_locations'] = insert_chunked(c, '''INSERT INTO courier_locations (courier_id, latitude, longitude)
+                                                           VALUES (?, ?, ?)''',
+                                                     ((courier_id, *random_location(rng)) for courier_id in courier_ids))
+
+        # Restaurants
+        restaurant_rows = chain(
+            [(name, description, cuisine, address, phone, image, user_ids[owner], latitude, longitude)
+             for name, description, cuisine, address, phone, image, owner, latitude, longitude in DEMO_RESTAURANTS],
+            ((f'{CUISINES[i % len(CUISINES)]} Kitchen {i}', f'Neighbourhood kitchen number {i}',
+              CUISINES[i % len(CUISINES)], f'{i} Market St', None, None, first_owner + i - 1, *random_location(rng))
+             for i in range(1, restaurants + 1)))
+        counts['restaurants'] = insert_chunked(c, '''INSERT INTO restaurants (name, description, cuisine_type, address, phone, image_url, owner_id,
+                                                                          latitude, longitude)
+                                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', restaurant_rows)
+
+        # Menu items; menus[r] is the (first id, prices) of restaurant r + 1's menu
+        menus = []
+        menu_rows = []
+        for index, _ in enumerate(DEMO_RESTAURANTS):
+            items = [item for item in DEMO_MENU if item[0] == index]
+            menus.append((len(menu_rows) + 1, [item[3] for item in items]))
+            menu_rows += [(index + 1, name, description, price, image, category)
+                          for _, name, description, price, image, category in items]
+        for r in range(len(DEMO_RESTAURANTS) + 1, len(DEMO_RESTAURANTS) + restaurants + 1):
+            prices = [round(rng.uniform(3, 30), 2) for _ in range(menu_items)]
+            menus.append((len(DEMO_MENU) + (r - len(DEMO_RESTAURANTS) - 1) * menu_items + 1, prices))
+        synthetic_menu = ((r + 1, f'{DISHES[n % len(DISHES)]} No. {n + 1}', f'House {DISHES[n % len(DISHES)].lower()}',
+                           menus[r][1][n], None, DISHES[n % len(DISHES)])
+                          for r in range(len(DEMO_RESTAURANTS), len(menus)) for n in range(menu_items))
+        counts['menu_items'] = insert_chunked(c, '''INSERT INTO menu_items (restaurant_id, name, description, price, image_url, category)
+                                                    VALUES (?, ?, ?, ?, ?, ?)''', chain(menu_rows, synthetic_menu))
+        conn.commit()
+
+        # Orders and their items, generated lazily and flushed together chunk by chunk
+        order_sql = '''INSERT INTO orders (user_id, restaurant_id, delivery_guy_id, status, total_amount, delivery_address,
+                                          created_at, delivered_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+        item_sql = 'INSERT INTO order_items (order_id, menu_item_id, quantity, price) VALUES (?, ?, ?, ?)'
+        now = datetime.utcnow()
+        created_at = now.strftime('%Y-%m-%d %H:%M:%S')
+        demo_orders = []
+        demo_items = []
+        for n, (restaurant, courier, status, total, address, lines) in enumerate(DEMO_ORDERS, 1):
+            demo_orders.append((user_ids['customer1'], restaurant + 1, user_ids.get(courier), status, total, address, created_at, None))
+            demo_items += [(n, menu_index + 1, quantity, DEMO_MENU[menu_index][3]) for menu_index, quantity in lines]
+        c.executemany(order_sql, demo_orders)
+        c.executemany(item_sql, demo_items)
+        counts['orders'] = len(demo_orders)
+        counts['order_items'] = len(demo_items)
+
+        start = now - timedelta(days=days)
+        step = timedelta(days=days) / max(orders, 1)
+        pending_items = []
+
+        def synthetic_orders():
+            for n in range(orders):
+                order_id = len(DEMO_ORDERS) + n + 1
+                restaurant_id = rng.randint(1, len(menus))
+                first_item, prices = menus[restaurant_id - 1]
+                status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+                courier = rng.choice(courier_ids) if status in ('accepted', 'picked_up', 'delivered') else None
+                total = 0
+                for _ in range(items_per_order):
+                    offset = rng.randrange(len(prices))
+                    quantity = rng.randint(1, 3)
+                    pending_items.append((order_id, first_item + offset, quantity, prices[offset]))
+                    total += prices[offset] * quantity
+                customer = rng.randint(first_customer, first_customer + customers - 1) if customers else user_ids['customer1']
+                created = start + step * n
+                delivered = created + timedelta(minutes=rng.uniform(15, 60)) if status == 'delivered' else None
+                yield (customer, restaurant_id, courier,
+                       status, round(total, 2), f'{n % 999 + 1} Customer St, City, State',
+                       created.strftime('%Y-%m-%d %H:%M:%S'), delivered and delivered.strftime('%Y-%m-%d %H:%M:%S'))
+
+        generator = synthetic_orders()
+        since_commit = 0
+        while True:
+            chunk = list(islice(generator, max(CHUNK_SIZE // max(items_per_order, 1), 1)))
+            if not chunk:
+                break
+            c.executemany(order_sql, chunk)
+            c.executemany(item_sql, pending_items)
+            counts['orders'] += len(chunk)
+            counts['order_items'] += len(pending_items)
+            since_commit += len(chunk) + len(pending_items)
+            pending_items.clear()
+            if since_commit >= COMMIT_EVERY:
+                conn.commit()
+                since_commit = 0
+        conn.commit()
+    finally:
+        # Rebuild indexes, search indexes and summaries once
+        if conn.in_transaction:
+            conn.rollback()
+        for sql in index_sql:
+            c.execute(sql)
+        search.rebuild_indexes(conn)
+        dispatch.rebuild_index(conn)
+        analytics.rebuild(conn)
+        order_states.backfill_events(conn)
+        conn.commit()
+    clear_shards(database, shard_files)
+
+    # Refresh planner statistics and fold the WAL back in
+    c.execute('ANALYZE')
     conn.commit()
+    c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
     conn.close()
-    print("Database seeded successfully!")
-    print("\nTest Accounts:")
-    print("Admin: username=admin, password=admin123")
-    print("Restaurant: username=rest1, password=rest123")
-    print("Delivery: username=delivery1, password=delivery123")
-    print("Customer: username=customer1, password=customer123")
 
-if __name__ == '__main__':
-    seed_database()
+    elapsed = time.perf_counter() - started
+    total_rows = sum(counts.values())
+    if not quiet:
+        print("Database seeded successfully!")
+        print(', '.join(f'{count} {table}' for table, count in counts.items()))
+        print(f'{total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/s)')
+        print("\nTest Accounts:")
+        print("Admin: username=admin, password=admin123")
+        print("Restaurant: username=rest1, password=rest123")
+        print("Delivery: username=delivery1, password=delivery123")
+        print("Customer: username=customer1, password=customer123")
+    return counts
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed the database with demo data plus optional synthetic load')
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--restaurants', type=int, default=0, help='synthetic restaurants (each with its own owner)')
+    parser.add_argument('--menu-items', type=int, default=10, help='menu items per synthetic restaurant')
+    parser.add_argument('--customers', type=int, default=0, help='synthetic customers')
+    parser.add_argument('--couriers', type=int, default=0, help='synthetic couriers')
+    parser.add_argument('--orders', type=int, default=0, help='synthetic orders')
+    parser.add_argument('--items-per-order', type=int, default=3)
+    parser.add_argument('--days', type=int, default=30, help='spread synthetic orders over this many days')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--shards', default=os.environ.get('SHARDS'),
+                        help='shard count or extra shard files, as SHARDS; their orders are cleared')
+    return parser.parse_args()
 
+if __name__ == '__main__':
+    args = parse_args()
+    seed_database(args.database, restaurants=args.restaurants, menu_items=args.menu_items,
+                  customers=args.customers, couriers=args.couriers, orders=args.orders,
+                  items_per_order=args.items_per_order, days=args.days, seed=args.seed,
+                  shard_files=args.shards)
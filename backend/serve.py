@@ -0,0 +1,118 @@
+# Production entry point: two gunicorn pools. The API runs in worker processes with a
+# thread pool each (gthread), so every request holds a thread until it returns. The order
+# event stream (SSE) gets its own pool of gevent workers on --stream-port, where an open
+# stream is a greenlet rather than a thread and the SQLite polling runs in gevent's
+# threadpool; the API pool redirects stream requests there. The dev server started by
+# `python3 app.py` handles one process only and is not meant for real traffic.
+#
+#   python3 serve.py --workers 4 --threads 8 --stream-workers 2
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import subprocess
+import sys
+
+from gunicorn.app.base import BaseApplication
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Request
+
+STREAM_PATH = '/api/orders/stream'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the food delivery API with gunicorn')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help='threads per API worker')
+    parser.add_argument('--stream-port', type=int, default=int(os.environ.get('STREAM_PORT', 5002)),
+                        help=f'port of the gevent pool serving {STREAM_PATH}')
+    parser.add_argument('--stream-workers', type=int, default=int(os.environ.get('STREAM_WORKERS', 1)))
+    parser.add_argument('--worker-connections', type=int, default=1000,
+                        help='open streams per stream worker')
+    parser.add_argument('--keep-alive', type=int, default=5, help='seconds to hold idle keep-alive connections')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds workers get to finish in-flight requests on shutdown')
+    parser.add_argument('--stream-pool', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+class Server(BaseApplication):
+    def __init__(self, options, stream_port, streams=False):
+        self.options = options
+        self.stream_port = stream_port
+        self.streams = streams
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app, event_hub
+        if not self.streams:
+            def redirect_streams(environ, start_response):
+                # EventSource follows the redirect, so a stream never holds an API thread
+                if environ.get('PATH_INFO') != STREAM_PATH:
+                    return app(environ, start_response)
+                request = Request(environ)
+                host = request.host.rsplit(':', 1)[0]
+                return redirect(f'{request.scheme}://{host}:{self.stream_port}{request.full_path}', 307)(
+                    environ, start_response)
+            return redirect_streams
+        # Runs in each gevent worker after it has patched the stdlib
+        import gevent
+        event_hub.backend.run_blocking = lambda fn, *args: gevent.get_hub().threadpool.apply(fn, args)
+
+        def streams_only(environ, start_response):
+            if environ.get('PATH_INFO') != STREAM_PATH:
+                return NotFound()(environ, start_response)
+            return app(environ, start_response)
+        return streams_only
+
+
+def main():
+    args = parse_args()
+    if importlib.util.find_spec('gevent') is None:
+        sys.exit('The stream pool needs gevent: pip install -r requirements.txt')
+    # The pools are separate processes, so order events must go through the database
+    os.environ['EVENT_BACKEND'] = 'sqlite'
+
+    options = {
+        'keepalive': args.keep_alive,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': '-',
+        # Log the path without the query string: EventSource clients send their token as ?token=
+        'access_log_format': '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"',
+    }
+    if args.stream_pool:
+        Server({**options, 'bind': f'{args.host}:{args.stream_port}', 'workers': args.stream_workers,
+                'worker_class': 'gevent', 'worker_connections': args.worker_connections},
+               args.stream_port, streams=True).run()
+        return
+
+    # Initialise the schema in a child process: the app (and its connections) is only
+    # imported inside each worker, after fork and after gevent has patched the stdlib
+    subprocess.run([sys.executable, '-c', 'from app import init_db; init_db()'], check=True)
+
+    print(f"Server running on http://{args.host}:{args.port} ({args.workers} workers x {args.threads} threads), "
+          f"order stream on http://{args.host}:{args.stream_port}{STREAM_PATH} "
+          f"({args.stream_workers} x {args.worker_connections} connections)")
+    stream_pool = subprocess.Popen([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--stream-pool'])
+    master = os.getpid()
+    try:
+        Server({**options, 'bind': f'{args.host}:{args.port}', 'workers': args.workers,
+                'worker_class': 'gthread', 'threads': args.threads}, args.stream_port).run()
+    finally:
+        # Workers forked from this process unwind through here too when they exit
+        if os.getpid() == master:
+            stream_pool.terminate()
+            stream_pool.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import sqlite3
+
+from flask import current_app, g
+
+import db
+
+# Region sharding: restaurants, their menus and the orders placed with them are spread over
+# several SQLite files, so order writes on different shards never wait for the same write
+# lock. Shard 0 is DATABASE, which stays the directory: users, courier locations, the full
+# catalog (restaurant listings, menus, search) and the restaurant_shards routing map.
+# Shards 1..n-1 are further files with the same schema, holding copies of the restaurants
+# routed to them and of their menus, which their order triggers and price checks read.
+# Restaurants without a row in the map live on shard 0. Each shard numbers its orders and
+# order events from shard * ID_SPAN, so an id names its shard. Orders stay on the shard they
+# were placed on: moving a restaurant routes its new orders, and reads fan out to all shards.
+ID_SPAN = 2 ** 40
+SEQUENCED_TABLES = ('orders', 'order_events')
+CATALOG_TABLES = [('restaurants', 'id'), ('menu_items', 'restaurant_id')]
+COPY_BATCH = 5000
+
+# How far apart (in orders over the window) the busiest and quietest shards may be before
+# the rebalance plan moves another restaurant
+REBALANCE_DAYS = 7
+REBALANCE_TOLERANCE = 0.1
+
+
+def shard_paths(database, shards=None):
+    # SHARDS is a total count (extra files named after DATABASE) or a comma-separated
+    # list of the extra shard files
+    if not shards:
+        return [database]
+    if str(shards).isdigit():
+        base = os.path.splitext(database)[0]
+        return [database] + [f'{base}_shard{n}.db' for n in range(1, int(shards))]
+    return [database] + [path.strip() for path in str(shards).split(',') if path.strip()]
+
+
+def shard_of(row_id):
+    # Shard that numbered an order or order event id
+    return row_id // ID_SPAN
+
+
+def number_from(conn, shard):
+    # Start the shard's order and event ids at shard * ID_SPAN
+    base = shard * ID_SPAN
+    with conn:
+        for table in SEQUENCED_TABLES:
+            if not conn.execute('UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (base, table)).rowcount:
+                conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, base))
+
+
+def restaurant_shards(conn, restaurant_ids):
+    # {restaurant id: shard} for the given ids; unmapped restaurants are on shard 0
+    shards = dict.fromkeys(restaurant_ids, 0)
+    shards.update(conn.execute('''SELECT restaurant_id, shard FROM restaurant_shards
+                                  WHERE restaurant_id IN (SELECT value FROM json_each(?))''',
+                               (json.dumps(list(shards)),)).fetchall())
+    return shards
+
+
+def copy_catalog(directory, shard_conn, restaurant_ids):
+    # Upsert the directory's rows for these restaurants and their menu items into a shard
+    ids = json.dumps(list(restaurant_ids))
+    for table, key in CATALOG_TABLES:
+        columns = [row[1] for row in directory.execute(f'PRAGMA table_info({table})')]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'id')
+        insert = f'''INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                     ON CONFLICT (id) DO UPDATE SET {updates}'''
+        c = directory.execute(f'''SELECT {', '.join(columns)} FROM {table}
+                                  WHERE {key} IN (SELECT value FROM json_each(?))''', (ids,))
+        while True:
+            rows = c.fetchmany(COPY_BATCH)
+            if not rows:
+                break
+            shard_conn.executemany(insert, rows)
+
+
+def refresh_catalog(directory, shard_conns, restaurant_ids):
+    # Copy restaurants (and their menus) from the directory to every shard holding a copy,
+    # including shards they were routed to before, and to the shard each is routed to now.
+    # shard_conns[n] connects to shard n; shard 0 is the directory itself.
+    routed = restaurant_shards(directory, restaurant_ids)
+    ids = json.dumps(list(routed))
+    for shard, conn in enumerate(shard_conns[1:], 1):
+        targets = {row[0] for row in conn.execute('SELECT id FROM restaurants WHERE id IN (SELECT value FROM json_each(?))',
+                                                  (ids,))}
+        targets.update(restaurant_id for restaurant_id, home in routed.items() if home == shard)
+        if targets:
+            with conn:
+                copy_catalog(directory, conn, targets)
+
+
+def move_restaurant(directory, restaurant_id, shard, shard_conn=None):
+    # Route a restaurant's new orders to `shard` (connected as shard_conn), copying its
+    # catalog rows there first. Orders already placed stay where they are.
+    if not directory.execute('SELECT 1 FROM restaurants WHERE id = ?', (restaurant_id,)).fetchone():
+        raise ValueError(f'Unknown restaurant {restaurant_id}')
+    if shard:
+        with shard_conn:
+            copy_catalog(directory, shard_conn, [restaurant_id])
+    with directory:
+        directory.execute('''INSERT INTO restaurant_shards (restaurant_id, shard) VALUES (?, ?)
+                             ON CONFLICT (restaurant_id) DO UPDATE SET shard = excluded.shard''',
+                          (restaurant_id, shard))
+
+
+def restaurant_loads(directory, conns, days=REBALANCE_DAYS):
+    # {restaurant id: orders placed in the last `days` days, summed over every shard}
+    loads = dict(directory.execute('SELECT id, 0 FROM restaurants'))
+    for conn in conns:
+        for restaurant_id, orders in conn.execute('''SELECT restaurant_id, sum(orders) FROM restaurant_daily_stats
+                                                     WHERE day >= date('now', ?) GROUP BY restaurant_id''',
+                                                  (f'-{int(days)} days',)):
+            loads[restaurant_id] = loads.get(restaurant_id, 0) + orders
+    return loads
+
+
+def plan_moves(placement, loads, shards, tolerance=REBALANCE_TOLERANCE):
+    # Moves [(restaurant id, from shard, to shard)] that even out the shards' loads: the
+    # restaurant from the busiest shard that best halves the gap to the quietest one, until
+    # no move narrows the gap to within tolerance of the mean
+    placement = dict(placement)
+    totals = [0] * shards
+    for restaurant_id, shard in placement.items():
+        totals[shard] += loads.get(restaurant_id, 0)
+    slack = tolerance * sum(totals) / shards
+    moves = []
+    while True:
+        busiest = max(range(shards), key=lambda shard: totals[shard])
+        quietest = min(range(shards), key=lambda shard: totals[shard])
+        gap = totals[busiest] - totals[quietest]
+        if gap <= slack:
+            break
+        movable = [(abs(gap / 2 - loads.get(restaurant_id, 0)), restaurant_id)
+                   for restaurant_id, shard in placement.items()
+                   if shard == busiest and 0 < loads.get(restaurant_id, 0) < gap]
+        if not movable:
+            break
+        _, restaurant_id = min(movable)
+        placement[restaurant_id] = quietest
+        totals[busiest] -= loads[restaurant_id]
+        totals[quietest] += loads[restaurant_id]
+        moves.append((restaurant_id, busiest, quietest))
+    return moves
+
+
+def init_app(app):
+    init_pools(app)
+    app.teardown_appcontext(close_shards)
+
+
+def init_pools(app):
+    # Pools for shards 1..n-1; shard 0 uses the db.py pools
+    paths = shard_paths(app.config['DATABASE'], app.config.get('SHARDS'))
+    app.config['SHARD_DATABASES'] = paths
+    size = app.config.get('DB_POOL_SIZE', db.POOL_SIZE)
+    factory = app.config.get('DB_CONNECTION_FACTORY', sqlite3.Connection)
+    app.extensions['shard_pools'] = [None] + [db.ConnectionPool(path, size, factory) for path in paths[1:]]
+    app.extensions['shard_read_pools'] = [None] + [db.ConnectionPool(path, size, factory, read_only=True)
+                                                   for path in paths[1:]]
+
+
+def count():
+    return len(current_app.config['SHARD_DATABASES'])
+
+
+def database(shard):
+    return current_app.config['SHARD_DATABASES'][shard]
+
+
+def for_restaurant(restaurant_id):
+    # Shard taking new orders for a restaurant
+    if count() == 1:
+        return 0
+    try:
+        restaurant_id = int(restaurant_id)
+    except (TypeError, ValueError):
+        return 0
+    return restaurant_shards(db.get_read_db(consistent=True), [restaurant_id])[restaurant_id]
+
+
+def get_shard_db(shard):
+    # Read-write connection to a shard for this app context
+    if shard == 0:
+        return db.get_db()
+    conns = g.setdefault('shard_dbs', {})
+    if shard not in conns:
+        conns[shard] = current_app.extensions['shard_pools'][shard].acquire()
+    return conns[shard]
+
+
+def get_shard_read_db(shard, user_id=None):
+    # Read-only connection to a shard; shard 0 follows db.get_read_db's replica routing
+    if shard == 0:
+        return db.get_read_db(user_id)
+    if shard in g.get('shard_dbs', {}):
+        return g.shard_dbs[shard]
+    conns = g.setdefault('shard_read_dbs', {})
+    if shard not in conns:
+        conns[shard] = current_app.extensions['shard_read_pools'][shard].acquire()
+    return conns[shard]
+
+
+def customer_names(directory, user_ids):
+    # {user id: name}; users live in the directory only, so orders read from other shards
+    # get their customer names here
+    return dict(directory.execute('SELECT id, name FROM users WHERE id IN (SELECT value FROM json_each(?))',
+                                  (json.dumps(list(user_ids)),)))
+
+
+def sync_catalog(restaurant_ids):
+    # Copy restaurants (and menus) changed in the directory to the shards holding copies
+    if count() == 1 or not restaurant_ids:
+        return
+    refresh_catalog(db.get_db(), [None] + [get_shard_db(shard) for shard in range(1, count())], restaurant_ids)
+
+
+def close_shards(exc=None):
+    for name, pools in (('shard_dbs', 'shard_pools'), ('shard_read_dbs', 'shard_read_pools')):
+        for shard, conn in g.pop(name, {}).items():
+            current_app.extensions[pools][shard].release(conn)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inspect shards and move restaurants between them')
+    parser.add_argument('--database', default='food_delivery.db')
+    parser.add_argument('--shards', default=os.environ.get('SHARDS'),
+                        help='shard count or comma-separated extra shard files (default: $SHARDS)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='restaurants and orders per shard')
+    move = commands.add_parser('move', help='route a restaurant\'s new orders to another shard')
+    move.add_argument('restaurant_id', type=int)
+    move.add_argument('shard', type=int)
+    sync = commands.add_parser('sync', help='refresh shard copies of restaurants and menus edited in the directory')
+    sync.add_argument('restaurant_ids', type=int, nargs='*', help='default: every restaurant')
+    rebalance = commands.add_parser('rebalance', help='plan (or --apply) moves evening out recent orders')
+    rebalance.add_argument('--days', type=int, default=REBALANCE_DAYS)
+    rebalance.add_argument('--tolerance', type=float, default=REBALANCE_TOLERANCE)
+    rebalance.add_argument('--apply', action='store_true')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    paths = shard_paths(args.database, args.shards)
+    conns = [db.connect(path) for path in paths]
+    directory = conns[0]
+    placement = dict(directory.execute('SELECT id, 0 FROM restaurants'))
+    placement.update(directory.execute('SELECT restaurant_id, shard FROM restaurant_shards WHERE shard < ?',
+                                       (len(paths),)))
+    if args.command == 'status':
+        loads = restaurant_loads(directory, conns)
+        for shard, (path, conn) in enumerate(zip(paths, conns)):
+            restaurants = [restaurant_id for restaurant_id, home in placement.items() if home == shard]
+            orders = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+            print(f'shard {shard} {path}: {len(restaurants)} restaurants, {orders} orders, '
+                  f'{sum(loads.get(restaurant_id, 0) for restaurant_id in restaurants)} recent orders routed here')
+    elif args.command == 'move':
+        if not 0 <= args.shard < len(paths):
+            raise SystemExit(f'Shard must be between 0 and {len(paths) - 1}')
+        try:
+            move_restaurant(directory, args.restaurant_id, args.shard, conns[args.shard])
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        print(f'Restaurant {args.restaurant_id} now takes orders on shard {args.shard}')
+    elif args.command == 'sync':
+        refresh_catalog(directory, conns, args.restaurant_ids or list(placement))
+        print(f'Refreshed {len(args.restaurant_ids or placement)} restaurants on {len(paths) - 1} shards')
+    else:
+        loads = restaurant_loads(directory, conns, args.days)
+        for restaurant_id, source, target in plan_moves(placement, loads, len(paths), args.tolerance):
+            print(f'restaurant {restaurant_id} ({loads[restaurant_id]} orders): shard {source} -> {target}')
+            if args.apply:
+                move_restaurant(directory, restaurant_id, target, conns[target])
+    for conn in conns:
+        conn.close()
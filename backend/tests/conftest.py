@@ -0,0 +1,37 @@
+import os
+import sys
+
+# A cheap password KDF keeps seeding and logins fast; read when auth is first imported
+os.environ.setdefault('PASSWORD_ITERATIONS', '1000')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app import app
+from benchmarks.common import make_database, auth_headers
+
+ROLES = ('admin', 'restaurant', 'delivery', 'customer')
+
+
+@pytest.fixture
+def database():
+    # A freshly seeded file per test: the demo accounts, 5 synthetic restaurants and 200 orders
+    return make_database(200, restaurants=5, customers=20)
+
+
+@pytest.fixture
+def sharded_database():
+    # The same data on shard 0 of a two-shard setup; shard 1 starts empty
+    app.config['SHARDS'] = '2'
+    yield make_database(200, restaurants=5, customers=20)
+    app.config['SHARDS'] = None
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def headers(database, client):
+    return {role: auth_headers(client, role) for role in ROLES}
@@ -0,0 +1,54 @@
+import archive
+import db
+from test_pagination import walk
+
+
+def archive_old_orders(database):
+    conn = db.connect(database)
+    moved = archive.archive_orders(conn, archive.archive_path(database), older_than_days=30, pause=0)
+    return conn, moved
+
+
+def test_archiving_moves_old_finished_orders_with_their_items_and_events(database):
+    conn = db.connect(database)
+    eligible = {row[0] for row in conn.execute('''SELECT id FROM orders WHERE status IN ('delivered', 'rejected')
+                                                  AND created_at < datetime('now', '-30 days')''')}
+    conn.close()
+    conn, moved = archive_old_orders(database)
+    assert eligible and moved == len(eligible)
+    assert {row[0] for row in conn.execute('SELECT id FROM archive.orders')} == eligible
+    assert not conn.execute('SELECT 1 FROM main.orders WHERE id IN (SELECT id FROM archive.orders)').fetchone()
+    assert not conn.execute('SELECT 1 FROM main.order_items WHERE order_id IN (SELECT id FROM archive.orders)').fetchone()
+    assert conn.execute('SELECT COUNT(DISTINCT order_id) FROM archive.order_items').fetchone()[0] == moved
+    assert conn.execute('SELECT COUNT(DISTINCT order_id) FROM archive.order_events').fetchone()[0] == moved
+    assert archive.archive_orders(conn, archive.archive_path(database), older_than_days=30, pause=0) == 0
+
+
+def test_listing_includes_archived_orders_on_request(client, headers, database):
+    before = walk(client, headers['admin'], '/api/orders', limit=50)
+    _, moved = archive_old_orders(database)
+    hot = walk(client, headers['admin'], '/api/orders', limit=50)
+    both = walk(client, headers['admin'], '/api/orders', limit=50, include_archived=1)
+    assert len(hot) == len(before) - moved
+    assert sorted(order['id'] for order in both) == sorted(order['id'] for order in before)
+    assert all(order['items'] for order in both)
+
+
+def test_archived_orders_keep_their_timeline_but_are_read_only(client, headers, database):
+    conn, _ = archive_old_orders(database)
+    order_id = conn.execute('SELECT id FROM archive.orders ORDER BY id LIMIT 1').fetchone()[0]
+    response = client.get(f'/api/orders/{order_id}/events', headers=headers['admin'])
+    assert response.status_code == 200
+    assert response.json and {event['order_id'] for event in response.json} == {order_id}
+    response = client.put(f'/api/orders/{order_id}/status', headers=headers['admin'], json={'status': 'confirmed'})
+    assert response.status_code == 404
+
+
+def test_attach_waits_for_the_archive_to_catch_up_with_the_live_schema(database):
+    conn, _ = archive_old_orders(database)
+    assert not archive.attach(db.connect(database, read_only=True), database + '.missing')
+    conn.execute('ALTER TABLE orders ADD COLUMN tip REAL')
+    reader = db.connect(database, read_only=True)
+    assert not archive.attach(reader, archive.archive_path(database))
+    archive.sync_schema(conn)
+    assert archive.attach(reader, archive.archive_path(database))
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from app import MAX_BATCH_OPERATIONS
+from benchmarks.common import ADMIN_ID, COURIER_ID
+
+BATCH = '/api/admin/orders/batch'
+
+
+def orders(database, *order_ids):
+    conn = sqlite3.connect(database)
+    rows = conn.execute('SELECT id, status, delivery_guy_id FROM orders WHERE id IN (%s)' %
+                        ','.join('?' * len(order_ids)), order_ids).fetchall()
+    conn.close()
+    return {row[0]: row[1:] for row in rows}
+
+
+def test_mixed_batch_applies_valid_operations_and_reports_the_rest(client, headers, database):
+    response = client.post(BATCH, headers=headers['admin'], json={'operations': [
+        {'order_id': 1, 'status': 'rejected'},
+        {'order_id': 2, 'status': 'rejected'},
+        {'order_id': 3, 'delivery_guy_id': COURIER_ID},
+        {'order_id': 4, 'status': 'picked_up', 'delivery_guy_id': COURIER_ID},
+        {'order_id': 999999, 'status': 'rejected'},
+    ]})
+    assert response.status_code == 200
+    assert response.json['updated'] == 4
+    assert response.json['failed'] == 1
+    assert [result['ok'] for result in response.json['results']] == [True] * 4 + [False]
+    assert response.json['results'][4] == {'order_id': 999999, 'ok': False, 'error': 'Order not found'}
+    changed = orders(database, 1, 2, 3, 4)
+    assert changed[1][0] == changed[2][0] == 'rejected'
+    assert changed[3][1] == COURIER_ID
+    assert changed[4] == ('picked_up', COURIER_ID)
+
+
+@pytest.mark.parametrize('operation, error', [
+    ({'order_id': '1', 'status': 'rejected'}, 'Invalid order_id'),
+    ({'status': 'rejected'}, 'Invalid order_id'),
+    ('not an object', 'Invalid order_id'),
+    ({'order_id': 1, 'status': 'lost'}, 'Invalid status'),
+    ({'order_id': 1, 'delivery_guy_id': ADMIN_ID}, 'Unknown courier'),
+    ({'order_id': 1, 'delivery_guy_id': str(COURIER_ID)}, 'Unknown courier'),
+    ({'order_id': 1}, 'Nothing to change'),
+])
+def test_invalid_operations_are_rejected_without_changes(client, headers, database, operation, error):
+    before = orders(database, 1)
+    response = client.post(BATCH, headers=headers['admin'], json={'operations': [operation]})
+    assert response.status_code == 200
+    assert response.json['updated'] == 0
+    assert response.json['results'][0]['error'] == error
+    assert orders(database, 1) == before
+
+
+def test_duplicate_order_ids_apply_only_the_first(client, headers, database):
+    response = client.post(BATCH, headers=headers['admin'], json={'operations': [
+        {'order_id': 1, 'status': 'rejected'},
+        {'order_id': 1, 'status': 'delivered'},
+    ]})
+    assert response.json['results'][1]['error'] == 'Duplicate order_id'
+    assert orders(database, 1)[1][0] == 'rejected'
+
+
+def test_null_courier_unassigns(client, headers, database):
+    client.post(BATCH, headers=headers['admin'], json={'operations': [{'order_id': 1, 'delivery_guy_id': COURIER_ID}]})
+    response = client.post(BATCH, headers=headers['admin'], json={'operations': [{'order_id': 1, 'delivery_guy_id': None}]})
+    assert response.json['updated'] == 1
+    assert orders(database, 1)[1][1] is None
+
+
+@pytest.mark.parametrize('body', [{}, {'operations': []}, {'operations': {'order_id': 1}},
+                                  {'operations': [{'order_id': 1}] * (MAX_BATCH_OPERATIONS + 1)}])
+def test_empty_or_oversized_batches_are_rejected(client, headers, body):
+    response = client.post(BATCH, headers=headers['admin'], json=body)
+    assert response.status_code == 400
+    assert response.json['error'] == f'Send 1 to {MAX_BATCH_OPERATIONS} operations'
+
+
+def test_only_admins_can_batch_update(client, headers):
+    response = client.post(BATCH, headers=headers['restaurant'], json={'operations': [{'order_id': 1, 'status': 'rejected'}]})
+    assert response.status_code == 403
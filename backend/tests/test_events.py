@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import events
+from app import event_hub
+
+ORDER = {'order_id': 1, 'user_id': 7, 'owner_id': 2, 'restaurant_id': 1, 'delivery_guy_id': 6, 'status': 'accepted'}
+
+
+def read(stream, count):
+    # The first `count` non-heartbeat messages, parsed into (id, event, data)
+    messages = []
+    while len(messages) < count:
+        message = next(stream)
+        if message.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+        messages.append((fields.get('id'), fields.get('event'), json.loads(fields['data']) if 'data' in fields else None))
+    return messages
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def hub(request, database):
+    return events.EventHub(events.create_backend(request.param, database))
+
+
+def test_last_event_id_resumes_after_that_event(hub):
+    for order_id in range(1, 5):
+        hub.publish('status_changed', order_id=order_id, status='confirmed')
+    stream = hub.stream(2, events.order_event_filter('admin', 1), heartbeat=0.01)
+    assert read(stream, 3) == [('2', None, None),
+                               ('3', 'status_changed', {'order_id': 3, 'status': 'confirmed'}),
+                               ('4', 'status_changed', {'order_id': 4, 'status': 'confirmed'})]
+    hub.publish('status_changed', order_id=5, status='ready')
+    assert read(stream, 1) == [('5', 'status_changed', {'order_id': 5, 'status': 'ready'})]
+
+
+def test_new_subscribers_start_from_now(hub):
+    hub.publish('status_changed', order_id=1, status='confirmed')
+    for last_id in (None, 99):
+        stream = hub.stream(last_id, events.order_event_filter('admin', 1), heartbeat=0.01)
+        assert read(stream, 1) == [('1', None, None)]
+        assert next(stream) == ': keep-alive\n\n'
+
+
+def test_resuming_past_the_buffer_asks_for_a_resync():
+    hub = events.EventHub(events.MemoryBackend(capacity=3))
+    for order_id in range(1, 6):
+        hub.publish('status_changed', order_id=order_id, status='confirmed')
+    stream = hub.stream(1, events.order_event_filter('admin', 1), heartbeat=0.01)
+    assert [event for _, event, _ in read(stream, 5)] == [None, 'resync'] + ['status_changed'] * 3
+    stream = hub.stream(2, events.order_event_filter('admin', 1), heartbeat=0.01)
+    assert [event for _, event, _ in read(stream, 4)] == [None] + ['status_changed'] * 3
+
+
+def test_couriers_only_see_their_own_orders_in_full():
+    accept = events.order_event_filter('delivery', 5)
+    assert accept('assigned', {**ORDER, 'delivery_guy_id': 5}) == {**ORDER, 'delivery_guy_id': 5}
+    assert accept('assigned', ORDER) == {'order_id': 1, 'restaurant_id': 1, 'status': 'accepted'}
+    available = {**ORDER, 'delivery_guy_id': None, 'status': 'confirmed'}
+    assert accept('status_changed', available) == {'order_id': 1, 'restaurant_id': 1, 'status': 'confirmed'}
+    assert accept('status_changed', {**ORDER, 'status': 'picked_up'}) is None
+
+
+def test_customers_and_owners_only_see_their_orders():
+    assert events.order_event_filter('customer', 7)('status_changed', ORDER) == ORDER
+    assert events.order_event_filter('customer', 8)('status_changed', ORDER) is None
+    assert events.order_event_filter('restaurant', 2)('status_changed', ORDER) == ORDER
+    assert events.order_event_filter('restaurant', 3)('status_changed', ORDER) is None
+
+
+def test_stream_route_resumes_from_last_event_id(client, headers):
+    first = event_hub.publish('status_changed', order_id=1, user_id=7, status='confirmed')
+    event_hub.publish('status_changed', order_id=2, user_id=7, status='ready')
+    response = client.get('/api/orders/stream', headers={**headers['admin'], 'Last-Event-ID': str(first)})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    stream = (chunk.decode() for chunk in response.response)
+    _, (event_id, event, data) = read(stream, 2)
+    assert (int(event_id), event, data['order_id']) == (first + 1, 'status_changed', 2)
+    response.close()
+
+
+def test_stream_route_needs_a_valid_token(client):
+    assert client.get('/api/orders/stream', query_string={'token': 'nope'}).status_code == 401
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import group_commit
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writes.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (name TEXT UNIQUE)')
+    conn.close()
+    writer = group_commit.GroupCommitWriter(path, timeout=0.2)
+    yield writer
+    writer.close()
+
+
+def names(writer):
+    conn = sqlite3.connect(writer.database)
+    rows = [row[0] for row in conn.execute('SELECT name FROM items ORDER BY rowid')]
+    conn.close()
+    return rows
+
+
+def insert(name):
+    return lambda c: c.execute('INSERT INTO items (name) VALUES (?)', (name,)).lastrowid
+
+
+def slow(seconds, result=None):
+    def work(c):
+        time.sleep(seconds)
+        return result
+    return work
+
+
+def test_submit_returns_the_result_after_commit(writer):
+    assert writer.submit(insert('a')) == 1
+    assert names(writer) == ['a']
+
+
+def test_work_not_started_before_the_timeout_never_runs(writer):
+    blocker = threading.Thread(target=writer.submit, args=(slow(0.5),), kwargs={'timeout': 5})
+    blocker.start()
+    time.sleep(0.05)
+    with pytest.raises(group_commit.WriterUnavailable):
+        writer.submit(insert('late'))
+    blocker.join()
+    assert writer.submit(insert('next')) is not None
+    assert names(writer) == ['next']
+
+
+def test_a_running_batch_is_waited_for_past_the_timeout(writer):
+    assert writer.submit(slow(0.4, 'done'), timeout=0.1) == 'done'
+
+
+def test_a_failing_item_is_rolled_back_alone(writer):
+    writer.submit(insert('a'))
+    results = {}
+    items = ['b', 'a', 'c']
+
+    def submit(name):
+        try:
+            results[name] = writer.submit(insert(name), timeout=5)
+        except sqlite3.IntegrityError as exc:
+            results[name] = exc
+
+    threads = [threading.Thread(target=submit, args=(name,)) for name in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert isinstance(results['a'], sqlite3.IntegrityError)
+    assert sorted(names(writer)) == ['a', 'b', 'c']
+    assert writer.stats()['items'] == 3
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_a_crashed_writer_fails_its_pending_work(writer):
+    def crash(c):
+        raise SystemExit
+    with pytest.raises(group_commit.WriterUnavailable):
+        writer.submit(crash, timeout=2)
+    # The next submit starts a new writer thread
+    assert writer.submit(insert('after')) == 1
+
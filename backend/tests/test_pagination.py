@@ -0,0 +1,81 @@
+import base64
+import sqlite3
+
+import pytest
+
+from app import encode_cursor
+
+
+def walk(client, headers, path, **params):
+    # Every row of a listing, following X-Next-Cursor
+    rows, cursor = [], None
+    while True:
+        response = client.get(path, headers=headers, query_string={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        rows += response.json
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return rows
+
+
+def test_order_pages_cover_every_order_once_newest_first(client, headers):
+    orders = walk(client, headers['admin'], '/api/orders', limit=17)
+    keys = [(order['created_at'], order['id']) for order in orders]
+    assert len(keys) == 203
+    assert len(set(keys)) == len(keys)
+    assert keys == sorted(keys, reverse=True)
+    assert all(order['items'] for order in orders)
+
+
+def test_filters_apply_across_pages(client, headers):
+    pending = walk(client, headers['admin'], '/api/orders', limit=5, status='pending', restaurant_id=1)
+    assert pending
+    assert {(order['status'], order['restaurant_id']) for order in pending} == {('pending', 1)}
+
+
+def test_customers_only_page_through_their_own_orders(client, headers):
+    me = client.post('/api/auth/login', json={'username': 'customer1', 'password': 'customer123'}).json['user']
+    orders = walk(client, headers['customer'], '/api/orders', limit=2)
+    assert orders
+    assert {order['user_id'] for order in orders} == {me['id']}
+
+
+def test_user_pages(database, client, headers):
+    users = walk(client, headers['admin'], '/api/admin/users', limit=4)
+    ids = [user['id'] for user in users]
+    assert ids == [row[0] for row in sqlite3.connect(database).execute('SELECT id FROM users ORDER BY id')]
+
+
+@pytest.mark.parametrize('limit', ['0', '-3', 'many'])
+def test_invalid_limit(client, headers, limit):
+    response = client.get('/api/orders', headers=headers['admin'], query_string={'limit': limit})
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid limit'}
+
+
+@pytest.mark.parametrize('path, cursor', [
+    ('/api/orders', 'not base64!'),
+    ('/api/orders', base64.urlsafe_b64encode(b'{"a": 1}').decode()),
+    ('/api/orders', encode_cursor('2024-01-01 00:00:00')),
+    ('/api/orders', encode_cursor('2024-01-01 00:00:00', True)),
+    ('/api/orders', encode_cursor(5, 5)),
+    ('/api/admin/users', encode_cursor('7')),
+    ('/api/admin/users', encode_cursor(1, 2)),
+    ('/api/search', encode_cursor(1.5, 'restaurants')),
+])
+def test_malformed_cursor(client, headers, path, cursor):
+    response = client.get(path, headers=headers['admin'], query_string={'cursor': cursor, 'q': 'pizza'})
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('role, path', [
+    ('admin', '/api/orders?restaurant_id=abc'),
+    ('admin', '/api/orders?delivery_guy_id=1.5'),
+    ('admin', '/api/orders/export?restaurant_id=x'),
+    ('delivery', '/api/delivery/available?restaurant_id=abc'),
+])
+def test_invalid_id_filter(client, headers, role, path):
+    response = client.get(path, headers=headers[role])
+    assert response.status_code == 400
+    assert response.json['error'].startswith('Invalid ')
@@ -0,0 +1,102 @@
+import pytest
+
+import db
+import shards
+from app import app
+from benchmarks.common import auth_headers, COURIER_ID
+from conftest import ROLES
+
+
+@pytest.fixture
+def headers(sharded_database, client):
+    return {role: auth_headers(client, role) for role in ROLES}
+
+
+def place_order(client, headers, restaurant_id, menu_item_id):
+    response = client.post('/api/orders', headers=headers['customer'], json={
+        'restaurant_id': restaurant_id, 'delivery_address': 'Shard St',
+        'items': [{'menu_item_id': menu_item_id, 'quantity': 1}]})
+    assert response.status_code == 201
+    return response.json['order_id']
+
+
+def shard_restaurant(client, headers, shard, **location):
+    # A restaurant routed to `shard` with one menu item: (restaurant id, menu item id)
+    restaurant_id = client.post('/api/admin/restaurants', headers=headers['admin'], json={
+        'name': 'Shard Bistro', 'owner_id': 2, 'shard': shard, **location}).json['id']
+    menu_item_id = client.post('/api/restaurant/menu', headers=headers['restaurant'], json={
+        'restaurant_id': restaurant_id, 'name': 'Shard Soup', 'price': 7.5}).json['id']
+    return restaurant_id, menu_item_id
+
+
+def test_shard_of_reads_the_shard_from_the_id():
+    assert shards.shard_of(1) == 0
+    assert shards.shard_of(shards.ID_SPAN - 1) == 0
+    assert shards.shard_of(shards.ID_SPAN) == 1
+    assert shards.shard_of(3 * shards.ID_SPAN + 7) == 3
+
+
+def test_shard_paths_name_extra_files_after_the_database():
+    assert shards.shard_paths('data/food.db') == ['data/food.db']
+    assert shards.shard_paths('data/food.db', '3') == ['data/food.db', 'data/food_shard1.db', 'data/food_shard2.db']
+    assert shards.shard_paths('food.db', 'a.db, b.db') == ['food.db', 'a.db', 'b.db']
+
+
+def test_orders_are_numbered_on_the_restaurants_shard(client, headers):
+    restaurant_id, menu_item_id = shard_restaurant(client, headers, 1)
+    order_id = place_order(client, headers, restaurant_id, menu_item_id)
+    assert shards.shard_of(order_id) == 1
+    assert shards.shard_of(place_order(client, headers, 1, 1)) == 0
+
+    listed = client.get('/api/orders', headers=headers['restaurant'], query_string={'restaurant_id': restaurant_id}).json
+    assert [order['id'] for order in listed] == [order_id]
+    assert listed[0]['customer_name']
+    response = client.put(f'/api/orders/{order_id}/status', headers=headers['restaurant'], json={'status': 'confirmed'})
+    assert response.status_code == 200
+    timeline = client.get(f'/api/orders/{order_id}/events', headers=headers['customer']).json
+    assert [event['to_status'] for event in timeline] == ['pending', 'confirmed']
+    assert all(shards.shard_of(event['id']) == 1 for event in timeline)
+
+
+def test_ids_outside_the_configured_shards_are_not_found(client, headers):
+    response = client.put(f'/api/orders/{5 * shards.ID_SPAN}/status', headers=headers['admin'], json={'status': 'confirmed'})
+    assert response.status_code == 404
+
+
+def test_invalid_shard_is_rejected(client, headers):
+    response = client.post('/api/admin/restaurants', headers=headers['admin'], json={'name': 'Nowhere', 'shard': 2})
+    assert response.status_code == 400
+
+
+def test_moving_a_restaurant_routes_only_its_new_orders(client, headers):
+    before = place_order(client, headers, 1, 1)
+    with app.app_context():
+        shards.move_restaurant(db.get_db(), 1, 1, shards.get_shard_db(1))
+        assert shards.for_restaurant(1) == 1
+        with pytest.raises(ValueError):
+            shards.move_restaurant(db.get_db(), 999999, 1, shards.get_shard_db(1))
+    after = place_order(client, headers, 1, 1)
+    assert (shards.shard_of(before), shards.shard_of(after)) == (0, 1)
+    listed = {order['id'] for order in client.get('/api/orders', headers=headers['admin'],
+                                                  query_string={'restaurant_id': 1, 'limit': 100}).json}
+    assert {before, after} <= listed
+
+
+def test_dispatch_matches_couriers_against_every_shard(client, headers):
+    with app.app_context():
+        conn = db.get_db()
+        busy = [row[0] for row in conn.execute("SELECT id FROM orders WHERE delivery_guy_id = ? AND status IN ('accepted', 'picked_up')",
+                                               (COURIER_ID,))]
+        latitude, longitude = conn.execute('SELECT latitude, longitude FROM restaurants WHERE latitude IS NOT NULL').fetchone()
+    client.post('/api/admin/orders/batch', headers=headers['admin'],
+                json={'operations': [{'order_id': order_id, 'status': 'delivered'} for order_id in busy]})
+    restaurant_id, menu_item_id = shard_restaurant(client, headers, 1, latitude=latitude + 0.002, longitude=longitude)
+    order_id = place_order(client, headers, restaurant_id, menu_item_id)
+    client.put(f'/api/orders/{order_id}/status', headers=headers['restaurant'], json={'status': 'confirmed'})
+    client.put('/api/delivery/location', headers=headers['delivery'], json={'latitude': latitude + 0.002, 'longitude': longitude})
+
+    assigned = client.post('/api/admin/dispatch', headers=headers['admin'], json={'max_distance_km': 1}).json['assigned']
+    mine = [a for a in assigned if a['courier_id'] == COURIER_ID]
+    assert [a['order_id'] for a in mine] == [order_id]
+    assert mine[0]['distance_km'] < 0.01
+    assert len({a['courier_id'] for a in assigned}) == len(assigned)
@@ -9,15 +9,26 @@ const api = axios.create({
   },
 });
 
-// Add token to requests
+// Add token to requests, and the time of our last write so reads after it see it
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  const wroteAt = localStorage.getItem('wroteAt');
+  if (wroteAt) {
+    config.headers['X-Wrote-At'] = wroteAt;
+  }
   return config;
 });
 
+api.interceptors.response.use((response) => {
+  if (response.headers['x-wrote-at']) {
+    localStorage.setItem('wroteAt', response.headers['x-wrote-at']);
+  }
+  return response;
+});
+
 export const authAPI = {
   login: (username, password) => api.post('/auth/login', { username, password }),
   register: (data) => api.post('/auth/register', data),
@@ -28,24 +39,48 @@ export const restaurantAPI = {
   getMenu: (restaurantId) => api.get(`/restaurants/${restaurantId}/menu`),
 };
 
+// Full-text search over restaurants and dishes: { q, type, limit, cursor }
+export const searchAPI = {
+  search: (params = {}) => api.get('/search', { params }),
+};
+
+// Listing endpoints are paginated: pass { limit, cursor, status, restaurant_id, delivery_guy_id, since, until }
+// and read the cursor for the next page with nextCursor(response)
+export const nextCursor = (response) => response.headers['x-next-cursor'] || null;
+
 export const orderAPI = {
   create: (data) => api.post('/orders', data),
-  getAll: () => api.get('/orders'),
+  getAll: (params = {}) => api.get('/orders', { params }),
   updateStatus: (orderId, status, deliveryGuyId = null) => 
     api.put(`/orders/${orderId}/status`, { status, delivery_guy_id: deliveryGuyId }),
+  // Status changes after event id `since`, oldest first; poll again with the last id
+  eventsSince: (since, limit) => api.get('/orders/events', { params: { since, limit } }),
+  timeline: (orderId) => api.get(`/orders/${orderId}/events`),
 };
 
 export const adminAPI = {
-  getUsers: () => api.get('/admin/users'),
+  getUsers: (params = {}) => api.get('/admin/users', { params }),
   createRestaurant: (data) => api.post('/admin/restaurants', data),
 };
 
+// Aggregates for admins and restaurant owners: { since, until, restaurant_id } (dates as YYYY-MM-DD)
+export const analyticsAPI = {
+  daily: (params = {}) => api.get('/analytics/daily', { params }),
+  topItems: (params = {}) => api.get('/analytics/top-items', { params }),
+  statusCounts: (params = {}) => api.get('/analytics/status', { params }),
+};
+
 export const restaurantOwnerAPI = {
   addMenuItem: (data) => api.post('/restaurant/menu', data),
 };
 
+// Server-Sent Events for order changes visible to the logged-in user.
+// EventSource reconnects on its own and resumes from the last event id.
+export const orderEvents = () =>
+  new EventSource(`${API_URL}/orders/stream?token=${encodeURIComponent(localStorage.getItem('token'))}`);
+
 export const deliveryAPI = {
-  getAvailable: () => api.get('/delivery/available'),
+  getAvailable: (params = {}) => api.get('/delivery/available', { params }),
 };
 
 export default api;
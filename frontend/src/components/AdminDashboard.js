@@ -1,10 +1,13 @@
 import React, { useState, useEffect } from 'react';
-import { adminAPI, orderAPI } from '../api';
+import { adminAPI, analyticsAPI, orderAPI, nextCursor } from '../api';
 import './Dashboard.css';
 
 function AdminDashboard({ user, onLogout }) {
   const [users, setUsers] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
+  const [statusCounts, setStatusCounts] = useState({});
+  const [daily, setDaily] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -13,12 +16,17 @@ function AdminDashboard({ user, onLogout }) {
 
   const fetchData = async () => {
     try {
-      const [usersRes, ordersRes] = await Promise.all([
+      const [usersRes, ordersRes, statusRes, dailyRes] = await Promise.all([
         adminAPI.getUsers(),
-        orderAPI.getAll()
+        orderAPI.getAll(),
+        analyticsAPI.statusCounts(),
+        analyticsAPI.daily()
       ]);
       setUsers(usersRes.data);
+      setStatusCounts(statusRes.data);
+      setDaily(dailyRes.data);
       setOrders(ordersRes.data);
+      setOrdersCursor(nextCursor(ordersRes));
     } catch (err) {
       console.error('Error fetching data:', err);
     } finally {
@@ -26,6 +34,16 @@ function AdminDashboard({ user, onLogout }) {
     }
   };
 
+  const loadMoreOrders = async () => {
+    try {
+      const response = await orderAPI.getAll({ cursor: ordersCursor });
+      setOrders(prev => [...prev, ...response.data]);
+      setOrdersCursor(nextCursor(response));
+    } catch (err) {
+      console.error('Error fetching orders:', err);
+    }
+  };
+
   const handleStatusUpdate = async (orderId, status) => {
     try {
       await orderAPI.updateStatus(orderId, status);
@@ -52,15 +70,19 @@ function AdminDashboard({ user, onLogout }) {
         </div>
         <div className="stat-card">
           <h3>📦 Total Orders</h3>
-          <p className="stat-number">{orders.length}</p>
+          <p className="stat-number">{Object.values(statusCounts).reduce((sum, n) => sum + n, 0)}</p>
         </div>
         <div className="stat-card">
           <h3>⏳ Pending Orders</h3>
-          <p className="stat-number">{orders.filter(o => o.status === 'pending').length}</p>
+          <p className="stat-number">{statusCounts.pending || 0}</p>
         </div>
         <div className="stat-card">
           <h3>✅ Delivered Orders</h3>
-          <p className="stat-number">{orders.filter(o => o.status === 'delivered').length}</p>
+          <p className="stat-number">{statusCounts.delivered || 0}</p>
+        </div>
+        <div className="stat-card">
+          <h3>💰 Revenue (30 days)</h3>
+          <p className="stat-number">${daily.reduce((sum, d) => sum + d.revenue, 0).toFixed(2)}</p>
         </div>
       </div>
 
@@ -111,6 +133,11 @@ function AdminDashboard({ user, onLogout }) {
             </tbody>
           </table>
         )}
+        {ordersCursor && (
+          <button onClick={loadMoreOrders} className="btn btn-secondary" style={{ marginTop: '10px' }}>
+            Load more
+          </button>
+        )}
       </div>
 
       <div className="card">
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { restaurantAPI, orderAPI } from '../api';
+import { restaurantAPI, orderAPI, searchAPI, nextCursor } from '../api';
 import './Dashboard.css';
 
 function CustomerDashboard({ user, onLogout }) {
@@ -8,8 +8,11 @@ function CustomerDashboard({ user, onLogout }) {
   const [menu, setMenu] = useState([]);
   const [cart, setCart] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [showCheckout, setShowCheckout] = useState(false);
   const [deliveryAddress, setDeliveryAddress] = useState('');
+  const [query, setQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
 
   useEffect(() => {
     fetchRestaurants();
@@ -35,10 +38,35 @@ function CustomerDashboard({ user, onLogout }) {
     }
   };
 
+  const handleSearch = async (e) => {
+    e.preventDefault();
+    if (!query.trim()) {
+      setSearchResults(null);
+      return;
+    }
+    try {
+      const response = await searchAPI.search({ q: query, limit: 20 });
+      setSearchResults(response.data);
+    } catch (err) {
+      console.error('Error searching:', err);
+    }
+  };
+
   const fetchOrders = async () => {
     try {
       const response = await orderAPI.getAll();
       setOrders(response.data);
+      setOrdersCursor(nextCursor(response));
+    } catch (err) {
+      console.error('Error fetching orders:', err);
+    }
+  };
+
+  const loadMoreOrders = async () => {
+    try {
+      const response = await orderAPI.getAll({ cursor: ordersCursor });
+      setOrders(prev => [...prev, ...response.data]);
+      setOrdersCursor(nextCursor(response));
     } catch (err) {
       console.error('Error fetching orders:', err);
     }
@@ -167,6 +195,44 @@ function CustomerDashboard({ user, onLogout }) {
 
       <div className="card">
         <h2>🏪 Restaurants</h2>
+        <form onSubmit={handleSearch} style={{ display: 'flex', gap: '10px', marginBottom: '20px' }}>
+          <input
+            type="text"
+            value={query}
+            onChange={(e) => setQuery(e.target.value)}
+            placeholder="Search restaurants and dishes, e.g. sushi"
+            style={{ flex: 1 }}
+          />
+          <button type="submit" className="btn btn-primary">🔍 Search</button>
+          {searchResults && (
+            <button type="button" onClick={() => { setQuery(''); setSearchResults(null); }} className="btn btn-secondary">
+              Clear
+            </button>
+          )}
+        </form>
+        {searchResults && (
+          <div className="cart-items" style={{ marginBottom: '20px' }}>
+            {searchResults.length === 0 && <p>No matches.</p>}
+            {searchResults.map(hit => (
+              <div key={`${hit.type}-${hit.id}`} className="cart-item">
+                <div>
+                  <strong>{hit.name}</strong>
+                  <p>
+                    {hit.type === 'restaurant'
+                      ? hit.cuisine_type
+                      : `${hit.restaurant_name} · $${hit.price.toFixed(2)}`}
+                  </p>
+                </div>
+                <button
+                  onClick={() => fetchMenu(hit.type === 'restaurant' ? hit.id : hit.restaurant_id)}
+                  className="btn btn-primary"
+                >
+                  👀 View Menu
+                </button>
+              </div>
+            ))}
+          </div>
+        )}
         <div className="grid">
             {restaurants.map(restaurant => (
               <div key={restaurant.id} className="restaurant-card">
@@ -256,6 +322,11 @@ function CustomerDashboard({ user, onLogout }) {
             </tbody>
           </table>
         )}
+        {ordersCursor && (
+          <button onClick={loadMoreOrders} className="btn btn-secondary" style={{ marginTop: '10px' }}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,26 +1,44 @@
 import React, { useState, useEffect } from 'react';
-import { orderAPI, deliveryAPI } from '../api';
+import { orderAPI, deliveryAPI, orderEvents, nextCursor } from '../api';
 import './Dashboard.css';
 
+const REFETCH_DELAY_MS = 500;
+
 function DeliveryDashboard({ user, onLogout }) {
   const [myOrders, setMyOrders] = useState([]);
+  const [myOrdersCursor, setMyOrdersCursor] = useState(null);
   const [availableOrders, setAvailableOrders] = useState([]);
+  const [availableCursor, setAvailableCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 5000); // Refresh every 5 seconds
-    return () => clearInterval(interval);
+    // Refetch when the server pushes an order change instead of polling. Dispatch and
+    // batch updates send one event per order, so a burst of events triggers one refetch.
+    let timer = null;
+    const scheduleFetch = () => {
+      clearTimeout(timer);
+      timer = setTimeout(fetchData, REFETCH_DELAY_MS);
+    };
+    const events = orderEvents();
+    events.onopen = scheduleFetch;
+    ['created', 'status_changed', 'assigned', 'resync'].forEach(type => events.addEventListener(type, scheduleFetch));
+    return () => {
+      clearTimeout(timer);
+      events.close();
+    };
   }, []);
 
   const fetchData = async () => {
     try {
       const [myOrdersRes, availableRes] = await Promise.all([
-        orderAPI.getAll(),
+        orderAPI.getAll({ delivery_guy_id: user.id }),
         deliveryAPI.getAvailable()
       ]);
       setMyOrders(myOrdersRes.data);
+      setMyOrdersCursor(nextCursor(myOrdersRes));
       setAvailableOrders(availableRes.data);
+      setAvailableCursor(nextCursor(availableRes));
     } catch (err) {
       console.error('Error fetching data:', err);
     } finally {
@@ -28,6 +46,26 @@ function DeliveryDashboard({ user, onLogout }) {
     }
   };
 
+  const loadMoreMyOrders = async () => {
+    try {
+      const response = await orderAPI.getAll({ delivery_guy_id: user.id, cursor: myOrdersCursor });
+      setMyOrders(prev => [...prev, ...response.data]);
+      setMyOrdersCursor(nextCursor(response));
+    } catch (err) {
+      console.error('Error fetching orders:', err);
+    }
+  };
+
+  const loadMoreAvailable = async () => {
+    try {
+      const response = await deliveryAPI.getAvailable({ cursor: availableCursor });
+      setAvailableOrders(prev => [...prev, ...response.data]);
+      setAvailableCursor(nextCursor(response));
+    } catch (err) {
+      console.error('Error fetching available orders:', err);
+    }
+  };
+
   const handleAcceptOrder = async (orderId) => {
     try {
       await orderAPI.updateStatus(orderId, 'accepted');
@@ -82,6 +120,11 @@ function DeliveryDashboard({ user, onLogout }) {
             ))}
           </div>
         )}
+        {availableCursor && (
+          <button onClick={loadMoreAvailable} className="btn btn-secondary" style={{ marginTop: '10px' }}>
+            Load more
+          </button>
+        )}
       </div>
 
       <div className="card">
@@ -132,6 +175,11 @@ function DeliveryDashboard({ user, onLogout }) {
             </tbody>
           </table>
         )}
+        {myOrdersCursor && (
+          <button onClick={loadMoreMyOrders} className="btn btn-secondary" style={{ marginTop: '10px' }}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
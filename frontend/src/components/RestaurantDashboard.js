@@ -1,10 +1,13 @@
 import React, { useState, useEffect } from 'react';
-import { orderAPI, restaurantOwnerAPI } from '../api';
+import { analyticsAPI, orderAPI, restaurantOwnerAPI, nextCursor } from '../api';
 import './Dashboard.css';
 
 function RestaurantDashboard({ user, onLogout }) {
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [daily, setDaily] = useState([]);
+  const [topItems, setTopItems] = useState([]);
   const [showAddMenu, setShowAddMenu] = useState(false);
   const [menuForm, setMenuForm] = useState({
     restaurant_id: '',
@@ -17,12 +20,32 @@ function RestaurantDashboard({ user, onLogout }) {
 
   useEffect(() => {
     fetchOrders();
+    fetchAnalytics();
   }, []);
 
+  const fetchAnalytics = async () => {
+    try {
+      const [dailyRes, topRes] = await Promise.all([
+        analyticsAPI.daily(),
+        analyticsAPI.topItems({ limit: 5 })
+      ]);
+      setDaily(dailyRes.data);
+      setTopItems(topRes.data);
+    } catch (err) {
+      console.error('Error fetching analytics:', err);
+    }
+  };
+
+  const delivered = daily.reduce((sum, d) => sum + d.delivered, 0);
+  const avgDelivery = delivered
+    ? daily.reduce((sum, d) => sum + (d.avg_delivery_minutes || 0) * d.delivered, 0) / delivered
+    : null;
+
   const fetchOrders = async () => {
     try {
       const response = await orderAPI.getAll();
       setOrders(response.data);
+      setOrdersCursor(nextCursor(response));
     } catch (err) {
       console.error('Error fetching orders:', err);
     } finally {
@@ -30,6 +53,16 @@ function RestaurantDashboard({ user, onLogout }) {
     }
   };
 
+  const loadMoreOrders = async () => {
+    try {
+      const response = await orderAPI.getAll({ cursor: ordersCursor });
+      setOrders(prev => [...prev, ...response.data]);
+      setOrdersCursor(nextCursor(response));
+    } catch (err) {
+      console.error('Error fetching orders:', err);
+    }
+  };
+
   const handleStatusUpdate = async (orderId, status) => {
     try {
       await orderAPI.updateStatus(orderId, status);
@@ -73,6 +106,25 @@ function RestaurantDashboard({ user, onLogout }) {
         </div>
       </div>
 
+      <div className="stats-grid">
+        <div className="stat-card">
+          <h3>📦 Orders (30 days)</h3>
+          <p className="stat-number">{daily.reduce((sum, d) => sum + d.orders, 0)}</p>
+        </div>
+        <div className="stat-card">
+          <h3>💰 Revenue (30 days)</h3>
+          <p className="stat-number">${daily.reduce((sum, d) => sum + d.revenue, 0).toFixed(2)}</p>
+        </div>
+        <div className="stat-card">
+          <h3>⏱️ Avg Delivery</h3>
+          <p className="stat-number">{avgDelivery === null ? 'N/A' : `${avgDelivery.toFixed(0)} min`}</p>
+        </div>
+        <div className="stat-card">
+          <h3>🏆 Top Item</h3>
+          <p className="stat-number">{topItems.length ? topItems[0].name : 'N/A'}</p>
+        </div>
+      </div>
+
       {showAddMenu && (
         <div className="card">
           <h2>➕ Add Menu Item</h2>
@@ -185,6 +237,11 @@ function RestaurantDashboard({ user, onLogout }) {
             </tbody>
           </table>
         )}
+        {ordersCursor && (
+          <button onClick={loadMoreOrders} className="btn btn-secondary" style={{ marginTop: '10px' }}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );